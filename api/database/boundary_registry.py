@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import text
+
+from api.database.connection import SessionLocal
+from api.database.spatial_index import has_gist_index
+from api.models.boundary import Boundary
+from api.models.country import Country
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+class BoundaryTableInfo:
+    """Catalog metadata of one boundary table, as of the last registry load"""
+
+    def __init__(self, name, column_types=None, geometry=None, row_estimate=None, index_definitions=None):
+        self.name = name
+        self.column_types = column_types or {}   # column -> udt name, in table order
+        self.geometry = geometry or {}           # geometry column -> {"type": ..., "srid": ...}
+        self.row_estimate = row_estimate
+        self.index_definitions = index_definitions or []
+
+    @property
+    def exists(self):
+        return bool(self.column_types)
+
+    @property
+    def geometry_columns(self):
+        return [col for col, udt in self.column_types.items() if udt == "geometry"]
+
+    def srid(self, column):
+        """SRID of a geometry column (4326 when not registered)"""
+        return (self.geometry.get(column) or {}).get("srid") or 4326
+
+    @property
+    def indexed_columns(self):
+        return [col for col in self.geometry_columns if has_gist_index(col, self.index_definitions)]
+
+    def as_dict(self):
+        indexed = self.indexed_columns
+        return {
+            "table": self.name,
+            "exists": self.exists,
+            "columns": self.column_types,
+            "geometry": self.geometry,
+            "row_estimate": self.row_estimate,
+            "indexed": indexed,
+            "missing_index": [col for col in self.geometry_columns if col not in indexed]
+        }
+
+def configured_boundary_tables(db):
+    """Boundary table names referenced by the country and boundary tables"""
+    tables = {
+        row[0] for model in (Boundary, Country)
+        for row in db.query(model.table).filter(model.table.isnot(None)).distinct().all()
+    }
+    tables.discard("default_table")
+    return tables
+
+def load_boundary_tables(db, table_names):
+    """Read catalog metadata for the given tables with one query per catalog view"""
+    names = sorted(table_names)
+    params = {"names": names}
+    columns = {name: {} for name in names}
+    geometry = {name: {} for name in names}
+    row_estimates = {}
+    index_definitions = {name: [] for name in names}
+
+    for row in db.execute(text(
+        "SELECT table_name, column_name, udt_name FROM information_schema.columns "
+        "WHERE table_name = ANY(:names) ORDER BY table_name, ordinal_position"
+    ), params):
+        columns[row.table_name][row.column_name] = row.udt_name
+    for row in db.execute(text(
+        "SELECT f_table_name, f_geometry_column, type, srid FROM geometry_columns WHERE f_table_name = ANY(:names)"
+    ), params):
+        geometry[row.f_table_name][row.f_geometry_column] = {"type": row.type, "srid": row.srid or None}
+    # Planner statistics; -1 (never analyzed) is reported as unknown
+    for row in db.execute(text(
+        "SELECT relname, reltuples::bigint AS row_estimate FROM pg_class "
+        "WHERE relname = ANY(:names) AND relkind IN ('r', 'p', 'v', 'm')"
+    ), params):
+        row_estimates[row.relname] = row.row_estimate if row.row_estimate >= 0 else None
+    for row in db.execute(text(
+        "SELECT tablename, indexdef FROM pg_indexes WHERE tablename = ANY(:names)"
+    ), params):
+        index_definitions[row.tablename].append(row.indexdef.lower())
+
+    return {
+        name: BoundaryTableInfo(name, columns[name], geometry[name], row_estimates.get(name), index_definitions[name])
+        for name in names
+    }
+
+class BoundaryRegistry:
+    """In-memory registry of boundary table metadata.
+
+    Requests look tables up here instead of querying the catalog. Tables are
+    loaded together on refresh (at startup, on a schedule, or on demand); a
+    table missing from the registry is loaded on first lookup and kept,
+    including when it does not exist, until the next refresh.
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.refreshed_at = None
+        self.lock = threading.Lock()
+
+    def get(self, db, table_name):
+        """Metadata of a table, loading it on a registry miss"""
+        info = self.tables.get(table_name)
+        if info is None:
+            with self.lock:
+                info = self.tables.get(table_name)
+                if info is None:
+                    info = load_boundary_tables(db, [table_name])[table_name]
+                    self.tables[table_name] = info
+        return info
+
+    def refresh(self, db, table_names=None):
+        """Reload the given tables, or every configured and previously looked-up table"""
+        if table_names is None:
+            table_names = configured_boundary_tables(db) | set(self.tables)
+        tables = load_boundary_tables(db, table_names)
+        with self.lock:
+            self.tables.update(tables)
+            self.refreshed_at = datetime.now()
+        logger.info(f"🗂️ Boundary registry refreshed: {len(tables)} tables")
+        return tables
+
+    def invalidate(self, table_name=None):
+        """Forget one table (or all); it is reloaded on the next lookup"""
+        with self.lock:
+            if table_name is None:
+                self.tables.clear()
+            else:
+                self.tables.pop(table_name, None)
+
+    def stats(self):
+        return {
+            "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+            "refresh_seconds": settings.BOUNDARY_REGISTRY_REFRESH_SECONDS,
+            "tables": [info.as_dict() for _, info in sorted(self.tables.items())]
+        }
+
+boundary_registry = BoundaryRegistry()
+
+def refresh_boundary_registry(table_names=None):
+    """Refresh the registry on its own session"""
+    db = SessionLocal()
+    try:
+        return boundary_registry.refresh(db, table_names)
+    finally:
+        db.close()
+
+async def refresh_boundary_registry_periodically():
+    """Refresh the registry every BOUNDARY_REGISTRY_REFRESH_SECONDS for the lifetime of the API"""
+    while True:
+        try:
+            await asyncio.sleep(settings.BOUNDARY_REGISTRY_REFRESH_SECONDS)
+            await asyncio.to_thread(refresh_boundary_registry)
+        except asyncio.CancelledError:
+            break
+        except Exception as e:
+            logger.warning(f"Boundary registry refresh failed: {e}")
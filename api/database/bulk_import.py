@@ -0,0 +1,222 @@
+import csv
+import io
+
+from api.database.connection import engine
+from api.database.spatial_index import quote_identifier
+
+# Rows per COPY chunk when converting Parquet row groups to CSV
+PARQUET_BATCH_ROWS = 100_000
+
+def is_parquet(fileobj, filename=None):
+    """Detect a Parquet upload by file name or by its PAR1 magic bytes"""
+    if filename and filename.lower().endswith(".parquet"):
+        return True
+    position = fileobj.tell()
+    magic = fileobj.read(4)
+    fileobj.seek(position)
+    return magic == b"PAR1"
+
+def normalize_columns(names):
+    """Lower-cased, stripped column names; raises ValueError on duplicates"""
+    columns = [str(name).strip().lstrip("\ufeff").lower() for name in names]
+    duplicates = sorted({col for col in columns if columns.count(col) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate columns: {', '.join(duplicates)}")
+    return columns
+
+def upload_columns(fileobj, parquet):
+    """Column names of a CSV header line or a Parquet schema"""
+    if parquet:
+        import pyarrow.parquet as pq
+
+        names = pq.ParquetFile(fileobj).schema_arrow.names
+        fileobj.seek(0)
+        return normalize_columns(names)
+
+    header = fileobj.readline().decode("utf-8-sig")
+    fileobj.seek(0)
+    return normalize_columns(next(csv.reader([header]), []))
+
+def copy_into_staging(cursor, fileobj, parquet, columns, staging):
+    """Create a text-typed temp table for the upload and COPY the upload into it.
+
+    CSV is streamed to COPY as-is; Parquet is converted row group by row group.
+    Every value lands as text and is cast in SQL, so extra columns are ignored.
+    """
+    column_list = ", ".join(quote_identifier(col) for col in columns)
+    cursor.execute(
+        f"CREATE TEMP TABLE {staging} (import_row bigint GENERATED ALWAYS AS IDENTITY, "
+        + ", ".join(f"{quote_identifier(col)} text" for col in columns)
+        + ") ON COMMIT DROP"
+    )
+
+    if not parquet:
+        cursor.copy_expert(
+            f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv, HEADER true, ENCODING 'UTF8')",
+            fileobj
+        )
+        return
+
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(fileobj).iter_batches(batch_size=PARQUET_BATCH_ROWS):
+        buffer = io.StringIO()
+        batch.to_pandas().to_csv(buffer, header=False, index=False)
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {staging} ({column_list}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def staged_value(columns, name, cast=None, alias="s"):
+    """SQL expression for an upload column (empty strings as NULL), or NULL when the upload lacks it"""
+    if name not in columns:
+        return "NULL"
+    expression = f"NULLIF(trim({alias}.{quote_identifier(name)}), '')"
+    return f"{expression}::{cast}" if cast else expression
+
+def run_import(load):
+    """Run an import on a raw psycopg2 connection in one transaction"""
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        result = load(cursor)
+        connection.commit()
+        return result
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+def import_campaigns(fileobj, filename=None):
+    """Upsert campaign rows by campaign_name from a CSV or Parquet upload.
+
+    Columns: campaign_name (required), country, city, ukm_plan, ukm_actual.
+    Missing or empty values keep the stored value; the last row of a name
+    wins. persentase_ukm_actual is recomputed in SQL for every touched row.
+    Campaign writes are blocked while the merge runs.
+    """
+    parquet = is_parquet(fileobj, filename)
+    columns = upload_columns(fileobj, parquet)
+    if "campaign_name" not in columns:
+        raise ValueError("Upload must have a campaign_name column")
+
+    def load(cursor):
+        copy_into_staging(cursor, fileobj, parquet, columns, "campaign_import")
+        cursor.execute("SELECT count(*) FROM campaign_import")
+        rows_read = cursor.fetchone()[0]
+
+        cursor.execute(f"""
+            CREATE TEMP TABLE campaign_upsert ON COMMIT DROP AS
+            SELECT DISTINCT ON (name) *
+            FROM (
+                SELECT
+                    s.import_row,
+                    {staged_value(columns, "campaign_name")} AS name,
+                    {staged_value(columns, "country")} AS country,
+                    {staged_value(columns, "city")} AS city,
+                    {staged_value(columns, "ukm_plan", "double precision")} AS ukm_plan,
+                    {staged_value(columns, "ukm_actual", "double precision")} AS ukm_actual
+                FROM campaign_import s
+            ) rows
+            WHERE name IS NOT NULL
+            ORDER BY name, import_row DESC
+        """)
+        # campaign_name has no unique constraint, so the UPDATE + INSERT WHERE NOT EXISTS
+        # merge would race with a concurrent import or campaign insert. This lock mode
+        # conflicts with itself and with row writes but not with reads; it is held to commit.
+        cursor.execute("LOCK TABLE campaign IN SHARE ROW EXCLUSIVE MODE")
+        cursor.execute("""
+            UPDATE campaign c SET
+                country = COALESCE(u.country, c.country),
+                city = COALESCE(u.city, c.city),
+                ukm_plan = COALESCE(u.ukm_plan, c.ukm_plan),
+                ukm_actual = COALESCE(u.ukm_actual, c.ukm_actual)
+            FROM campaign_upsert u
+            WHERE c.campaign_name = u.name
+        """)
+        updated = cursor.rowcount
+        cursor.execute("""
+            INSERT INTO campaign (campaign_name, country, city, ukm_plan, ukm_actual)
+            SELECT u.name, u.country, u.city, u.ukm_plan, u.ukm_actual
+            FROM campaign_upsert u
+            WHERE NOT EXISTS (SELECT 1 FROM campaign c WHERE c.campaign_name = u.name)
+        """)
+        inserted = cursor.rowcount
+        cursor.execute("""
+            UPDATE campaign c SET persentase_ukm_actual = CASE
+                WHEN c.ukm_plan > 0 THEN round((100.0 * c.ukm_actual / c.ukm_plan)::numeric, 2)::double precision
+                ELSE NULL
+            END
+            FROM campaign_upsert u
+            WHERE c.campaign_name = u.name
+        """)
+        return {"rows_read": rows_read, "inserted": inserted, "updated": updated}
+
+    return run_import(load)
+
+def import_trace_points(fileobj, filename=None, campaign_id=None, replace=False):
+    """Append DAX trace points from a CSV or Parquet upload.
+
+    Columns: x and y (lon/lat, required), campaign_id or campaign_name
+    (unless campaign_id is given), and optionally report_id (or id),
+    segment_id, report_user_id and created_at. Points of unknown campaigns
+    are skipped. With replace, the campaigns' earlier points are removed first.
+    """
+    parquet = is_parquet(fileobj, filename)
+    columns = upload_columns(fileobj, parquet)
+    missing = [col for col in ("x", "y") if col not in columns]
+    if missing:
+        raise ValueError(f"Upload must have columns: {', '.join(missing)}")
+    if campaign_id is None and "campaign_id" not in columns and "campaign_name" not in columns:
+        raise ValueError("Upload must have a campaign_id or campaign_name column, or pass campaign_id")
+
+    if campaign_id is not None:
+        campaign_expression = "%(campaign_id)s"
+    else:
+        campaign_expression = f"COALESCE({staged_value(columns, 'campaign_id', 'integer')}, names.id)"
+    report_id = staged_value(columns, "report_id") if "report_id" in columns else staged_value(columns, "id")
+
+    def load(cursor):
+        copy_into_staging(cursor, fileobj, parquet, columns, "trace_import")
+        cursor.execute("SELECT count(*) FROM trace_import")
+        rows_read = cursor.fetchone()[0]
+
+        cursor.execute(f"""
+            CREATE TEMP TABLE trace_points ON COMMIT DROP AS
+            SELECT
+                {campaign_expression} AS campaign_id,
+                left({report_id}, 64) AS report_id,
+                left({staged_value(columns, "segment_id")}, 64) AS segment_id,
+                left({staged_value(columns, "report_user_id")}, 64) AS report_user_id,
+                {staged_value(columns, "created_at", "timestamp")} AS recorded_at,
+                ST_SetSRID(ST_MakePoint(
+                    {staged_value(columns, "x", "double precision")},
+                    {staged_value(columns, "y", "double precision")}
+                ), 4326) AS geom
+            FROM trace_import s
+            LEFT JOIN (
+                SELECT campaign_name, min(id) AS id FROM campaign GROUP BY campaign_name
+            ) names ON names.campaign_name = {staged_value(columns, "campaign_name")}
+        """, {"campaign_id": campaign_id})
+        cursor.execute("""
+            DELETE FROM trace_points t
+            WHERE t.geom IS NULL OR t.campaign_id IS NULL
+               OR NOT EXISTS (SELECT 1 FROM campaign c WHERE c.id = t.campaign_id)
+        """)
+        skipped = cursor.rowcount
+
+        replaced = 0
+        if replace:
+            cursor.execute("""
+                DELETE FROM campaign_trace_point
+                WHERE campaign_id IN (SELECT DISTINCT campaign_id FROM trace_points)
+            """)
+            replaced = cursor.rowcount
+        cursor.execute("""
+            INSERT INTO campaign_trace_point (campaign_id, report_id, segment_id, report_user_id, recorded_at, geom)
+            SELECT campaign_id, report_id, segment_id, report_user_id, recorded_at, geom FROM trace_points
+        """)
+        inserted = cursor.rowcount
+        cursor.execute("ANALYZE campaign_trace_point")
+        return {"rows_read": rows_read, "inserted": inserted, "skipped": skipped, "replaced": replaced}
+
+    return run_import(load)
@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from config import settings
@@ -14,6 +15,19 @@ engine = create_engine(
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine (asyncpg) for routers that must not block the event loop
+async_engine = create_async_engine(
+    settings.async_database_url,
+    pool_pre_ping=True,
+    pool_recycle=300,
+    echo=False
+)
+
+# Create AsyncSessionLocal class
+AsyncSessionLocal = sessionmaker(
+    bind=async_engine, class_=AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False
+)
+
 # Create Base class
 Base = declarative_base()
 
@@ -23,4 +37,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+# Dependency to get an async database session
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
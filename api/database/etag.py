@@ -0,0 +1,18 @@
+import hashlib
+
+from fastapi import Request, Response
+
+def make_etag(*parts):
+    """Strong ETag from the given parts (e.g. a table change marker and the request query)"""
+    return '"' + hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:16] + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the client's If-None-Match already covers this ETag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def not_modified(etag: str):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
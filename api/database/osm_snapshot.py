@@ -0,0 +1,59 @@
+import asyncio
+import logging
+
+import asyncpg
+from sqlalchemy import text
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel used to tell other API workers that the OSM snapshot advanced
+OSM_SNAPSHOT_CHANNEL = "osm_snapshot"
+
+# The single osm_snapshot_state row
+OSM_SNAPSHOT_ROW_ID = 1
+
+def load_osm_snapshot(db):
+    """Snapshot id stored in the database (None when none is stored yet)"""
+    return db.execute(
+        text("SELECT snapshot FROM osm_snapshot_state WHERE id = :id"), {"id": OSM_SNAPSHOT_ROW_ID}
+    ).scalar()
+
+def save_osm_snapshot(db, snapshot):
+    """Store the current snapshot and notify the other workers; both take effect on commit"""
+    db.execute(text("""
+        INSERT INTO osm_snapshot_state (id, snapshot, advanced_at) VALUES (:id, :snapshot, now())
+        ON CONFLICT (id) DO UPDATE SET snapshot = EXCLUDED.snapshot, advanced_at = EXCLUDED.advanced_at
+    """), {"id": OSM_SNAPSHOT_ROW_ID, "snapshot": snapshot})
+    db.execute(text("SELECT pg_notify(:channel, :snapshot)"), {"channel": OSM_SNAPSHOT_CHANNEL, "snapshot": snapshot})
+    db.commit()
+
+async def listen_for_osm_snapshot_changes(on_change):
+    """Call on_change(snapshot) whenever any worker advances the OSM snapshot.
+
+    Runs for the lifetime of the API and reconnects when the listening
+    connection drops; the stored snapshot is re-read on every connect since
+    notifications may have been missed meanwhile.
+    """
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(settings.database_url)
+            await connection.add_listener(OSM_SNAPSHOT_CHANNEL, lambda *args: on_change(args[3]))
+            stored = await connection.fetchval(
+                "SELECT snapshot FROM osm_snapshot_state WHERE id = $1", OSM_SNAPSHOT_ROW_ID
+            )
+            if stored:
+                on_change(stored)
+            logger.info(f"👂 Listening for OSM snapshot changes on '{OSM_SNAPSHOT_CHANNEL}'")
+            while not connection.is_closed():
+                await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            break
+        except Exception as e:
+            logger.warning(f"OSM snapshot listener failed, retrying: {e}")
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        await asyncio.sleep(5)
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import logging
+from datetime import datetime
+
+import asyncpg
+from sqlalchemy import select, text
+
+from api.database.etag import make_etag
+from api.models.country import Country, Region
+from api.schemas.country import CountryPricingResponse, RegionPricingResponse
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel used to tell other API workers that pricing changed
+PRICING_CHANNEL = "pricing_catalog"
+
+def safe_getattr(obj, attr, default=None):
+    """Safely get attribute from object, return default if not exists"""
+    try:
+        return getattr(obj, attr, default)
+    except:
+        return default
+
+def country_pricing(country):
+    """Pricing response for one country row"""
+    return CountryPricingResponse(
+        id=country.id,
+        name=country.name,
+        currency=safe_getattr(country, 'currency', 'USD'),
+        currency_symbol=safe_getattr(country, 'currency_symbol', '$'),
+        ukm_price=safe_getattr(country, 'ukm_price', 8000.0),
+        insurance=safe_getattr(country, 'insurance_per_dax_per_month', 132200.0),
+        dataplan=safe_getattr(country, 'dataplan_per_dax_per_month', 450000.0),
+        exchange_rate_to_usd=safe_getattr(country, 'exchange_rate_to_usd', 1.0)
+    )
+
+def region_pricing(region, country):
+    """Pricing response for one region, with the country prices scaled by the regional multipliers"""
+    return RegionPricingResponse(
+        id=region.id,
+        name=region.name,
+        country_id=region.country_id,
+        country_name=country.name,
+        currency=safe_getattr(country, 'currency', 'USD'),
+        currency_symbol=safe_getattr(country, 'currency_symbol', '$'),
+        regional_ukm_price=(country.ukm_price or 8000.0) * (region.ukm_price_multiplier or 1.0),
+        regional_insurance=(country.insurance_per_dax_per_month or 132200.0) * (region.insurance_multiplier or 1.0),
+        regional_dataplan=(country.dataplan_per_dax_per_month or 450000.0) * (region.dataplan_multiplier or 1.0),
+        regional_overhead=region.regional_overhead or 0.0,
+        transportation_cost=region.transportation_cost or 0.0,
+        exchange_rate_to_usd=safe_getattr(country, 'exchange_rate_to_usd', 1.0)
+    )
+
+class PricingCatalog:
+    """In-memory snapshot of country and region pricing.
+
+    Loaded with two queries on first use and kept until a pricing write
+    invalidates it, or for at most PRICING_CATALOG_TTL_SECONDS so a worker
+    that missed a change notification still catches up. The ETag is a hash of the content, so every API worker
+    holding the same pricing hands out the same ETag.
+    """
+
+    def __init__(self):
+        self.countries = {}            # country id -> CountryPricingResponse
+        self.country_list = []         # /country/pricing rows, in table order
+        self.regions = {}              # region id -> RegionPricingResponse
+        self.regions_by_country = {}   # country id -> [RegionPricingResponse]
+        self.etag = None
+        self.loaded_at = None
+        self.version = 0
+        self.loaded_version = None
+        self.lock = asyncio.Lock()
+
+    @property
+    def is_loaded(self):
+        if self.loaded_version != self.version:
+            return False
+        ttl = settings.PRICING_CATALOG_TTL_SECONDS
+        return ttl <= 0 or (datetime.now() - self.loaded_at).total_seconds() < ttl
+
+    def invalidate(self):
+        """Drop the snapshot; the next read reloads it"""
+        self.version += 1
+
+    async def get(self, db):
+        """Current snapshot, loading it from the database when invalidated"""
+        if self.is_loaded:
+            return self
+        async with self.lock:
+            if not self.is_loaded:
+                await self.load(db)
+        return self
+
+    async def load(self, db):
+        version = self.version
+        countries = (await db.execute(select(Country).order_by(Country.id))).scalars().all()
+        regions = (await db.execute(select(Region).order_by(Region.id))).scalars().all()
+
+        country_rows = {country.id: country for country in countries}
+        self.countries = {country.id: country_pricing(country) for country in countries}
+        # /country/pricing has always reported a fixed exchange rate and no regions
+        self.country_list = [
+            CountryPricingResponse(
+                id=country.id,
+                name=country.name,
+                currency=country.currency,
+                currency_symbol=country.currency_symbol,
+                exchange_rate_to_usd=0.000063,
+                regions=[]
+            )
+            for country in countries
+        ]
+        self.regions = {
+            region.id: region_pricing(region, country_rows[region.country_id])
+            for region in regions if region.country_id in country_rows
+        }
+        self.regions_by_country = {country_id: [] for country_id in country_rows}
+        for pricing in self.regions.values():
+            self.regions_by_country[pricing.country_id].append(pricing)
+
+        content = json.dumps({
+            "countries": [pricing.model_dump() for pricing in self.countries.values()],
+            "regions": [pricing.model_dump() for pricing in self.regions.values()]
+        }, sort_keys=True, default=str)
+        self.etag = make_etag(content)
+        self.loaded_at = datetime.now()
+        # A write that landed while loading leaves the snapshot stale
+        self.loaded_version = version
+        logger.info(f"💰 Pricing catalog loaded: {len(self.countries)} countries, {len(self.regions)} regions")
+
+    def stats(self):
+        return {
+            "loaded": self.is_loaded,
+            "etag": self.etag,
+            "loaded_at": self.loaded_at.isoformat() if self.loaded_at else None,
+            "countries": len(self.countries),
+            "regions": len(self.regions),
+            "notify": settings.PRICING_CATALOG_NOTIFY,
+            "ttl_seconds": settings.PRICING_CATALOG_TTL_SECONDS
+        }
+
+pricing_catalog = PricingCatalog()
+
+async def notify_pricing_changed(db):
+    """Queue a pricing change notification; Postgres delivers it when the write commits"""
+    if settings.PRICING_CATALOG_NOTIFY:
+        await db.execute(text("SELECT pg_notify(:channel, '')"), {"channel": PRICING_CHANNEL})
+
+async def listen_for_pricing_changes():
+    """Invalidate this worker's catalog whenever any worker commits a pricing write.
+
+    Runs for the lifetime of the API and reconnects when the listening
+    connection drops; the catalog is invalidated on reconnect since
+    notifications may have been missed meanwhile.
+    """
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(settings.database_url)
+            await connection.add_listener(PRICING_CHANNEL, lambda *args: pricing_catalog.invalidate())
+            pricing_catalog.invalidate()
+            logger.info(f"👂 Listening for pricing changes on '{PRICING_CHANNEL}'")
+            while not connection.is_closed():
+                await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            break
+        except Exception as e:
+            logger.warning(f"Pricing change listener failed, retrying: {e}")
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        await asyncio.sleep(5)
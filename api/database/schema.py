@@ -0,0 +1,49 @@
+import logging
+
+from sqlalchemy import text
+
+from api.database.connection import Base, engine
+
+# Register every model on Base.metadata
+from api.models import boundary, campaign, country, geohash_cover, osm_snapshot, plan, road_index  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_lock key serializing schema creation across API workers
+SCHEMA_LOCK_KEY = 4_108_271
+
+# Keeps campaign_version.version counting campaign writes (the campaign listing ETag)
+CAMPAIGN_VERSION_DDL = [
+    "INSERT INTO campaign_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING",
+    """
+    CREATE OR REPLACE FUNCTION bump_campaign_version() RETURNS trigger AS $$
+    BEGIN
+        UPDATE campaign_version SET version = version + 1 WHERE id = 1;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE TRIGGER campaign_version_bump
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON campaign
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_campaign_version()
+    """
+]
+
+def create_schema():
+    """Create missing tables, indexes and change-counter triggers.
+
+    Workers booting together take turns on an advisory lock, so only the
+    first one issues CREATE statements and the others find the tables.
+    """
+    with engine.connect() as connection:
+        connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+        try:
+            Base.metadata.create_all(bind=connection)
+            for statement in CAMPAIGN_VERSION_DDL:
+                connection.execute(text(statement))
+            connection.commit()
+        finally:
+            connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": SCHEMA_LOCK_KEY})
+            connection.commit()
+    logger.info("Database tables created successfully")
@@ -0,0 +1,57 @@
+from sqlalchemy import text
+
+def quote_identifier(name):
+    """Quote a PostgreSQL identifier"""
+    return '"' + name.replace('"', '""') + '"'
+
+def has_gist_index(column, index_definitions):
+    """Whether one of the (lower-cased) index definitions is a GiST index on the column"""
+    column_pattern = f"({column.lower()})"
+    quoted_pattern = f"({quote_identifier(column.lower())})"
+    return any("using gist" in definition and (column_pattern in definition or quoted_pattern in definition)
+               for definition in index_definitions)
+
+def ensure_spatial_indexes(db, table_names, create=False):
+    """Check that every geometry column of the given tables has a GiST index, creating missing ones if asked"""
+    report = []
+    for table_name in table_names:
+        geometry_columns = [row[0] for row in db.execute(
+            text(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_name = :table_name AND udt_name = 'geometry' ORDER BY ordinal_position"
+            ),
+            {"table_name": table_name}
+        ).fetchall()]
+        if not geometry_columns:
+            report.append({"table": table_name, "status": "missing_table_or_geometry", "indexed": [], "created": [], "missing": []})
+            continue
+        
+        index_definitions = [row[0].lower() for row in db.execute(
+            text("SELECT indexdef FROM pg_indexes WHERE tablename = :table_name"),
+            {"table_name": table_name}
+        ).fetchall()]
+        
+        indexed, created, missing = [], [], []
+        for column in geometry_columns:
+            if has_gist_index(column, index_definitions):
+                indexed.append(column)
+            elif create:
+                index_name = quote_identifier(f"{table_name}_{column}_gist"[:63])
+                db.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS {index_name} ON {quote_identifier(table_name)} "
+                    f"USING GIST ({quote_identifier(column)})"
+                ))
+                db.execute(text(f"ANALYZE {quote_identifier(table_name)}"))
+                db.commit()
+                created.append(column)
+            else:
+                missing.append(column)
+        
+        report.append({
+            "table": table_name,
+            "status": "missing_index" if missing else "ok",
+            "indexed": indexed,
+            "created": created,
+            "missing": missing
+        })
+    return report
@@ -0,0 +1,192 @@
+import itertools
+import json
+import logging
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+
+from api.database.boundary_registry import boundary_registry
+from api.database.connection import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched per round trip from the server-side cursor
+STREAM_BATCH_SIZE = 500
+
+# Decimal digits kept in GeoJSON coordinates (~0.1 m)
+GEOJSON_MAX_DIGITS = 6
+
+GEOMETRY_FORMATS = ("geojson", "wkb", "ewkb")
+
+def parse_coordinates(value, count, name):
+    """Parse a comma-separated list of WGS84 coordinates, e.g. a bbox or a point query parameter"""
+    try:
+        numbers = [float(part) for part in value.split(",")]
+    except ValueError:
+        numbers = []
+    if len(numbers) != count:
+        raise ValueError(f"{name} must be {count} comma-separated numbers")
+    return numbers
+
+def parse_bbox(value):
+    """Parse 'minx,miny,maxx,maxy' (lon/lat)"""
+    minx, miny, maxx, maxy = parse_coordinates(value, 4, "bbox")
+    if minx > maxx or miny > maxy:
+        raise ValueError("bbox must be minx,miny,maxx,maxy")
+    return minx, miny, maxx, maxy
+
+def parse_point(value):
+    """Parse 'lon,lat'"""
+    return tuple(parse_coordinates(value, 2, "point"))
+
+def build_boundary_query(db, table_name, columns=None, region_id=None,
+                         geometry_format="geojson", simplify_tolerance=None, bbox=None, point=None):
+    """Build a boundary table query that returns one JSON text per row, rendered by PostgreSQL.
+
+    Geometry columns are converted in PostGIS: GeoJSON objects, hex WKB, or
+    the stored hex EWKB, optionally simplified first. A lon/lat bbox keeps
+    rows intersecting it and a lon/lat point keeps rows containing it; both
+    are answered from the geometry column's GiST index. Table metadata
+    comes from the boundary registry. Raises ValueError for unknown columns
+    or tables.
+    """
+    if geometry_format not in GEOMETRY_FORMATS:
+        raise ValueError(f"Unknown geometry format '{geometry_format}'")
+
+    table_info = boundary_registry.get(db, table_name)
+    column_types = table_info.column_types
+    if not table_info.exists:
+        raise ValueError(f"Boundary table '{table_name}' not found")
+
+    unknown = [col for col in columns or [] if col not in column_types]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    if region_id is not None and "id" not in column_types:
+        raise ValueError(f"Boundary table '{table_name}' has no id column")
+
+    params = {}
+    select_list = []
+    for col in columns or column_types:
+        quoted = '"' + col.replace('"', '""') + '"'
+        if column_types[col] != "geometry" or (geometry_format == "ewkb" and not simplify_tolerance):
+            select_list.append(quoted)
+            continue
+
+        expression = quoted
+        if simplify_tolerance:
+            expression = f"ST_SimplifyPreserveTopology({expression}, :tolerance)"
+            params["tolerance"] = simplify_tolerance
+        if geometry_format == "geojson":
+            expression = f"ST_AsGeoJSON({expression}, :digits)::json"
+            params["digits"] = GEOJSON_MAX_DIGITS
+        elif geometry_format == "wkb":
+            expression = f"encode(ST_AsBinary({expression}), 'hex')"
+        select_list.append(f"{expression} AS {quoted}")
+
+    conditions = []
+    if region_id is not None:
+        conditions.append("id = :region_id")
+        params["region_id"] = region_id
+    
+    if bbox is not None or point is not None:
+        geometry_columns = table_info.geometry_columns
+        if not geometry_columns:
+            raise ValueError(f"Boundary table '{table_name}' has no geometry column")
+        geom = '"' + geometry_columns[0].replace('"', '""') + '"'
+        srid = table_info.srid(geometry_columns[0])
+        if srid != 4326:
+            params["srid"] = srid
+        
+        def in_table_srid(expression):
+            return expression if srid == 4326 else f"ST_Transform({expression}, :srid)"
+        
+        if bbox is not None:
+            envelope = in_table_srid("ST_MakeEnvelope(:minx, :miny, :maxx, :maxy, 4326)")
+            conditions.append(f"ST_Intersects({geom}, {envelope})")
+            params.update(dict(zip(("minx", "miny", "maxx", "maxy"), bbox)))
+        if point is not None:
+            location = in_table_srid("ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)")
+            conditions.append(f"ST_Contains({geom}, {location})")
+            params.update({"lon": point[0], "lat": point[1]})
+    
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    query = f"SELECT row_to_json(t)::text FROM (SELECT {', '.join(select_list)} FROM {table_name}{where}) t"
+    return query, params
+
+def iter_json_batches(query, params=None, batch_size=STREAM_BATCH_SIZE):
+    """Yield batches of single-column JSON text rows, read through a server-side cursor.
+
+    The query runs on its own session, since a streaming response is still
+    being sent after the request's session has been released.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            text(query),
+            params or {},
+            execution_options={"stream_results": True, "yield_per": batch_size}
+        )
+        for batch in result.partitions(batch_size):
+            yield [row[0] for row in batch]
+    finally:
+        db.close()
+
+def start_row_stream(query, params):
+    """Run a streaming query and read its first batch now.
+
+    Returns the first batch and an iterator over the rest, so errors raised
+    while starting the query surface before any response is sent.
+    """
+    batches = iter_json_batches(query, params)
+    return next(batches, []), batches
+
+def stream_rows_json(first_batch, batches, header):
+    """Stream {**header, "rows": [...], "row_count": n} as one JSON document, batch by batch.
+
+    A read error after the first batch is re-raised, which aborts the
+    connection: the chunked body is never terminated, so clients cannot
+    mistake the truncated document for a complete one.
+    """
+    prefix = json.dumps(header)[:-1]
+    yield prefix + (', ' if header else '') + '"rows": ['
+
+    row_count = 0
+    try:
+        for batch in itertools.chain([first_batch], batches):
+            if batch:
+                yield (', ' if row_count else '') + ', '.join(batch)
+                row_count += len(batch)
+    except Exception as e:
+        logger.error(f"Boundary stream aborted after {row_count} rows: {e}")
+        raise
+
+    yield f'], "row_count": {row_count}}}'
+
+def stream_rows_ndjson(first_batch, batches, header):
+    """Stream a header line followed by one JSON line per row.
+
+    A read error after the first batch ends the stream with an
+    {"error": ..., "row_count": n} line instead of silently stopping.
+    """
+    yield json.dumps(header) + '\n'
+    row_count = 0
+    try:
+        for batch in itertools.chain([first_batch], batches):
+            if batch:
+                yield '\n'.join(batch) + '\n'
+                row_count += len(batch)
+    except Exception as e:
+        logger.error(f"Boundary stream aborted after {row_count} rows: {e}")
+        yield json.dumps({"error": f"Stream aborted: {e}", "row_count": row_count}) + '\n'
+
+def stream_boundary_rows(query, params, header, format="json"):
+    """StreamingResponse of boundary rows as one JSON document or as NDJSON.
+
+    The first batch is read before the response starts, so query errors
+    still become an HTTP error status.
+    """
+    first_batch, batches = start_row_stream(query, params)
+    if format == "ndjson":
+        return StreamingResponse(stream_rows_ndjson(first_batch, batches, header), media_type="application/x-ndjson")
+    return StreamingResponse(stream_rows_json(first_batch, batches, header), media_type="application/json")
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, JSON, Float, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, JSON, Float, ForeignKey
+from geoalchemy2 import Geometry
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from api.database.connection import Base
@@ -15,4 +16,29 @@ class Campaign(Base):
     city = Column(String(255), index=True)
     ukm_plan = Column(Float, default=1.0)
     ukm_actual = Column(Float, default=1.0)
-    persentase_ukm_actual = Column(Float, default=1.0)
\ No newline at end of file
+    persentase_ukm_actual = Column(Float, default=1.0)
+
+class CampaignVersion(Base):
+    """
+    Change counter of the campaign table (a single row with id 1), bumped by a
+    statement-level trigger on every insert, update, delete or truncate
+    """
+    __tablename__ = "campaign_version"
+    
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+class CampaignTracePoint(Base):
+    """
+    DAX trace point of a campaign (one coordinate of a reported road segment),
+    loaded in bulk through /campaign/import
+    """
+    __tablename__ = "campaign_trace_point"
+    
+    id = Column(BigInteger, primary_key=True)
+    campaign_id = Column(Integer, ForeignKey("campaign.id", ondelete="CASCADE"), index=True, nullable=False)
+    report_id = Column(String(64), nullable=True)
+    segment_id = Column(String(64), nullable=True)
+    report_user_id = Column(String(64), nullable=True)
+    recorded_at = Column(DateTime, nullable=True)
+    geom = Column(Geometry("POINT", srid=4326, spatial_index=True), nullable=False)
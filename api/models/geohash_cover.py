@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index
+from sqlalchemy.sql import func
+from api.database.connection import Base
+
+class BoundaryGeohashCover(Base):
+    """
+    Precomputed geohash cells covering a boundary, i.e. one region row of a
+    country's boundary table. Interior cells lie fully inside the boundary,
+    edge cells only intersect it.
+    """
+    __tablename__ = "boundary_geohash_cover"
+
+    id = Column(Integer, primary_key=True, index=True)
+    country_id = Column(Integer, nullable=False)
+    region_id = Column(Integer, nullable=False)
+    precision = Column(Integer, nullable=False)
+    geohash = Column(String(12), nullable=False)
+    is_interior = Column(Boolean, nullable=False, default=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_boundary_geohash_cover_lookup", "country_id", "region_id", "precision", "geohash", unique=True),
+    )
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from api.database.connection import Base
+
+class OsmSnapshotState(Base):
+    """
+    Current OSM data snapshot shared by every API worker (a single row).
+    Workers adopt it at startup and follow changes through NOTIFY.
+    """
+    __tablename__ = "osm_snapshot_state"
+
+    id = Column(Integer, primary_key=True)
+    snapshot = Column(String(50), nullable=False)
+    advanced_at = Column(DateTime, server_default=func.now())
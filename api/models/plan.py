@@ -0,0 +1,58 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Float, Boolean, JSON, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from geoalchemy2 import Geometry
+from api.database.connection import Base
+
+class CampaignPlan(Base):
+    """
+    Stored plan result (plan header). Plans of a campaign are numbered by
+    version; a plan edited through a diff points at its parent plan.
+    """
+    __tablename__ = "campaign_plan"
+
+    id = Column(String(36), primary_key=True)  # Plan handle returned by the API
+    campaign_id = Column(Integer, ForeignKey("campaign.id", ondelete="SET NULL"), nullable=True)
+    version = Column(Integer, nullable=False, default=1)
+    parent_plan_id = Column(String(36), ForeignKey("campaign_plan.id", ondelete="SET NULL"), nullable=True)
+    snapshot = Column(String(32))  # OSM snapshot the roads were read from
+    country_id = Column(Integer, nullable=True)
+    region_id = Column(Integer, nullable=True)
+    precision = Column(Integer, nullable=False)
+    top_percent = Column(Float, nullable=True)
+    total_road_segments = Column(Integer, default=0)
+    total_road_length_km = Column(Float, default=0.0)
+    failed_geohashes = Column(Integer, default=0)
+    breakdown = Column(JSON)
+    timings = Column(JSON)
+    created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("campaign_id", "version", name="uq_campaign_plan_campaign_version"),
+    )
+
+class CampaignPlanGeohash(Base):
+    """Geohash cell of a stored plan: a grid cell, a selected (dense) cell, or both"""
+    __tablename__ = "campaign_plan_geohash"
+
+    id = Column(Integer, primary_key=True)
+    plan_id = Column(String(36), ForeignKey("campaign_plan.id", ondelete="CASCADE"), index=True, nullable=False)
+    geohash = Column(String(12), nullable=False)
+    in_grid = Column(Boolean, nullable=False, default=True)
+    is_dense = Column(Boolean, nullable=False, default=False)
+    is_failed = Column(Boolean, nullable=False, default=False)  # Dense cell whose roads could not be fetched
+    poi_count = Column(Integer, nullable=True)
+    road_km = Column(Float, default=0.0)
+    geom = Column(Geometry("POLYGON", srid=4326, spatial_index=True))
+
+class CampaignPlanRoad(Base):
+    """Road segment of a stored plan, clipped to one dense geohash cell"""
+    __tablename__ = "campaign_plan_road"
+
+    id = Column(Integer, primary_key=True)
+    plan_id = Column(String(36), ForeignKey("campaign_plan.id", ondelete="CASCADE"), index=True, nullable=False)
+    geohash = Column(String(12), nullable=False)
+    osmid = Column(BigInteger, nullable=True)
+    highway = Column(String(50), nullable=True)
+    name = Column(String(255), nullable=True)
+    length_km = Column(Float, default=0.0)
+    geom = Column(Geometry("GEOMETRY", srid=4326, spatial_index=True))
@@ -0,0 +1,45 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Float, Index
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.sql import func
+from api.database.connection import Base
+
+class RoadKmIndex(Base):
+    """
+    Precomputed road length per geohash and highway class for one OSM snapshot.
+    Rows exist for precision 5, 6 and 7; a row with a NULL highway marks a cell
+    that was indexed and has no roads.
+    """
+    __tablename__ = "road_km_index"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    snapshot = Column(String(32), index=True, nullable=False)
+    geohash = Column(String(12), index=True, nullable=False)
+    precision = Column(Integer, index=True, nullable=False)
+    highway = Column(String(50), nullable=True)
+    road_km = Column(Float, default=0.0)
+    segment_count = Column(Integer, default=0)
+    created_at = Column(DateTime, server_default=func.now(), index=True)
+    
+    __table_args__ = (
+        Index("ix_road_km_index_snapshot_geohash", "snapshot", "geohash"),
+    )
+
+class RoadKmIndexWay(Base):
+    """
+    Road way counted by the road-km index for one OSM snapshot: the indexed
+    precision-6 cells it touches and its node ids. Lets OSM change files be
+    mapped to cells without the in-memory way store.
+    """
+    __tablename__ = "road_km_index_way"
+    
+    id = Column(Integer, primary_key=True)
+    snapshot = Column(String(32), nullable=False)
+    osmid = Column(BigInteger, nullable=False)
+    geohashes = Column(ARRAY(String(12)), nullable=False)
+    nodes = Column(ARRAY(BigInteger), nullable=True)
+    
+    __table_args__ = (
+        Index("ix_road_km_index_way_snapshot_osmid", "snapshot", "osmid", unique=True),
+        Index("ix_road_km_index_way_geohashes", "geohashes", postgresql_using="gin"),
+        Index("ix_road_km_index_way_nodes", "nodes", postgresql_using="gin"),
+    )
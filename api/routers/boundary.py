@@ -1,10 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import json
 import logging
 from sqlalchemy import table, text
+from typing import Optional
 
-from api.database.connection import get_db
+from api.database.boundary_registry import boundary_registry, configured_boundary_tables
+from api.database.connection import get_async_db, get_db
+from api.database.spatial_index import ensure_spatial_indexes
+from api.database.streaming import (
+    build_boundary_query, parse_bbox, parse_point, stream_boundary_rows
+)
 from api.schemas.boundary import (BoundarySchemas, BoundaryRequest)
 from api.models.boundary import Boundary
 
@@ -18,13 +25,13 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/boundary", tags=["boundary"])
 
 @router.get("/all")
-async def get_all_countries(db: Session = Depends(get_db)):
+async def get_all_countries(db: AsyncSession = Depends(get_async_db)):
     query = text(
         """
         select * from boundary
     """
     )
-    result = db.execute(query)
+    result = await db.execute(query)
     data = []
     for row in result:
         data.append(
@@ -37,15 +44,21 @@ async def get_all_countries(db: Session = Depends(get_db)):
     return data
 
 
+@router.get("/admin/registry", tags=["🗺️ Boundary by Country"])
+def get_boundary_registry():
+    """Cached boundary table metadata: columns, geometry type and SRID, row estimate and GiST index status"""
+    return boundary_registry.stats()
+
+
 @router.get("/{id}")
-async def get_all_countries(id: int, db: Session = Depends(get_db)):
+async def get_all_countries(id: int, db: AsyncSession = Depends(get_async_db)):
     query = text(
         """
         select * from boundary
         where id = :id
     """
     )
-    result = db.execute(query, {"id": id})
+    result = await db.execute(query, {"id": id})
     data = []
     for row in result:
         data.append(
@@ -59,7 +72,13 @@ async def get_all_countries(id: int, db: Session = Depends(get_db)):
 
 
 @router.post("/", tags=["🗺️ Boundary by Country"])
-def get_boundary_by_country(req: BoundaryRequest, db: Session = Depends(get_db)):
+def get_boundary_by_country(
+    req: BoundaryRequest,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    bbox: Optional[str] = Query(None, description="minx,miny,maxx,maxy (lon/lat): rows intersecting the box"),
+    point: Optional[str] = Query(None, description="lon,lat: rows containing the point"),
+    db: Session = Depends(get_db)
+):
     # 1. Cari informasi tabel dari boundary
     boundary = db.query(Boundary).filter(Boundary.id == req.country_id).first()
     if not boundary:
@@ -68,11 +87,48 @@ def get_boundary_by_country(req: BoundaryRequest, db: Session = Depends(get_db))
     # 2. Ambil nama tabel dari kolom 'table'
     table_name = boundary.table
 
-    # 3. Buat query dinamis ke tabel tersebut
-    query = text(f"SELECT * FROM {table_name}")
-    result = db.execute(query)
-    # 4. Ubah ke format list of dicts
-    columns = result.keys()
-    data = [dict(zip(columns, row)) for row in result.fetchall()]
+    # 3. Bangun query; geometri dikonversi di PostGIS
+    try:
+        query, params = build_boundary_query(
+            db, table_name, req.columns, req.region_id, req.geometry_format, req.simplify_tolerance,
+            bbox=parse_bbox(bbox) if bbox else None,
+            point=parse_point(point) if point else None
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 4. Stream baris tabel lewat server-side cursor (JSON atau NDJSON)
+    header = {"table": table_name, "geometry_format": req.geometry_format}
+    try:
+        return stream_boundary_rows(query, params, header, format)
+    except Exception as e:
+        logger.error(f"Error streaming boundary table '{table_name}': {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get boundary data: {str(e)}")
+
+
+@router.post("/admin/spatial-indexes", tags=["🗺️ Boundary by Country"])
+def check_boundary_spatial_indexes(create: bool = False, db: Session = Depends(get_db)):
+    """Verify (or with create=true, create) GiST indexes on every configured boundary table"""
+    try:
+        tables = configured_boundary_tables(db)
+
+        report = ensure_spatial_indexes(db, sorted(tables), create=create)
+        if any(entry["created"] for entry in report):
+            boundary_registry.refresh(db, [entry["table"] for entry in report if entry["created"]])
+        logger.info(f"Checked spatial indexes on {len(report)} boundary tables (create={create})")
+        return {"success": True, "tables": report}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error checking spatial indexes: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to check spatial indexes: {str(e)}")
+
 
-    return {"table": table_name, "rows": data}
\ No newline at end of file
+@router.post("/admin/registry/refresh", tags=["🗺️ Boundary by Country"])
+def refresh_boundary_registry(table: Optional[str] = None, db: Session = Depends(get_db)):
+    """Reload boundary table metadata from the catalog (one table, or every configured table)"""
+    try:
+        tables = boundary_registry.refresh(db, [table] if table else None)
+        return {"success": True, "tables": [info.as_dict() for _, info in sorted(tables.items())]}
+    except Exception as e:
+        logger.error(f"Error refreshing boundary registry: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to refresh boundary registry: {str(e)}")
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+import base64
 import json
 import logging
 from sqlalchemy import table, text
+from typing import Optional
 
-from api.database.connection import get_db
+from api.database.connection import get_async_db
+from api.database.bulk_import import import_campaigns, import_trace_points
+from api.database.etag import etag_matches, make_etag, not_modified
 from api.schemas.campaign import CampaignSchemas
 from api.models.campaign import Campaign
 
@@ -17,60 +21,172 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/campaign", tags=["campaign"])
 
-@router.get("/all")
-async def get_all_campaigns(db: Session = Depends(get_db)):
-    query = text(
-        """
-        select * from campaign
+# Page size when a cursor is given without a limit
+CAMPAIGN_PAGE_SIZE = 1000
+
+CAMPAIGN_FIELDS = ["id", "campaign_name", "country", "city", "ukm_plan", "ukm_actual", "persentase_ukm_actual"]
+
+def selected_fields(fields):
+    """Whitelisted columns for a comma-separated field list (id is always included)"""
+    if not fields:
+        return CAMPAIGN_FIELDS
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in CAMPAIGN_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return [field for field in CAMPAIGN_FIELDS if field == "id" or field in requested]
+
+def campaign_filters(country, city, name_prefix):
+    """WHERE conditions and parameters for the campaign listing filters"""
+    conditions, params = [], {}
+    if country:
+        conditions.append("country = :country")
+        params["country"] = country
+    if city:
+        conditions.append("city = :city")
+        params["city"] = city
+    if name_prefix:
+        conditions.append("campaign_name LIKE :name_prefix ESCAPE '\\'")
+        escaped = name_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        params["name_prefix"] = escaped + "%"
+    return conditions, params
+
+async def campaign_etag(request: Request, db: AsyncSession):
+    """ETag of a campaign listing: the table's change counter plus the request's path and query.
+
+    campaign_version is bumped by a trigger on every campaign write, so the
+    check is a single primary-key read. Returns None (no ETag) when the
+    counter has not been set up.
     """
+    version = (await db.execute(text("select version from campaign_version where id = 1"))).scalar()
+    if version is None:
+        return None
+    return make_etag(version, request.url.path, request.url.query)
+
+def encode_cursor(values):
+    """Opaque page cursor holding the last row's sort key and id"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor, size):
+    """Sort key values of a cursor from encode_cursor; raises HTTPException 400 when malformed"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or len(values) != size or not isinstance(values[-1], int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+def keyset_condition(sort_column, after, params):
+    """WHERE condition for rows after a cursor in (sort_column NULLS LAST, id) order"""
+    params["after_id"] = after[-1]
+    if sort_column is None:
+        return "id > :after_id"
+    if after[0] is None:
+        return f"({sort_column} is null and id > :after_id)"
+    params["after_value"] = after[0]
+    return (
+        f"({sort_column} > :after_value or ({sort_column} = :after_value and id > :after_id)"
+        f" or {sort_column} is null)"
     )
-    result = db.execute(query)
-    data = []
-    for row in result:
-        data.append(
-            CampaignSchemas(
-                id=row.id,
-                campaign_name=row.campaign_name,
-                country=row.country,
-                city=row.city,
-                ukm_plan=row.ukm_plan,
-                ukm_actual=row.ukm_actual,
-                persentase_ukm_actual=row.persentase_ukm_actual
-            )
+
+async def list_campaigns(request, response, db, columns, sort_column, limit, cursor, country, city, name_prefix):
+    """Keyset-paginated campaign rows ordered by sort_column (NULLs last) then id, or by id alone.
+
+    The cursor carries the last row's sort key and id, so paging does not
+    depend on that row still existing; X-Next-Cursor holds the next one.
+    A cursor is either a token from encode_cursor or, for id order, a list
+    holding the last id. Without limit and cursor every matching row is
+    returned.
+    """
+    if limit is None and cursor is not None:
+        limit = CAMPAIGN_PAGE_SIZE
+    etag = await campaign_etag(request, db)
+    if etag and etag_matches(request, etag):
+        return not_modified(etag)
+    
+    conditions, params = campaign_filters(country, city, name_prefix)
+    if cursor is not None:
+        after = cursor if isinstance(cursor, list) else decode_cursor(cursor, 1 if sort_column is None else 2)
+        conditions.append(keyset_condition(sort_column, after, params))
+    where = f" where {' and '.join(conditions)}" if conditions else ""
+    order_by = "id" if sort_column is None else f"{sort_column} nulls last, id"
+    limit_clause = ""
+    if limit is not None:
+        limit_clause = " limit :limit"
+        params["limit"] = limit + 1
+    
+    result = await db.execute(
+        text(f"select {', '.join(columns)} from campaign{where} order by {order_by}{limit_clause}"),
+        params
+    )
+    rows = [dict(row) for row in result.mappings()]
+    
+    if etag:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(
+            [last["id"]] if sort_column is None else [last[sort_column], last["id"]]
         )
-    return data
+    return rows
+
+@router.get("/all")
+async def get_all_campaigns(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    after_id: Optional[int] = Query(None, description="Continue after this campaign id"),
+    country: Optional[str] = None,
+    city: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return (id is always included)"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List campaigns by id with keyset pagination, filters and field selection"""
+    if cursor is None and after_id is not None:
+        cursor = [after_id]
+    return await list_campaigns(
+        request, response, db, selected_fields(fields), None, limit, cursor, country, city, name_prefix
+    )
 
 
 @router.get("/names")
-async def get_campaign_names(db: Session = Depends(get_db)):
-    """Get all campaign names for dropdown selection"""
-    query = text(
-        """
-        select id, campaign_name from campaign 
-        order by campaign_name
-        """
+async def get_campaign_names(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=10000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    country: Optional[str] = None,
+    city: Optional[str] = None,
+    name_prefix: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get campaign names for dropdown selection, ordered by name"""
+    return await list_campaigns(
+        request, response, db, ["id", "campaign_name"], "campaign_name", limit, cursor, country, city, name_prefix
     )
-    result = db.execute(query)
-    data = []
-    for row in result:
-        data.append({
-            "id": row.id,
-            "campaign_name": row.campaign_name
-        })
-    return data
 
 
 @router.get("/{id}")
-async def get_all_campaigns_id(id: int, db: Session = Depends(get_db)):
+async def get_all_campaigns_id(id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     query = text(
         """
         select * from campaign
         where id = :id
     """
     )
-    result = db.execute(query, {"id": id})
+    rows = (await db.execute(query, {"id": id})).all()
+    # Hash of the row itself, so writes to other campaigns keep it valid
+    etag = make_etag(id, *[tuple(row) for row in rows])
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    
     data = []
-    for row in result:
+    for row in rows:
         data.append(
             CampaignSchemas(
                 id=row.id,
@@ -82,4 +198,30 @@ async def get_all_campaigns_id(id: int, db: Session = Depends(get_db)):
                 persentase_ukm_actual=row.persentase_ukm_actual
             )
         )
-    return data
\ No newline at end of file
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return data
+
+
+@router.post("/import")
+def import_campaign_data(
+    file: UploadFile = File(...),
+    kind: str = Query("campaigns", pattern="^(campaigns|traces)$"),
+    campaign_id: Optional[int] = Query(None, description="Campaign of every trace point (traces only)"),
+    replace: bool = Query(False, description="Replace the campaigns' existing trace points (traces only)")
+):
+    """Bulk load campaigns (upsert by campaign_name) or DAX trace points from CSV or Parquet via COPY"""
+    try:
+        if kind == "campaigns":
+            result = import_campaigns(file.file, file.filename)
+        else:
+            result = import_trace_points(file.file, file.filename, campaign_id, replace)
+        
+        logger.info(f"📥 Imported {kind} from '{file.filename}': {result}")
+        return {"success": True, "kind": kind, "filename": file.filename, **result}
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error importing {kind}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to import {kind}: {str(e)}")
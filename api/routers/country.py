@@ -1,11 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 import json
 import logging
-from sqlalchemy import table, text
-from typing import List
+from sqlalchemy import select, table, text
+from typing import List, Optional
 
-from api.database.connection import get_db
+from api.database.boundary_registry import boundary_registry
+from api.database.connection import get_async_db, get_db
+from api.database.etag import etag_matches, not_modified
+from api.database.pricing_catalog import notify_pricing_changed, pricing_catalog, safe_getattr
+from api.database.streaming import (
+    build_boundary_query, parse_bbox, parse_point, stream_boundary_rows
+)
 from api.schemas.country import (
     CountrySchemas, CountryRequest, CountryPricingResponse, UpdateCountryPricingRequest,
     RegionSchemas, RegionRequest, RegionPricingResponse, CreateRegionRequest, UpdateRegionRequest
@@ -21,18 +28,24 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/country", tags=["country"])
 
-def safe_getattr(obj, attr, default=None):
-    """Safely get attribute from object, return default if not exists"""
-    try:
-        return getattr(obj, attr, default)
-    except:
-        return default
+async def pricing_snapshot(response: Response, db: AsyncSession):
+    """Loaded pricing catalog, with its ETag set on the response"""
+    catalog = await pricing_catalog.get(db)
+    response.headers["ETag"] = catalog.etag
+    response.headers["Cache-Control"] = "no-cache"
+    return catalog
+
+async def pricing_changed(db: AsyncSession):
+    """Commit a pricing write and drop the pricing catalog (on every worker when NOTIFY is enabled)"""
+    await notify_pricing_changed(db)
+    await db.commit()
+    pricing_catalog.invalidate()
 
 @router.get("/all")
-async def get_all_countries(db: Session = Depends(get_db)):
+async def get_all_countries(db: AsyncSession = Depends(get_async_db)):
     try:
         # Try using ORM first
-        countries = db.query(Country).all()
+        countries = (await db.execute(select(Country))).scalars().all()
         
         if countries:
             data = []
@@ -62,7 +75,7 @@ async def get_all_countries(db: Session = Depends(get_db)):
         logger.warning(f"ORM query failed, trying raw SQL: {e}")
         try:
             query = text("SELECT * FROM country")
-            result = db.execute(query)
+            result = await db.execute(query)
             data = []
             for row in result:
                 data.append(
@@ -86,49 +99,26 @@ async def get_all_countries(db: Session = Depends(get_db)):
             return []
 
 @router.get("/pricing", response_model=List[CountryPricingResponse])
-async def get_countries_with_pricing(db: Session = Depends(get_db)):
+async def get_countries_with_pricing(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """Get all countries with their pricing information for forecast calculations"""
-    query = text(
-        """
-        select * from country
-    """
-    )
-    result = db.execute(query)
-    data = []
-    for row in result:
-        data.append(
-            CountryPricingResponse(
-                id=row.id,
-                name=row.name,
-                currency=row.currency,
-                currency_symbol=row.currency_symbol,
-                exchange_rate_to_usd=0.000063,
-                regions=[]
-            )
-        )
-    return data
-
-            
+    catalog = await pricing_snapshot(response, db)
+    if etag_matches(request, catalog.etag):
+        return not_modified(catalog.etag)
+    return catalog.country_list
 
 @router.get("/pricing/{country_id}", response_model=CountryPricingResponse)
-async def get_country_pricing(country_id: int, db: Session = Depends(get_db)):
+async def get_country_pricing(country_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """Get pricing information for a specific country"""
     try:
-        country = db.query(Country).filter(Country.id == country_id).first()
+        catalog = await pricing_snapshot(response, db)
+        if etag_matches(request, catalog.etag):
+            return not_modified(catalog.etag)
         
+        country = catalog.countries.get(country_id)
         if not country:
             raise HTTPException(status_code=404, detail="Country not found")
         
-        return CountryPricingResponse(
-            id=country.id,
-            name=country.name,
-            currency=safe_getattr(country, 'currency', 'USD'),
-            currency_symbol=safe_getattr(country, 'currency_symbol', '$'),
-            ukm_price=safe_getattr(country, 'ukm_price', 8000.0),
-            insurance=safe_getattr(country, 'insurance_per_dax_per_month', 132200.0),
-            dataplan=safe_getattr(country, 'dataplan_per_dax_per_month', 450000.0),
-            exchange_rate_to_usd=safe_getattr(country, 'exchange_rate_to_usd', 1.0)
-        )
+        return country
         
     except HTTPException:
         raise
@@ -140,11 +130,11 @@ async def get_country_pricing(country_id: int, db: Session = Depends(get_db)):
 async def update_country_pricing(
     country_id: int, 
     pricing_data: UpdateCountryPricingRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Update pricing information for a specific country"""
     try:
-        country = db.query(Country).filter(Country.id == country_id).first()
+        country = (await db.execute(select(Country).where(Country.id == country_id))).scalars().first()
         
         if not country:
             raise HTTPException(status_code=404, detail="Country not found")
@@ -169,8 +159,8 @@ async def update_country_pricing(
             if hasattr(country, 'exchange_rate_to_usd'):
                 country.exchange_rate_to_usd = pricing_data.exchange_rate_to_usd
         
-        db.commit()
-        db.refresh(country)
+        await pricing_changed(db)
+        await db.refresh(country)
         
         return CountryPricingResponse(
             id=country.id,
@@ -192,74 +182,31 @@ async def update_country_pricing(
 # ========== REGION ENDPOINTS ==========
 
 @router.get("/regions", response_model=List[RegionPricingResponse])
-async def get_all_regions_with_pricing(db: Session = Depends(get_db)):
+async def get_all_regions_with_pricing(request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """Get all regions with calculated pricing information"""
     try:
-        regions = db.query(Region).join(Country).all()
+        catalog = await pricing_snapshot(response, db)
+        if etag_matches(request, catalog.etag):
+            return not_modified(catalog.etag)
         
-        pricing_data = []
-        for region in regions:
-            country = region.country
-            
-            # Calculate regional prices
-            regional_ukm_price = (country.ukm_price or 8000.0) * (region.ukm_price_multiplier or 1.0)
-            regional_insurance = (country.insurance_per_dax_per_month or 132200.0) * (region.insurance_multiplier or 1.0)
-            regional_dataplan = (country.dataplan_per_dax_per_month or 450000.0) * (region.dataplan_multiplier or 1.0)
-            
-            pricing_data.append(RegionPricingResponse(
-                id=region.id,
-                name=region.name,
-                country_id=region.country_id,
-                country_name=country.name,
-                currency=safe_getattr(country, 'currency', 'USD'),
-                currency_symbol=safe_getattr(country, 'currency_symbol', '$'),
-                regional_ukm_price=regional_ukm_price,
-                regional_insurance=regional_insurance,
-                regional_dataplan=regional_dataplan,
-                regional_overhead=region.regional_overhead or 0.0,
-                transportation_cost=region.transportation_cost or 0.0,
-                exchange_rate_to_usd=safe_getattr(country, 'exchange_rate_to_usd', 1.0)
-            ))
-        
-        return pricing_data
+        return list(catalog.regions.values())
         
     except Exception as e:
         logger.error(f"Error getting all regions: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get regions: {str(e)}")
 
 @router.get("/regions/country/{country_id}", response_model=List[RegionPricingResponse])
-async def get_regions_by_country(country_id: int, db: Session = Depends(get_db)):
+async def get_regions_by_country(country_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """Get all regions for a specific country with pricing"""
     try:
-        country = db.query(Country).filter(Country.id == country_id).first()
-        if not country:
+        catalog = await pricing_snapshot(response, db)
+        if etag_matches(request, catalog.etag):
+            return not_modified(catalog.etag)
+        
+        if country_id not in catalog.countries:
             raise HTTPException(status_code=404, detail="Country not found")
         
-        regions = db.query(Region).filter(Region.country_id == country_id).all()
-        
-        pricing_data = []
-        for region in regions:
-            # Calculate regional prices
-            regional_ukm_price = (country.ukm_price or 8000.0) * (region.ukm_price_multiplier or 1.0)
-            regional_insurance = (country.insurance_per_dax_per_month or 132200.0) * (region.insurance_multiplier or 1.0)
-            regional_dataplan = (country.dataplan_per_dax_per_month or 450000.0) * (region.dataplan_multiplier or 1.0)
-            
-            pricing_data.append(RegionPricingResponse(
-                id=region.id,
-                name=region.name,
-                country_id=region.country_id,
-                country_name=country.name,
-                currency=safe_getattr(country, 'currency', 'USD'),
-                currency_symbol=safe_getattr(country, 'currency_symbol', '$'),
-                regional_ukm_price=regional_ukm_price,
-                regional_insurance=regional_insurance,
-                regional_dataplan=regional_dataplan,
-                regional_overhead=region.regional_overhead or 0.0,
-                transportation_cost=region.transportation_cost or 0.0,
-                exchange_rate_to_usd=safe_getattr(country, 'exchange_rate_to_usd', 1.0)
-            ))
-        
-        return pricing_data
+        return catalog.regions_by_country.get(country_id, [])
         
     except HTTPException:
         raise
@@ -268,35 +215,18 @@ async def get_regions_by_country(country_id: int, db: Session = Depends(get_db))
         raise HTTPException(status_code=500, detail=f"Failed to get regions for country: {str(e)}")
 
 @router.get("/regions/{region_id}", response_model=RegionPricingResponse)
-async def get_region_pricing(region_id: int, db: Session = Depends(get_db)):
+async def get_region_pricing(region_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
     """Get pricing information for a specific region"""
     try:
-        region = db.query(Region).join(Country).filter(Region.id == region_id).first()
+        catalog = await pricing_snapshot(response, db)
+        if etag_matches(request, catalog.etag):
+            return not_modified(catalog.etag)
         
+        region = catalog.regions.get(region_id)
         if not region:
             raise HTTPException(status_code=404, detail="Region not found")
         
-        country = region.country
-        
-        # Calculate regional prices
-        regional_ukm_price = (country.ukm_price or 8000.0) * (region.ukm_price_multiplier or 1.0)
-        regional_insurance = (country.insurance_per_dax_per_month or 132200.0) * (region.insurance_multiplier or 1.0)
-        regional_dataplan = (country.dataplan_per_dax_per_month or 450000.0) * (region.dataplan_multiplier or 1.0)
-        
-        return RegionPricingResponse(
-            id=region.id,
-            name=region.name,
-            country_id=region.country_id,
-            country_name=country.name,
-            currency=safe_getattr(country, 'currency', 'USD'),
-            currency_symbol=safe_getattr(country, 'currency_symbol', '$'),
-            regional_ukm_price=regional_ukm_price,
-            regional_insurance=regional_insurance,
-            regional_dataplan=regional_dataplan,
-            regional_overhead=region.regional_overhead or 0.0,
-            transportation_cost=region.transportation_cost or 0.0,
-            exchange_rate_to_usd=safe_getattr(country, 'exchange_rate_to_usd', 1.0)
-        )
+        return region
         
     except HTTPException:
         raise
@@ -305,11 +235,11 @@ async def get_region_pricing(region_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Failed to get region pricing: {str(e)}")
 
 @router.post("/regions", response_model=RegionSchemas)
-async def create_region(region_data: CreateRegionRequest, db: Session = Depends(get_db)):
+async def create_region(region_data: CreateRegionRequest, db: AsyncSession = Depends(get_async_db)):
     """Create a new region"""
     try:
         # Check if country exists
-        country = db.query(Country).filter(Country.id == region_data.country_id).first()
+        country = (await db.execute(select(Country).where(Country.id == region_data.country_id))).scalars().first()
         if not country:
             raise HTTPException(status_code=404, detail="Country not found")
         
@@ -325,8 +255,8 @@ async def create_region(region_data: CreateRegionRequest, db: Session = Depends(
         )
         
         db.add(region)
-        db.commit()
-        db.refresh(region)
+        await pricing_changed(db)
+        await db.refresh(region)
         
         return RegionSchemas(
             id=region.id,
@@ -348,10 +278,10 @@ async def create_region(region_data: CreateRegionRequest, db: Session = Depends(
         raise HTTPException(status_code=500, detail=f"Failed to create region: {str(e)}")
 
 @router.put("/regions/{region_id}", response_model=RegionSchemas)
-async def update_region(region_id: int, region_data: UpdateRegionRequest, db: Session = Depends(get_db)):
+async def update_region(region_id: int, region_data: UpdateRegionRequest, db: AsyncSession = Depends(get_async_db)):
     """Update region information"""
     try:
-        region = db.query(Region).filter(Region.id == region_id).first()
+        region = (await db.execute(select(Region).where(Region.id == region_id))).scalars().first()
         
         if not region:
             raise HTTPException(status_code=404, detail="Region not found")
@@ -370,8 +300,8 @@ async def update_region(region_id: int, region_data: UpdateRegionRequest, db: Se
         if region_data.transportation_cost is not None:
             region.transportation_cost = region_data.transportation_cost
         
-        db.commit()
-        db.refresh(region)
+        await pricing_changed(db)
+        await db.refresh(region)
         
         return RegionSchemas(
             id=region.id,
@@ -393,16 +323,16 @@ async def update_region(region_id: int, region_data: UpdateRegionRequest, db: Se
         raise HTTPException(status_code=500, detail=f"Failed to update region: {str(e)}")
 
 @router.delete("/regions/{region_id}")
-async def delete_region(region_id: int, db: Session = Depends(get_db)):
+async def delete_region(region_id: int, db: AsyncSession = Depends(get_async_db)):
     """Delete a region"""
     try:
-        region = db.query(Region).filter(Region.id == region_id).first()
+        region = (await db.execute(select(Region).where(Region.id == region_id))).scalars().first()
         
         if not region:
             raise HTTPException(status_code=404, detail="Region not found")
         
-        db.delete(region)
-        db.commit()
+        await db.delete(region)
+        await pricing_changed(db)
         
         return {"message": f"Region '{region.name}' deleted successfully"}
         
@@ -413,9 +343,9 @@ async def delete_region(region_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Failed to delete region: {str(e)}")
 
 @router.get("/{id}")
-async def get_country_by_id(id: int, db: Session = Depends(get_db)):
+async def get_country_by_id(id: int, db: AsyncSession = Depends(get_async_db)):
     try:
-        country = db.query(Country).filter(Country.id == id).first()
+        country = (await db.execute(select(Country).where(Country.id == id))).scalars().first()
         if not country:
             raise HTTPException(status_code=404, detail="Country not found")
         
@@ -439,7 +369,14 @@ async def get_country_by_id(id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Failed to get country: {str(e)}")
 
 @router.post("/", tags=["🗺️ Boundary by Country"])
-def get_boundary_by_country(req: CountryRequest, db: Session = Depends(get_db)):
+def get_boundary_by_country(
+    req: CountryRequest,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    bbox: Optional[str] = Query(None, description="minx,miny,maxx,maxy (lon/lat): rows intersecting the box"),
+    point: Optional[str] = Query(None, description="lon,lat: rows containing the point"),
+    db: Session = Depends(get_db)
+):
+    """Stream a country's boundary table rows as one JSON document or as NDJSON"""
     try:
         # 1. Get country information
         country = db.query(Country).filter(Country.id == req.country_id).first()
@@ -458,72 +395,31 @@ def get_boundary_by_country(req: CountryRequest, db: Session = Depends(get_db)):
                 "message": f"No boundary data table configured for {country.name}. Please configure the boundary data table in the country settings."
             }
 
-        # 3. Check if boundary table exists
-        try:
-            check_query = text("SELECT 1 FROM information_schema.tables WHERE table_name = :table_name")
-            table_exists = db.execute(check_query, {"table_name": table}).fetchone()
-            
-            if not table_exists:
-                logger.warning(f"Boundary table '{table}' does not exist for country {country.name}")
-                return {
-                    "table": table, 
-                    "rows": [],
-                    "message": f"Boundary data table '{table}' not found for {country.name}. Please contact administrator to set up the boundary data."
-                }
-        except Exception as table_check_error:
-            logger.warning(f"Could not check if boundary table exists: {table_check_error}")
-            # Continue with the original query attempt
-
-        # 4. Query the boundary table
-        try:
-            query = text(f"SELECT * FROM {table}")
-            result = db.execute(query)
-            columns = result.keys()
-            
-            # Convert rows to dictionaries with proper data type handling
-            boundary_data = []
-            for row in result.fetchall():
-                row_dict = {}
-                for i, col in enumerate(columns):
-                    value = row[i]
-                    # Handle different PostgreSQL data types
-                    if value is not None:
-                        if hasattr(value, 'decode'):  # Handle bytes
-                            try:
-                                row_dict[col] = value.decode('utf-8')
-                            except:
-                                row_dict[col] = str(value)
-                        else:
-                            row_dict[col] = value
-                    else:
-                        row_dict[col] = None
-                boundary_data.append(row_dict)
-
-            if not boundary_data:
-                return {
-                    "table": table, 
-                    "rows": [],
-                    "message": f"No boundary data found in table '{table}' for {country.name}."
-                }
-
-            logger.info(f"Successfully retrieved {len(boundary_data)} boundary records from table '{table}' for {country.name}")
+        # 3. Check if boundary table exists (from the cached boundary registry)
+        if not boundary_registry.get(db, table).exists:
+            logger.warning(f"Boundary table '{table}' does not exist for country {country.name}")
             return {
                 "table": table, 
-                "rows": boundary_data,
-                "country_name": country.name,
-                "country_id": country.id
+                "rows": [],
+                "message": f"Boundary data table '{table}' not found for {country.name}. Please contact administrator to set up the boundary data."
             }
 
-        except Exception as query_error:
-            logger.error(f"Error querying boundary table '{table}': {query_error}")
-            if "does not exist" in str(query_error).lower() or "no such table" in str(query_error).lower():
-                return {
-                    "table": table, 
-                    "rows": [],
-                    "message": f"Boundary data table '{table}' not found for {country.name}. Please contact administrator."
-                }
-            else:
-                raise HTTPException(status_code=500, detail=f"Failed to query boundary data: {str(query_error)}")
+        # 4. Stream the boundary table through a server-side cursor, with geometry rendered by PostGIS
+        try:
+            query, params = build_boundary_query(
+                db, table, req.columns, req.region_id, req.geometry_format, req.simplify_tolerance,
+                bbox=parse_bbox(bbox) if bbox else None,
+                point=parse_point(point) if point else None
+            )
+        except ValueError as query_error:
+            raise HTTPException(status_code=400, detail=str(query_error))
+        
+        header = {
+            "table": table, "country_name": country.name, "country_id": country.id,
+            "geometry_format": req.geometry_format
+        }
+        logger.info(f"Streaming boundary records from table '{table}' for {country.name} as {format}")
+        return stream_boundary_rows(query, params, header, format)
         
     except HTTPException:
         raise
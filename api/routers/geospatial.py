@@ -12,48 +12,58 @@ import geopandas as gpd
 import osmnx as ox
 import geohash2
 from shapely.geometry import Polygon
-from collections import Counter
+from collections import Counter, OrderedDict
 import io
 import asyncio
-from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, ProcessPoolExecutor, wait
 import numpy as np
 from functools import lru_cache
 import hashlib
+import re
+import threading
+from array import array
+import requests
 
-from api.database.connection import get_db
+from api.database.connection import get_db, SessionLocal
+from api.database.osm_snapshot import load_osm_snapshot, save_osm_snapshot
+from config import settings
+from api.models.road_index import RoadKmIndex, RoadKmIndexWay
+from api.models.geohash_cover import BoundaryGeohashCover
+from api.models.plan import CampaignPlan, CampaignPlanGeohash, CampaignPlanRoad
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/geospatial", tags=["geospatial"])
 
-# Enhanced caching system
-osm_cache_with_ttl = {}
-CACHE_TTL = 3600  # 1 hour cache
+# OSM data snapshot every cache entry is tagged with. Entries stay valid for
+# as long as the snapshot is current; admins advance it deliberately. The
+# osm_snapshot_state table holds the id shared by all API workers.
+osm_snapshot = {
+    "id": settings.OSM_SNAPSHOT or datetime.now().strftime("%Y-%m-%d"),
+    "pinned": settings.OSM_SNAPSHOT_PIN_QUERIES,
+    "advanced_at": datetime.now().isoformat()
+}
+
+OSM_SNAPSHOT_DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# Background re-fetches started when the snapshot is advanced
+snapshot_refreshes = set()
+
+def current_osm_snapshot():
+    """Id of the current OSM data snapshot"""
+    return osm_snapshot["id"]
 
 def is_cache_valid(cache_entry):
-    """Check if cache entry is still valid"""
-    return time.time() - cache_entry['timestamp'] < CACHE_TTL
-
-def get_from_cache(cache_key):
-    """Get data from cache if valid"""
-    if cache_key in osm_cache_with_ttl:
-        if is_cache_valid(osm_cache_with_ttl[cache_key]):
-            return osm_cache_with_ttl[cache_key]['data']
-        else:
-            # Remove expired cache
-            del osm_cache_with_ttl[cache_key]
-    return None
-
-def save_to_cache(cache_key, data):
-    """Save data to cache with timestamp"""
-    osm_cache_with_ttl[cache_key] = {
-        'data': data,
-        'timestamp': time.time()
-    }
+    """Check if cache entry belongs to the current OSM snapshot"""
+    return cache_entry.get('snapshot') == current_osm_snapshot()
 
 # Pydantic models for request/response
 class BoundaryToGeohashRequest(BaseModel):
-    boundary_geojson: Dict[str, Any]
+    # Boundary reference: either a GeoJSON boundary, or a region row id in the
+    # country's boundary table (answered from the precomputed geohash cover)
+    boundary_geojson: Optional[Dict[str, Any]] = None
+    country_id: Optional[int] = None
+    region_id: Optional[int] = None
     precision: int = Field(default=6, ge=5, le=7)
 
 class ExtractGeojsonRequest(BaseModel):
@@ -67,6 +77,13 @@ class GetBoundsRequest(BaseModel):
 
 class CalculateTargetUkmRequest(BaseModel):
     geohashes: List[str]
+    return_geojson: bool = Field(default=False)
+
+class RoadKmBreakdownRow(BaseModel):
+    geohash: str
+    highway: str
+    road_km: float
+    segment_count: int
 
 class CalculateTargetUkmResponse(BaseModel):
     success: bool
@@ -74,27 +91,48 @@ class CalculateTargetUkmResponse(BaseModel):
     total_road_length_km: float
     processed_geohashes: int
     failed_geohashes: int
+    breakdown: List[RoadKmBreakdownRow] = []
     roads_geojson: Optional[Dict[str, Any]] = None
 
 class CalculateTargetUkmAdvancedRequest(BaseModel):
     geohashes: List[str]
     chunk_size: int = Field(default=10, ge=5, le=50)
     max_workers: int = Field(default=8, ge=2, le=16)
-    use_cache: bool = Field(default=False)
-    return_geojson: bool = Field(default=True)
+    # Reuse tiles already in the way store, so a retry after a deadline completes from them
+    use_cache: bool = Field(default=True)
+    return_geojson: bool = Field(default=False)
     background_task: bool = Field(default=False)
+    # Answer indexed geohashes from the road-km index (only when no GeoJSON is requested)
+    use_index: bool = Field(default=False)
+    index_snapshot: Optional[str] = None
+    # Return finished geohashes when the deadline is reached; the rest continue in the background
+    deadline_seconds: Optional[float] = Field(default=None, gt=0)
+
+class UkmEstimate(BaseModel):
+    total_road_length_km: Optional[float] = None
+    low_km: Optional[float] = None
+    high_km: Optional[float] = None
+    confidence: float
+    exact_geohashes: int
+    estimated_geohashes: int
+    unestimated_geohashes: int
+    basis: str
 
 class CalculateTargetUkmAdvancedResponse(BaseModel):
     success: bool
+    status: str = "completed"
     total_road_segments: int
     total_road_length_km: float
     processed_geohashes: int
     failed_geohashes: int
+    pending_geohashes: int = 0
     processing_time_seconds: float
     cache_hits: int
     cache_misses: int
+    breakdown: List[RoadKmBreakdownRow] = []
     roads_geojson: Optional[Dict[str, Any]] = None
     task_id: Optional[str] = None  # For background tasks
+    estimate: Optional[UkmEstimate] = None
     
 class CompleteAnalysisRequest(BaseModel):
     boundary_geojson: Dict[str, Any]
@@ -117,6 +155,111 @@ class SelectDenseGeohashRequest(BaseModel):
     ])
     top_percent: float = Field(default=0.5, ge=0.1, le=1.0)
     precision: int = Field(default=6, ge=5, le=7)
+    # Return a pending status when OSM data is not fetched in time; a retry completes from cache
+    deadline_seconds: Optional[float] = Field(default=None, gt=0)
+
+class PlanRequest(BaseModel):
+    # Boundary reference: either a GeoJSON geometry/Feature/FeatureCollection,
+    # or a region row id in the country's boundary table
+    boundary_geojson: Optional[Dict[str, Any]] = None
+    country_id: Optional[int] = None
+    region_id: Optional[int] = None
+    tag_filters: List[str] = Field(default=[
+        'shop', 'restaurant', 'fast_food', 'cafe', 'food_court',
+        'bakery', 'convenience', 'supermarket', 'marketplace',
+        'residential', 'building', 'commercial', 'retail',
+        'bank', 'atm', 'clinic', 'pharmacy', 'hospital',
+        'school', 'college', 'university',
+        'parking', 'taxi', 'car_rental',
+        'bus_station', 'bus_stop'
+    ])
+    top_percent: float = Field(default=0.5, ge=0.1, le=1.0)
+    precision: int = Field(default=6, ge=5, le=7)
+    chunk_size: int = Field(default=10, ge=5, le=50)
+    max_workers: int = Field(default=8, ge=2, le=16)
+    use_cache: bool = Field(default=True)
+    # Campaign the stored plan belongs to; plans of a campaign are versioned
+    campaign_id: Optional[int] = None
+
+class PlanResponse(BaseModel):
+    success: bool
+    plan_id: str
+    campaign_id: Optional[int] = None
+    version: Optional[int] = None  # None when the plan could not be stored
+    persisted: bool = True  # False: the plan lives only in this worker's memory and is lost on eviction or restart
+    grid_geohash_count: int
+    dense_geohash_count: int
+    dense_geohashes: List[str]
+    total_road_segments: int
+    total_road_length_km: float
+    failed_geohashes: int
+    cache_hits: int
+    cache_misses: int
+    timings: Dict[str, float]
+
+class PlanDiffRequest(BaseModel):
+    added_geohashes: List[str] = []
+    removed_geohashes: List[str] = []
+    chunk_size: int = Field(default=10, ge=5, le=50)
+    max_workers: int = Field(default=8, ge=2, le=16)
+    use_cache: bool = Field(default=True)
+
+class PlanDiffResponse(BaseModel):
+    success: bool
+    plan_id: str
+    parent_plan_id: str
+    campaign_id: Optional[int] = None
+    version: Optional[int] = None  # None when the plan could not be stored
+    persisted: bool = True  # False: the plan lives only in this worker's memory and is lost on eviction or restart
+    added_geohash_count: int
+    removed_geohash_count: int
+    dense_geohash_count: int
+    total_road_segments: int
+    total_road_length_km: float
+    failed_geohashes: int
+    cache_hits: int
+    cache_misses: int
+    breakdown: List[RoadKmBreakdownRow] = []
+    processing_time_seconds: float
+
+class ImportPlanRequest(BaseModel):
+    # A plan computed outside the API (e.g. in the Campaigns Preparation page)
+    campaign_id: Optional[int] = None
+    country_id: Optional[int] = None
+    region_id: Optional[int] = None
+    precision: int = Field(default=6, ge=5, le=7)
+    top_percent: Optional[float] = None
+    grid_geohashes: List[str] = []
+    dense_geohashes: List[str]
+    dense_counts: Dict[str, int] = {}
+    roads_geojson: Optional[Dict[str, Any]] = None  # Road segments clipped to the dense cells
+
+class BuildRoadKmIndexRequest(BaseModel):
+    geohashes: List[str]
+    snapshot: Optional[str] = None  # Defaults to the current OSM snapshot
+    chunk_size: int = Field(default=10, ge=5, le=50)
+    max_workers: int = Field(default=8, ge=2, le=16)
+
+class AdvanceOsmSnapshotRequest(BaseModel):
+    snapshot: str = Field(min_length=1, max_length=50)
+    # Re-fetch the road tiles held for the previous snapshot in the background
+    refresh: bool = Field(default=False)
+
+class ApplyOsmChangesRequest(BaseModel):
+    directory: str = ""  # Directory of .osc/.osc.gz files inside OSM_CHANGE_DIR, from the current snapshot to the new one
+    snapshot: str = Field(min_length=1, max_length=50)
+    update_index: bool = Field(default=True)
+    chunk_size: int = Field(default=10, ge=5, le=50)
+    max_workers: int = Field(default=8, ge=2, le=16)
+
+class BuildGeohashCoverRequest(BaseModel):
+    country_id: int
+    region_ids: List[int] = []  # Defaults to every region in the country's boundary table
+    precisions: List[int] = Field(default=[6], min_length=1)
+
+class LookupRoadKmIndexRequest(BaseModel):
+    geohashes: List[str]
+    snapshot: Optional[str] = None  # Defaults to the latest indexed snapshot
 
 class AnalysisResponse(BaseModel):
     id: str
@@ -136,6 +279,44 @@ analysis_storage = {}
 # Cache for OSM data to avoid repeated requests for same areas
 osm_cache = {}
 
+class LruDict(OrderedDict):
+    """Dict holding at most maxsize entries, evicting the least recently used one"""
+    
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+        self.lock = threading.RLock()
+    
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self:
+                return default
+            self.move_to_end(key)
+            return super().__getitem__(key)
+    
+    def __setitem__(self, key, value):
+        with self.lock:
+            super().__setitem__(key, value)
+            self.move_to_end(key)
+            while len(self) > self.maxsize:
+                self.popitem(last=False)
+    
+    def pop(self, key, default=None):
+        with self.lock:
+            return super().pop(key, default)
+    
+    def values(self):
+        with self.lock:
+            return list(super().values())
+
+# Server-side plan results keyed by plan_id; the plan store tables hold the
+# durable copy and this keeps the PLAN_CACHE_SIZE most recently used plans
+plan_storage = LruDict(settings.PLAN_CACHE_SIZE)
+
+# In-memory storage for background UKM calculations, keyed by task_id;
+# finished tasks are expired after UKM_TASK_TTL_SECONDS
+ukm_task_storage = {}
+
 @lru_cache(maxsize=1000)
 def cached_geohash_encode(lat: float, lon: float, precision: int) -> str:
     """Cached geohash encoding for better performance"""
@@ -171,13 +352,483 @@ def encode_geohash_batch(geometries, precision):
     return geohashes
 
 def get_cache_key(polygon_wkt: str, tags: list) -> str:
-    """Generate cache key for OSM data"""
+    """Generate cache key for OSM data within the current snapshot"""
     tags_str = ','.join(sorted(tags))
-    combined = f"{polygon_wkt}_{tags_str}"
+    combined = f"{current_osm_snapshot()}_{polygon_wkt}_{tags_str}"
     return hashlib.md5(combined.encode()).hexdigest()
 
-async def fetch_osm_data_parallel(polygon, poi_tags, road_tags):
-    """Fetch POI and road data in parallel"""
+# Road classes counted towards target UKM
+UKM_HIGHWAY_CLASSES = [
+    "motorway", "motorway_link", "secondary", "secondary_link",
+    "primary", "primary_link", "residential", "trunk", "trunk_link",
+    "tertiary", "tertiary_link", "living_street", "service", "unclassified"
+]
+UKM_ROAD_TAGS = {"highway": UKM_HIGHWAY_CLASSES}
+
+# OSM tag columns kept for road ways; every other tag is dropped. POI and
+# density queries return bare points (out skel / out ids center), so no tags.
+ROAD_KEEP_TAGS = ['highway', 'name']
+
+# Low-cardinality tags stored as categoricals (fixed categories keep concat categorical)
+CATEGORICAL_TAGS = {
+    'highway': UKM_HIGHWAY_CLASSES
+}
+
+def normalize_osm_frame(gdf, keep_tags, geom_types=None):
+    """Project an osmnx result down to OSM id, geometry and the tag columns a pipeline needs"""
+    columns = ['element_type', 'osmid'] + list(keep_tags) + ['geometry']
+    if gdf is None or gdf.empty:
+        return gpd.GeoDataFrame(columns=columns, geometry='geometry', crs='EPSG:4326')
+    
+    if geom_types is not None:
+        gdf = gdf[gdf.geometry.type.isin(geom_types)]
+    
+    # osmnx puts (element_type, osmid) in the index
+    index_names = [name for name in gdf.index.names if name in ('element_type', 'osmid')]
+    if index_names:
+        gdf = gdf.reset_index(level=index_names)
+    
+    data = {}
+    for col in columns[:-1]:
+        data[col] = gdf[col].values if col in gdf.columns else None
+    compact = gpd.GeoDataFrame(data, geometry=gdf.geometry.values, crs=gdf.crs, index=pd.RangeIndex(len(gdf)))
+    
+    compact['element_type'] = compact['element_type'].astype('category')
+    compact['osmid'] = pd.to_numeric(compact['osmid'], errors='coerce')
+    for tag in keep_tags:
+        if tag in CATEGORICAL_TAGS:
+            categories = CATEGORICAL_TAGS[tag]
+            values = compact[tag].dropna()
+            if categories is not None and values.isin(categories).all():
+                compact[tag] = compact[tag].astype(pd.CategoricalDtype(categories))
+            else:
+                compact[tag] = compact[tag].astype('category')
+    
+    if compact.crs is not None and compact.crs.to_epsg() != 4326:
+        compact = compact.to_crs("EPSG:4326")
+    return compact
+
+def get_overpass_url():
+    """Overpass interpreter URL, following the osmnx endpoint setting"""
+    return f"{ox.settings.overpass_endpoint.rstrip('/')}/interpreter"
+
+def overpass_bbox(bounds):
+    """Convert shapely (minx, miny, maxx, maxy) bounds to an Overpass 's,w,n,e' bbox"""
+    minx, miny, maxx, maxy = bounds
+    return f"{miny},{minx},{maxy},{maxx}"
+
+def overpass_string(value):
+    """Quote a value as an Overpass QL string literal"""
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def overpass_tag_filter(key, value):
+    """Build an Overpass tag filter from an osmnx-style tag value"""
+    if value is True:
+        return f'[{overpass_string(key)}]'
+    if isinstance(value, str):
+        return f'[{overpass_string(key)}={overpass_string(value)}]'
+    # Regex-escape each value first; the regex is then quoted like any other literal
+    values = "|".join(re.escape(str(v)) for v in value)
+    return f'[{overpass_string(key)}~{overpass_string(f"^({values})$")}]'
+
+def overpass_settings(timeout):
+    """Overpass settings statement, reading data as of the snapshot date when queries are pinned"""
+    statement = f"[out:json][timeout:{timeout}]"
+    if osm_snapshot["pinned"] and OSM_SNAPSHOT_DATE_PATTERN.match(osm_snapshot["id"]):
+        statement += f'[date:"{osm_snapshot["id"]}T00:00:00Z"]'
+    return statement
+
+def build_poi_center_query(bounds, tags_dict, timeout=180):
+    """Overpass query returning one point per POI: node coordinates and way/relation centers only"""
+    filters = [overpass_tag_filter(key, value) for key, value in tags_dict.items()]
+    nodes = "".join(f"node{f};" for f in filters)
+    areas = "".join(f"way{f};relation{f};" for f in filters)
+    return (
+        f"{overpass_settings(timeout)}[bbox:{overpass_bbox(bounds)}];"
+        f"({nodes});out skel qt;"
+        f"({areas});out ids center qt;"
+    )
+
+def build_road_skeleton_query(bounds_list, highway_classes, timeout=180):
+    """Overpass query returning road ways with inline geometry, tags and node ids.
+
+    Several bboxes are combined in one union set, so a way touching more than
+    one of them is returned once. Node ids let OSM change files be applied to
+    stored ways.
+    """
+    road_filter = overpass_tag_filter('highway', highway_classes)
+    parts = "".join(f"way{road_filter}({overpass_bbox(bounds)});" for bounds in bounds_list)
+    return f"{overpass_settings(timeout)};({parts});out geom qt;"
+
+class OverpassElementStream:
+    """Incrementally decode the 'elements' array of an Overpass JSON response.
+
+    Text is fed in chunks; each complete element is yielded as soon as it is
+    decoded and its text is dropped, so the raw response is never held whole.
+    """
+    
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._in_elements = False
+        self._done = False
+        self._tail = ""
+    
+    def feed(self, chunk):
+        """Add a text chunk and yield every element completed by it"""
+        if self._done:
+            self._tail = (self._tail + chunk)[-4096:]
+            return
+        self._buffer += chunk
+        
+        if not self._in_elements:
+            key_pos = self._buffer.find('"elements"')
+            bracket_pos = self._buffer.find('[', key_pos) if key_pos >= 0 else -1
+            if bracket_pos < 0:
+                return
+            self._buffer = self._buffer[bracket_pos + 1:]
+            self._in_elements = True
+        
+        buffer = self._buffer
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == ']':
+                self._done = True
+                self._tail = buffer[pos + 1:][-4096:]
+                pos = len(buffer)
+                break
+            try:
+                element, pos = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Element not complete yet, wait for more text
+                break
+            yield element
+        self._buffer = buffer[pos:]
+    
+    @property
+    def remark(self):
+        """Overpass runtime remark (e.g. timeout or out-of-memory), if any"""
+        match = re.search(r'"remark"\s*:\s*"((?:[^"\\]|\\.)*)"', self._tail)
+        return json.loads(f'"{match.group(1)}"') if match else None
+
+class OverpassGeometryParser:
+    """Accumulate Overpass elements into flat coordinate and offset arrays.
+
+    Geometries are only built at the end, in bulk, with the shapely 2 array
+    constructors. Only the whitelisted tags are retained.
+    """
+    
+    def __init__(self, keep_tags=()):
+        self.keep_tags = list(keep_tags)
+        # Points: nodes and way/relation centers
+        self.point_types, self.point_ids = [], []
+        self.point_x, self.point_y = array('d'), array('d')
+        self.point_tags = {tag: [] for tag in self.keep_tags}
+        # Ways with inline geometry
+        self.way_ids, self.way_sizes = [], []
+        self.way_x, self.way_y = array('d'), array('d')
+        self.way_nodes = array('q')  # Node id per way coordinate, 0 when not returned
+        self.way_tags = {tag: [] for tag in self.keep_tags}
+        # Closed outer rings of multipolygon relations
+        self.relation_ids, self.relation_ring_counts, self.relation_ring_sizes = [], [], []
+        self.relation_x, self.relation_y = array('d'), array('d')
+        self.relation_tags = {tag: [] for tag in self.keep_tags}
+        self.remark = None
+    
+    def _append_tags(self, target, element):
+        tags = element.get("tags") or {}
+        for tag in self.keep_tags:
+            target[tag].append(tags.get(tag))
+    
+    def add(self, element):
+        """Add one decoded Overpass element"""
+        element_type = element.get("type")
+        geometry = element.get("geometry")
+        
+        if element_type == "way" and geometry:
+            coords = [c for c in geometry if c]
+            if len(coords) < 2:
+                return
+            self.way_ids.append(element["id"])
+            self.way_sizes.append(len(coords))
+            self.way_x.extend(c["lon"] for c in coords)
+            self.way_y.extend(c["lat"] for c in coords)
+            nodes = element.get("nodes")
+            if nodes and len(nodes) == len(geometry):
+                self.way_nodes.extend(n for n, c in zip(nodes, geometry) if c)
+            else:
+                self.way_nodes.extend([0] * len(coords))
+            self._append_tags(self.way_tags, element)
+        elif element_type == "relation" and element.get("members") and "center" not in element:
+            rings = [
+                [c for c in member.get("geometry") or [] if c]
+                for member in element["members"]
+                if member.get("type") == "way" and member.get("role", "outer") in ("outer", "")
+            ]
+            rings = [ring for ring in rings if len(ring) >= 4 and ring[0] == ring[-1]]
+            if not rings:
+                return
+            self.relation_ids.append(element["id"])
+            self.relation_ring_counts.append(len(rings))
+            for ring in rings:
+                self.relation_ring_sizes.append(len(ring))
+                self.relation_x.extend(c["lon"] for c in ring)
+                self.relation_y.extend(c["lat"] for c in ring)
+            self._append_tags(self.relation_tags, element)
+        else:
+            point = element if element_type == "node" else element.get("center")
+            if not point or "lat" not in point:
+                return
+            self.point_types.append(element_type)
+            self.point_ids.append(element["id"])
+            self.point_x.append(point["lon"])
+            self.point_y.append(point["lat"])
+            self._append_tags(self.point_tags, element)
+    
+    def feed_stream(self, chunks):
+        """Parse an iterable of response text chunks without holding the whole response"""
+        stream = OverpassElementStream()
+        for chunk in chunks:
+            for element in stream.feed(chunk):
+                self.add(element)
+        self.remark = stream.remark
+        return self
+    
+    def feed_json(self, data):
+        """Parse an already decoded Overpass response"""
+        for element in data.get("elements", []):
+            self.add(element)
+        self.remark = data.get("remark")
+        return self
+    
+    def _frame(self, element_type, ids, tags, geometries):
+        frame = gpd.GeoDataFrame({
+            'element_type': element_type,
+            'osmid': np.asarray(ids, dtype=np.int64),
+            **tags
+        }, geometry=geometries, crs='EPSG:4326')
+        return normalize_osm_frame(frame, self.keep_tags)
+    
+    def _way_coords(self, mask=None):
+        coords = np.column_stack([np.asarray(self.way_x, dtype=np.float64), np.asarray(self.way_y, dtype=np.float64)])
+        sizes = np.asarray(self.way_sizes, dtype=np.int64)
+        indices = np.repeat(np.arange(len(sizes)), sizes)
+        if mask is not None:
+            point_mask = np.repeat(mask, sizes)
+            coords = coords[point_mask]
+            indices = np.repeat(np.arange(int(mask.sum())), sizes[mask])
+        return coords, indices
+    
+    def _closed_way_mask(self):
+        sizes = np.asarray(self.way_sizes, dtype=np.int64)
+        if len(sizes) == 0:
+            return np.zeros(0, dtype=bool)
+        ends = np.cumsum(sizes) - 1
+        starts = ends - sizes + 1
+        x, y = np.asarray(self.way_x, dtype=np.float64), np.asarray(self.way_y, dtype=np.float64)
+        return (sizes >= 4) & (x[starts] == x[ends]) & (y[starts] == y[ends])
+    
+    def way_node_lists(self):
+        """Node ids of every way, aligned with its coordinates, keyed by way id"""
+        nodes = np.asarray(self.way_nodes, dtype=np.int64)
+        splits = np.cumsum(self.way_sizes)[:-1] if self.way_sizes else []
+        return dict(zip(self.way_ids, np.split(nodes, splits)))
+    
+    def to_points(self):
+        """Nodes and way/relation centers as a point frame"""
+        geometries = gpd.points_from_xy(np.asarray(self.point_x, dtype=np.float64), np.asarray(self.point_y, dtype=np.float64))
+        return self._frame(pd.Categorical(self.point_types), self.point_ids, self.point_tags, geometries)
+    
+    def to_lines(self):
+        """Every way as a LineString"""
+        import shapely
+        
+        if not self.way_ids:
+            return self._frame([], [], {tag: [] for tag in self.keep_tags}, [])
+        coords, indices = self._way_coords()
+        geometries = shapely.linestrings(coords, indices=indices)
+        return self._frame(['way'] * len(self.way_ids), self.way_ids, self.way_tags, geometries)
+    
+    def to_polygons(self):
+        """Closed ways as Polygons and relation outer rings as MultiPolygons (inner rings are not assembled)"""
+        import shapely
+        
+        frames = []
+        closed = self._closed_way_mask()
+        if closed.any():
+            coords, indices = self._way_coords(closed)
+            geometries = shapely.polygons(shapely.linearrings(coords, indices=indices))
+            tags = {tag: [v for v, keep in zip(values, closed) if keep] for tag, values in self.way_tags.items()}
+            ids = np.asarray(self.way_ids, dtype=np.int64)[closed]
+            frames.append(self._frame(['way'] * len(ids), ids, tags, geometries))
+        
+        if self.relation_ids:
+            coords = np.column_stack([np.asarray(self.relation_x, dtype=np.float64), np.asarray(self.relation_y, dtype=np.float64)])
+            ring_sizes = np.asarray(self.relation_ring_sizes, dtype=np.int64)
+            rings = shapely.linearrings(coords, indices=np.repeat(np.arange(len(ring_sizes)), ring_sizes))
+            relation_index = np.repeat(np.arange(len(self.relation_ids)), self.relation_ring_counts)
+            geometries = shapely.multipolygons(shapely.polygons(rings), indices=relation_index)
+            frames.append(self._frame(
+                ['relation'] * len(self.relation_ids), self.relation_ids, self.relation_tags, geometries
+            ))
+        
+        if not frames:
+            return self._frame([], [], {tag: [] for tag in self.keep_tags}, [])
+        return normalize_osm_frame(pd.concat(frames, ignore_index=True), self.keep_tags)
+
+# Overpass rate limiting: 429 (and 503) responses are retried after Retry-After or an exponential backoff
+OVERPASS_RETRY_STATUSES = (429, 503)
+OVERPASS_RATE_LIMIT_RETRIES = 3
+OVERPASS_RETRY_BACKOFF_SECONDS = 5
+OVERPASS_MAX_RETRY_AFTER_SECONDS = 120
+
+def overpass_retry_delay(response, attempt):
+    """Seconds to wait before retrying a rate-limited Overpass query"""
+    retry_after = response.headers.get("Retry-After", "").strip()
+    if retry_after.isdigit():
+        return min(int(retry_after), OVERPASS_MAX_RETRY_AFTER_SECONDS)
+    return OVERPASS_RETRY_BACKOFF_SECONDS * 2 ** attempt
+
+def run_overpass_query(query, keep_tags=(), timeout=180):
+    """POST a query to Overpass and stream the response into an OverpassGeometryParser"""
+    for attempt in range(OVERPASS_RATE_LIMIT_RETRIES + 1):
+        with requests.post(get_overpass_url(), data={"data": query}, timeout=timeout, stream=True) as response:
+            if response.status_code in OVERPASS_RETRY_STATUSES and attempt < OVERPASS_RATE_LIMIT_RETRIES:
+                delay = overpass_retry_delay(response, attempt)
+            else:
+                response.raise_for_status()
+                response.encoding = response.encoding or "utf-8"
+                parser = OverpassGeometryParser(keep_tags)
+                parser.feed_stream(response.iter_content(chunk_size=65536, decode_unicode=True))
+                break
+        logger.info(f"⏳ Overpass returned {response.status_code}, retrying in {delay}s")
+        time.sleep(delay)
+    
+    if parser.remark:
+        logger.warning(f"⚠️ Overpass remark: {parser.remark}")
+    return parser
+
+# Adaptive splitting of oversized Overpass queries
+OVERPASS_MAX_AREA_KM2 = 2500  # Split bboxes larger than ~50km x 50km before querying
+OVERPASS_MAX_SPLIT_DEPTH = 4
+OVERPASS_SPLIT_TIMEOUT = 60  # Per-query timeout; a timeout triggers a split instead of a failure
+OVERPASS_SPLIT_WORKERS = 4  # Concurrent Overpass queries for the whole split tree of one area
+OVERPASS_OVERLOAD_REMARKS = ("timed out", "out of memory", "runtime error")
+
+class OverpassQueryTooLarge(Exception):
+    """Overpass reported a timeout or memory exhaustion for a query"""
+
+class RequestDeadlineExceeded(Exception):
+    """The request deadline passed while OSM data was still being fetched"""
+
+# Fetches still running (possibly past a request deadline), so later requests
+# await them instead of querying Overpass again
+osm_fetches = {}
+road_tile_fetches = {}
+
+def remaining_seconds(deadline):
+    """Seconds left until an absolute deadline (None means no deadline)"""
+    return None if deadline is None else max(0.0, deadline - time.time())
+
+def estimate_bbox_area_km2(bounds):
+    """Approximate area of a lon/lat bbox in square kilometres"""
+    minx, miny, maxx, maxy = bounds
+    mid_lat = np.radians((miny + maxy) / 2)
+    return (maxy - miny) * 111.32 * (maxx - minx) * 111.32 * np.cos(mid_lat)
+
+def split_bounds(bounds):
+    """Split a bbox into four quadrants"""
+    minx, miny, maxx, maxy = bounds
+    midx, midy = (minx + maxx) / 2, (miny + maxy) / 2
+    return [
+        (minx, miny, midx, midy),
+        (midx, miny, maxx, midy),
+        (minx, midy, midx, maxy),
+        (midx, midy, maxx, maxy)
+    ]
+
+def merge_osm_frames(frames, keep_tags=()):
+    """Concatenate compact OSM frames, dropping elements seen in more than one part"""
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return normalize_osm_frame(None, keep_tags)
+    merged = pd.concat(frames, ignore_index=True)
+    merged = merged.drop_duplicates(subset=['element_type', 'osmid']).reset_index(drop=True)
+    return normalize_osm_frame(merged, keep_tags)
+
+def fetch_overpass_adaptive(bounds, build_query, to_frame, keep_tags=(), timeout=OVERPASS_SPLIT_TIMEOUT):
+    """Run an Overpass query for a bbox, splitting it into quadrants when it is too large.
+
+    Oversized bboxes are split before querying; a timeout, gateway timeout or
+    Overpass runtime remark splits the bbox and queries the quadrants. Every
+    part of the split tree runs on one executor, so at most
+    OVERPASS_SPLIT_WORKERS queries are in flight. Parts are merged with dedup
+    on OSM id.
+    """
+    def fetch_part(part_bounds, depth):
+        """Frame of one part, or the quadrants to query instead"""
+        if depth < OVERPASS_MAX_SPLIT_DEPTH and estimate_bbox_area_km2(part_bounds) > OVERPASS_MAX_AREA_KM2:
+            return None, split_bounds(part_bounds)
+        try:
+            parser = run_overpass_query(build_query(part_bounds, timeout), keep_tags, timeout)
+            if parser.remark and any(text in parser.remark.lower() for text in OVERPASS_OVERLOAD_REMARKS):
+                raise OverpassQueryTooLarge(parser.remark)
+            return to_frame(parser), None
+        except (requests.Timeout, requests.HTTPError, OverpassQueryTooLarge) as e:
+            if isinstance(e, requests.HTTPError) and e.response is not None and e.response.status_code not in (502, 504):
+                raise
+            if depth >= OVERPASS_MAX_SPLIT_DEPTH:
+                raise
+            logger.info(f"✂️ Overpass query too large at depth {depth} ({e}), splitting into quadrants")
+            return None, split_bounds(part_bounds)
+    
+    frames = []
+    executor = ThreadPoolExecutor(max_workers=OVERPASS_SPLIT_WORKERS)
+    try:
+        pending = {executor.submit(fetch_part, bounds, 0): 0}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                depth = pending.pop(future)
+                frame, quadrants = future.result()
+                if quadrants is None:
+                    frames.append(frame)
+                    continue
+                for quadrant in quadrants:
+                    pending[executor.submit(fetch_part, quadrant, depth + 1)] = depth + 1
+    finally:
+        # On failure the queued parts are dropped instead of still being sent to Overpass
+        executor.shutdown(wait=True, cancel_futures=True)
+    return merge_osm_frames(frames, keep_tags)
+
+def fetch_poi_centers(polygon, tags_dict, timeout=OVERPASS_SPLIT_TIMEOUT):
+    """Fetch one point per POI inside a polygon"""
+    import shapely
+    
+    points = fetch_overpass_adaptive(
+        polygon.bounds,
+        lambda bounds, query_timeout: build_poi_center_query(bounds, tags_dict, query_timeout),
+        lambda parser: parser.to_points(),
+        timeout=timeout
+    )
+    if points.empty:
+        return points
+    
+    # The query is bbox-based; keep only points inside the polygon
+    shapely.prepare(polygon)
+    inside = shapely.contains_xy(polygon, points.geometry.x.values, points.geometry.y.values)
+    return points[inside].reset_index(drop=True)
+
+async def fetch_osm_data_parallel(polygon, poi_tags, road_tags, deadline=None):
+    """Fetch POI and road data in parallel.
+
+    Fetches not finished by the deadline keep running and fill the cache, so a
+    retry of the same request completes from it.
+    """
     loop = asyncio.get_event_loop()
     
     # Check cache first
@@ -185,207 +836,1592 @@ async def fetch_osm_data_parallel(polygon, poi_tags, road_tags):
     poi_cache_key = get_cache_key(polygon_wkt, list(poi_tags.keys()))
     road_cache_key = get_cache_key(polygon_wkt, list(road_tags.keys()))
     
-    # Use ThreadPoolExecutor for OSM requests (I/O bound)
-    with ThreadPoolExecutor(max_workers=2) as executor:
-        # Submit tasks
-        poi_future = None
-        road_future = None
-        
-        if poi_cache_key not in osm_cache:
-            poi_future = loop.run_in_executor(executor, fetch_poi_data, polygon, poi_tags)
+    def start_fetch(cache_key, fetch, tags):
+        if cache_key in osm_fetches:
+            return osm_fetches[cache_key]
+        future = loop.run_in_executor(executor, fetch, polygon, tags)
+        osm_fetches[cache_key] = future
         
-        if road_cache_key not in osm_cache:
-            road_future = loop.run_in_executor(executor, fetch_road_data, polygon, road_tags)
-        
-        # Get results
-        if poi_future:
-            poi_gdf = await poi_future
-            osm_cache[poi_cache_key] = poi_gdf
-        else:
-            poi_gdf = osm_cache[poi_cache_key]
-            
-        if road_future:
-            roads_gdf = await road_future
-            osm_cache[road_cache_key] = roads_gdf
-        else:
-            roads_gdf = osm_cache[road_cache_key]
+        def store(done):
+            osm_fetches.pop(cache_key, None)
+            if not done.cancelled() and done.exception() is None:
+                osm_cache[cache_key] = done.result()
+        future.add_done_callback(store)
+        return future
     
+    # Use ThreadPoolExecutor for OSM requests (I/O bound); it is not joined so
+    # fetches can outlive a request deadline
+    executor = ThreadPoolExecutor(max_workers=2)
+    futures = {}
+    for cache_key, fetch, tags in (
+        (poi_cache_key, fetch_poi_data, poi_tags),
+        (road_cache_key, fetch_road_data, road_tags)
+    ):
+        if cache_key not in osm_cache:
+            futures[cache_key] = start_fetch(cache_key, fetch, tags)
+    executor.shutdown(wait=False)
+    
+    if futures:
+        _, pending = await asyncio.wait(set(futures.values()), timeout=remaining_seconds(deadline))
+        if pending:
+            raise RequestDeadlineExceeded(f"{len(pending)} OSM fetches still running")
+    
+    poi_gdf = futures[poi_cache_key].result() if poi_cache_key in futures else osm_cache[poi_cache_key]
+    roads_gdf = futures[road_cache_key].result() if road_cache_key in futures else osm_cache[road_cache_key]
     return poi_gdf, roads_gdf
 
 def fetch_poi_data(polygon, tags_dict):
-    """Fetch POI data from OSM"""
-    try:
-        poi_gdf = ox.geometries_from_polygon(polygon, tags=tags_dict)
-        poi_gdf = poi_gdf[poi_gdf.geometry.type.isin(['Point', 'Polygon', 'MultiPolygon'])]
-        return poi_gdf.to_crs("EPSG:4326")
-    except Exception as e:
-        logger.warning(f"⚠️ Failed to fetch POI: {e}")
-        return gpd.GeoDataFrame(columns=['geometry'], geometry='geometry', crs='EPSG:4326')
+    """Fetch POI data from OSM (one point per POI, enough for density counting).
+
+    Errors propagate: an area that could not be fetched must not count as empty.
+    """
+    return fetch_poi_centers(polygon, tags_dict)
 
 def fetch_road_data(polygon, road_tags):
-    """Fetch road data from OSM"""
-    try:
-        roads_gdf = ox.geometries_from_polygon(polygon, tags=road_tags)
-        roads_gdf = roads_gdf[roads_gdf.geometry.type.isin(['LineString', 'MultiLineString'])]
-        return roads_gdf.to_crs("EPSG:4326")
-    except Exception as e:
-        logger.warning(f"⚠️ Failed to fetch major roads: {e}")
-        return gpd.GeoDataFrame(columns=['geometry'], geometry='geometry', crs='EPSG:4326')
+    """Fetch road elements from OSM as bare points (way and relation centers, no line geometry or tags), enough for density counting"""
+    return fetch_poi_centers(polygon, road_tags)
 
 def geohash_to_bounds(gh):
     """Convert geohash to bounding box coordinates"""
     lat, lon, lat_err, lon_err = geohash2.decode_exactly(gh)
     return (lat - lat_err, lat + lat_err, lon - lon_err, lon + lon_err)
 
-def fetch_roads_for_geohash(geohash_str):
-    """Fetch and clip roads for a single geohash"""
-    try:
-        from shapely.geometry import box
+class RoadWayStore:
+    """Road ways keyed by OSM way id, with the geohash tiles each way touches.
+
+    A way's geometry is held once however many tiles it crosses; tiles only
+    keep way id lists and are clipped on demand. At most max_tiles tiles are
+    kept: the least recently used are evicted, and a way goes with the last
+    tile referencing it.
+    """
+    
+    def __init__(self, max_tiles):
+        self.lock = threading.RLock()
+        self.max_tiles = max_tiles
+        self.evicted_tiles = 0
+        self.ways = {}              # osmid -> {"geometry", "highway", "name", "nodes"}
+        self.way_tiles = {}         # osmid -> set of geohashes (the way's references)
+        self.tiles = OrderedDict()  # geohash -> {"way_ids": [...], "timestamp": float, "snapshot": str}, LRU order
+    
+    def _touch(self, geohash_list):
+        for gh in geohash_list:
+            if gh in self.tiles:
+                self.tiles.move_to_end(gh)
+    
+    def _evict(self, keep=0):
+        """Drop least recently used tiles beyond max_tiles, never the newest `keep` ones"""
+        while len(self.tiles) > max(self.max_tiles, keep):
+            self._drop_tile(next(iter(self.tiles)))
+            self.evicted_tiles += 1
+    
+    def has_tile(self, geohash_str):
+        """Check whether a tile is stored and still valid"""
+        with self.lock:
+            entry = self.tiles.get(geohash_str)
+            if entry is None or not is_cache_valid(entry):
+                return False
+            self.tiles.move_to_end(geohash_str)
+            return True
+    
+    def _drop_tile(self, geohash_str):
+        entry = self.tiles.pop(geohash_str, None)
+        if entry is None:
+            return
+        for osmid in entry['way_ids']:
+            tiles = self.way_tiles.get(osmid)
+            if tiles is None:
+                continue
+            tiles.discard(geohash_str)
+            if not tiles:
+                del self.way_tiles[osmid]
+                self.ways.pop(osmid, None)
+    
+    def add_tiles(self, geohash_list, lines, way_nodes=None):
+        """Store freshly fetched ways and record which of the given tiles each one touches"""
+        import shapely
         
-        south, north, west, east = geohash_to_bounds(geohash_str)
-        polygon = box(west, south, east, north)
+        membership = {gh: [] for gh in geohash_list}
+        if not lines.empty:
+            boxes = np.array([cached_geohash_to_polygon(gh) for gh in geohash_list], dtype=object)
+            tree = shapely.STRtree(np.asarray(lines.geometry.values))
+            box_idx, line_idx = tree.query(boxes, predicate='intersects')
+            osmids = lines['osmid'].to_numpy()
+            for b, l in zip(box_idx, line_idx):
+                membership[geohash_list[b]].append(int(osmids[l]))
         
-        # Define road tags for UKM calculation
-        tags = {
-            "highway": [
-                "motorway", "motorway_link", "secondary", "secondary_link",
-                "primary", "primary_link", "residential", "trunk", "trunk_link",
-                "tertiary", "tertiary_link", "living_street", "service", "unclassified"
+        now = time.time()
+        snapshot = current_osm_snapshot()
+        with self.lock:
+            for gh in geohash_list:
+                self._drop_tile(gh)
+            for osmid, geometry, highway, name in zip(
+                lines['osmid'], lines.geometry.values, lines['highway'], lines['name']
+            ):
+                self.ways[int(osmid)] = {
+                    "geometry": geometry, "highway": highway, "name": name,
+                    "nodes": way_nodes.get(int(osmid)) if way_nodes else None
+                }
+            for gh, way_ids in membership.items():
+                self.tiles[gh] = {"way_ids": way_ids, "timestamp": now, "snapshot": snapshot}
+                for osmid in way_ids:
+                    self.way_tiles.setdefault(osmid, set()).add(gh)
+            # Ways returned by the query that touch none of the tiles are not kept
+            for osmid in lines['osmid']:
+                if int(osmid) not in self.way_tiles:
+                    self.ways.pop(int(osmid), None)
+            # The tiles just added stay until they have been clipped by the caller
+            self._evict(keep=len(membership))
+    
+    def tile_ways(self, geohash_list):
+        """Unclipped ways touching any of the given tiles as a compact frame, one row per way"""
+        with self.lock:
+            self._touch(geohash_list)
+            way_ids = list(dict.fromkeys(
+                osmid
+                for gh in geohash_list
+                for osmid in self.tiles.get(gh, {}).get('way_ids', [])
+            ))
+            ways = [self.ways[osmid] for osmid in way_ids]
+        frame = gpd.GeoDataFrame({
+            'element_type': ['way'] * len(way_ids),
+            'osmid': np.asarray(way_ids, dtype=np.int64),
+            'highway': [way['highway'] for way in ways],
+            'name': [way['name'] for way in ways]
+        }, geometry=[way['geometry'] for way in ways], crs='EPSG:4326')
+        return normalize_osm_frame(frame, ROAD_KEEP_TAGS)
+    
+    def clip_tiles(self, geohash_list):
+        """Ways touching the given tiles, clipped to every tile they cross in one pass"""
+        return clip_roads_to_cells(self.tile_ways(geohash_list), geohash_list)
+    
+    def way_cells(self, geohash_list):
+        """(osmid, touched tiles among the given ones, node ids) for every way touching the given tiles"""
+        tiles = set(geohash_list)
+        with self.lock:
+            way_ids = dict.fromkeys(
+                osmid
+                for gh in geohash_list
+                for osmid in self.tiles.get(gh, {}).get('way_ids', [])
+            )
+            return [
+                (osmid, sorted(self.way_tiles.get(osmid, set()) & tiles), self.ways[osmid].get("nodes"))
+                for osmid in way_ids
             ]
-        }
-        
-        # Fetch road data from OSM
-        gdf_all = ox.features_from_bbox(north, south, east, west, tags=tags)
-        gdf_lines = gdf_all[gdf_all.geometry.type.isin(["LineString", "MultiLineString"])]
-        
-        # Clip to geohash bounds
-        gdf_clipped = gpd.clip(gdf_lines, polygon)
+    
+    def node_coordinates(self, node_ids):
+        """(lon, lat) of the given node ids that belong to a stored way"""
+        import shapely
         
-        if not gdf_clipped.empty:
-            return gdf_clipped.to_crs("EPSG:4326")
+        if not node_ids:
+            return {}
+        with self.lock:
+            ways = [way for way in self.ways.values() if way.get("nodes") is not None]
+            if not ways:
+                return {}
+            all_nodes = np.concatenate([way["nodes"] for way in ways])
+            all_coords = shapely.get_coordinates([way["geometry"] for way in ways])
+        known = np.isin(all_nodes, np.fromiter(node_ids, dtype=np.int64))
+        return dict(zip(all_nodes[known].tolist(), map(tuple, all_coords[known])))
+    
+    def _move_way(self, osmid, new_tiles):
+        """Point a way at a new set of tiles, dropping it when it touches none"""
+        old_tiles = self.way_tiles.get(osmid, set())
+        for gh in old_tiles - new_tiles:
+            self.tiles[gh]['way_ids'].remove(osmid)
+        for gh in new_tiles - old_tiles:
+            self.tiles[gh]['way_ids'].append(osmid)
+        if new_tiles:
+            self.way_tiles[osmid] = set(new_tiles)
         else:
-            return gpd.GeoDataFrame(columns=['geometry'], geometry='geometry', crs='EPSG:4326')
-            
-    except Exception as e:
-        logger.warning(f"⚠️ Failed to fetch roads for geohash {geohash_str}: {e}")
-        return gpd.GeoDataFrame(columns=['geometry'], geometry='geometry', crs='EPSG:4326')
+            self.way_tiles.pop(osmid, None)
+            self.ways.pop(osmid, None)
+    
+    def apply_changes(self, changes, highway_classes, snapshot):
+        """Patch stored ways from parsed OSM change files and move the tiles to a new snapshot.
 
-def fetch_roads_for_geohash_cached(geohash_str, use_cache=True):
-    """Fetch and clip roads for a single geohash with caching"""
-    try:
-        from shapely.geometry import box
-        
-        # Create cache key
-        cache_key = f"roads_{geohash_str}"
-        
-        # Try cache first if enabled
-        if use_cache:
-            cached_data = get_from_cache(cache_key)
-            if cached_data is not None:
-                return cached_data, True  # Return data and cache hit flag
-        
-        south, north, west, east = geohash_to_bounds(geohash_str)
-        polygon = box(west, south, east, north)
-        
-        # Define road tags for UKM calculation
-        tags = {
-            "highway": [
-                "motorway", "motorway_link", "secondary", "secondary_link",
-                "primary", "primary_link", "residential", "trunk", "trunk_link",
-                "tertiary", "tertiary_link", "living_street", "service", "unclassified"
-            ]
-        }
+        Returns the tiles whose roads changed and the tiles that could not be
+        patched locally (a changed way references a node that is neither
+        stored nor in the changes); those are dropped for refetching.
+        """
+        import shapely
+        from shapely.geometry import LineString
         
-        # Fetch road data from OSM with timeout
-        import socket
-        original_timeout = socket.getdefaulttimeout()
-        socket.setdefaulttimeout(30)  # 30 second timeout
+        classes = set(highway_classes)
+        changed_nodes = changes["nodes"]
+        deleted_nodes = changes["deleted_nodes"]
+        changed_ways = changes["ways"]
         
-        try:
-            gdf_all = ox.features_from_bbox(north, south, east, west, tags=tags)
-            gdf_lines = gdf_all[gdf_all.geometry.type.isin(["LineString", "MultiLineString"])]
+        with self.lock:
+            tile_ids = [gh for gh, entry in self.tiles.items() if is_cache_valid(entry)]
+            tile_tree = shapely.STRtree([cached_geohash_to_polygon(gh) for gh in tile_ids])
             
-            # Clip to geohash bounds
-            gdf_clipped = gpd.clip(gdf_lines, polygon)
+            def touching_tiles(geometry):
+                return {tile_ids[i] for i in tile_tree.query(geometry, predicate='intersects')}
             
-            if not gdf_clipped.empty:
-                result = gdf_clipped.to_crs("EPSG:4326")
-            else:
-                result = gpd.GeoDataFrame(columns=['geometry'], geometry='geometry', crs='EPSG:4326')
+            # Flat view of every stored node with the way it belongs to
+            way_ids = [osmid for osmid, way in self.ways.items() if way.get("nodes") is not None]
+            node_lists = [self.ways[osmid]["nodes"] for osmid in way_ids]
+            all_nodes = np.concatenate(node_lists) if node_lists else np.zeros(0, dtype=np.int64)
+            owners = np.repeat(np.arange(len(way_ids)), [len(nodes) for nodes in node_lists])
+            all_coords = shapely.get_coordinates([self.ways[osmid]["geometry"] for osmid in way_ids])
+            
+            needed = np.fromiter(
+                {ref for way in changed_ways.values() for ref in way["nodes"]}, dtype=np.int64
+            )
+            known = np.isin(all_nodes, needed)
+            stored_coords = dict(zip(all_nodes[known].tolist(), map(tuple, all_coords[known])))
+            
+            moved = np.isin(all_nodes, np.fromiter(changed_nodes, dtype=np.int64))
+            moved_ways = {way_ids[i] for i in np.unique(owners[moved])} - set(changed_ways)
             
-            # Cache the result if caching is enabled
-            if use_cache:
-                save_to_cache(cache_key, result)
+            changed, dirty = set(), set()
             
-            return result, False  # Return data and cache miss flag
+            # Stored ways whose nodes moved keep their tags and node list
+            for osmid in moved_ways:
+                way = self.ways[osmid]
+                coords = [
+                    changed_nodes.get(int(ref)) or point
+                    for ref, point in zip(way["nodes"], shapely.get_coordinates(way["geometry"]))
+                ]
+                geometry = LineString(coords)
+                new_tiles = touching_tiles(geometry)
+                changed |= self.way_tiles.get(osmid, set()) | new_tiles
+                way["geometry"] = geometry
+                self._move_way(osmid, new_tiles)
             
-        finally:
-            socket.setdefaulttimeout(original_timeout)
+            # Created, modified and deleted ways
+            for osmid, change in changed_ways.items():
+                old_tiles = set(self.way_tiles.get(osmid, set()))
+                highway = change["tags"].get("highway")
+                if change["deleted"] or highway not in classes:
+                    changed |= old_tiles
+                    self._move_way(osmid, set())
+                    continue
+                
+                coords = [
+                    None if ref in deleted_nodes else changed_nodes.get(ref) or stored_coords.get(ref)
+                    for ref in change["nodes"]
+                ]
+                if any(point is None for point in coords) or len(coords) < 2:
+                    known_points = [point for point in coords if point is not None]
+                    dirty |= old_tiles
+                    if known_points:
+                        dirty |= touching_tiles(shapely.multipoints(known_points))
+                    continue
+                
+                geometry = LineString(coords)
+                new_tiles = touching_tiles(geometry)
+                changed |= old_tiles | new_tiles
+                self.ways[osmid] = {
+                    "geometry": geometry, "highway": highway, "name": change["tags"].get("name"),
+                    "nodes": np.asarray(change["nodes"], dtype=np.int64)
+                }
+                self._move_way(osmid, new_tiles)
             
+            for gh in dirty:
+                self._drop_tile(gh)
+            now = time.time()
+            for gh in tile_ids:
+                if gh in self.tiles:
+                    self.tiles[gh].update({"timestamp": now, "snapshot": snapshot})
+        
+        return changed - dirty, dirty
+    
+    def drop_stale_tiles(self):
+        """Drop tiles from earlier snapshots, returning the geohashes dropped"""
+        with self.lock:
+            stale = [gh for gh, entry in self.tiles.items() if not is_cache_valid(entry)]
+            for gh in stale:
+                self._drop_tile(gh)
+        return stale
+    
+    def clear(self):
+        """Drop every stored way and tile, returning the number of tiles dropped"""
+        with self.lock:
+            tile_count = len(self.tiles)
+            self.ways.clear()
+            self.way_tiles.clear()
+            self.tiles.clear()
+        return tile_count
+    
+    def stats(self):
+        with self.lock:
+            return {
+                "tiles": len(self.tiles),
+                "max_tiles": self.max_tiles,
+                "evicted_tiles": self.evicted_tiles,
+                "ways": len(self.ways),
+                "tile_way_references": sum(len(entry['way_ids']) for entry in self.tiles.values())
+            }
+
+road_way_store = RoadWayStore(settings.ROAD_TILE_CACHE_SIZE)
+
+# Changed nodes are filtered against the ways that need them in batches of this size
+OSM_CHANGE_NODE_BATCH = 100_000
+
+def osm_change_files(directory):
+    """The .osc/.osc.gz files of a directory inside OSM_CHANGE_DIR, in file name order"""
+    from pathlib import Path
+    
+    if not settings.OSM_CHANGE_DIR:
+        raise HTTPException(status_code=400, detail="OSM_CHANGE_DIR is not configured")
+    base = Path(settings.OSM_CHANGE_DIR).resolve()
+    target = (base / directory).resolve()
+    if not target.is_relative_to(base):
+        raise HTTPException(status_code=400, detail="Change directory must be inside OSM_CHANGE_DIR")
+    if not target.is_dir():
+        raise HTTPException(status_code=400, detail=f"Change directory not found: {directory}")
+    return sorted(
+        path for path in target.iterdir()
+        if path.name.endswith(('.osc', '.osc.gz')) and path.is_file() and path.resolve().is_relative_to(base)
+    )
+
+def iter_osm_change_elements(paths, tag):
+    """Stream (action, element) for every element of one tag in OSM change files.
+
+    Elements are cleared once consumed, so memory does not grow with the files.
+    """
+    import gzip
+    import xml.etree.ElementTree as ET
+    
+    for path in paths:
+        opener = gzip.open if path.name.endswith('.gz') else open
+        with opener(path, 'rb') as f:
+            action = None
+            for event, element in ET.iterparse(f, events=('start', 'end')):
+                if event == 'start':
+                    if element.tag in ('create', 'modify', 'delete'):
+                        action = element.tag
+                    continue
+                if element.tag == tag:
+                    yield action, element
+                if element.tag in ('node', 'way', 'relation', 'create', 'modify', 'delete'):
+                    element.clear()
+
+def read_osm_change_files(paths, highway_classes, keep_nodes=None):
+    """Parse OSM change files, in order, into net way and node changes.
+
+    Road ways keep their node ids and tags; any other changed way is recorded
+    without them, as it only removes a road. Node changes are kept only for
+    nodes those road ways reference, or that keep_nodes(node_ids) returns
+    (e.g. nodes of already stored or indexed ways).
+    """
+    classes = set(highway_classes)
+    ways = {}
+    for action, element in iter_osm_change_elements(paths, 'way'):
+        tags = {tag.get('k'): tag.get('v') for tag in element.findall('tag')}
+        road = action != 'delete' and tags.get('highway') in classes
+        ways[int(element.get('id'))] = {
+            "deleted": action == 'delete',
+            "nodes": [int(nd.get('ref')) for nd in element.findall('nd')] if road else [],
+            "tags": {"highway": tags.get('highway'), "name": tags.get('name')} if road else {}
+        }
+    referenced = {ref for way in ways.values() for ref in way["nodes"]}
+    
+    nodes, deleted_nodes, batch = {}, set(), []
+    
+    def flush():
+        node_ids = {osmid for osmid, _ in batch}
+        kept = node_ids & referenced
+        if keep_nodes is not None and node_ids - kept:
+            kept |= keep_nodes(node_ids - kept)
+        for osmid, point in batch:
+            if osmid not in kept:
+                continue
+            if point is None:
+                nodes.pop(osmid, None)
+                deleted_nodes.add(osmid)
+            else:
+                nodes[osmid] = point
+                deleted_nodes.discard(osmid)
+        batch.clear()
+    
+    for action, element in iter_osm_change_elements(paths, 'node'):
+        point = None if action == 'delete' else (float(element.get('lon')), float(element.get('lat')))
+        batch.append((int(element.get('id')), point))
+        if len(batch) >= OSM_CHANGE_NODE_BATCH:
+            flush()
+    flush()
+    
+    return {"files": len(paths), "nodes": nodes, "deleted_nodes": deleted_nodes, "ways": ways}
+
+def fetch_road_tiles(geohash_list, timeout=30):
+    """Fetch the roads touching a set of geohash tiles with one Overpass query into the way store"""
+    bounds_list = [cached_geohash_to_polygon(gh).bounds for gh in geohash_list]
+    query = build_road_skeleton_query(bounds_list, UKM_HIGHWAY_CLASSES, timeout)
+    parser = run_overpass_query(query, ROAD_KEEP_TAGS, timeout)
+    if parser.remark:
+        # Incomplete response, do not store partial tiles
+        raise OverpassQueryTooLarge(parser.remark)
+    
+    lines = parser.to_lines()
+    road_way_store.add_tiles(geohash_list, lines, parser.way_node_lists())
+    return len(lines)
+
+def fetch_roads_for_geohash(geohash_str):
+    """Fetch and clip roads for a single geohash"""
+    return fetch_roads_for_geohash_cached(geohash_str, use_cache=False)[0]
+
+def fetch_roads_for_geohash_cached(geohash_str, use_cache=True):
+    """Fetch and clip roads for a single geohash with caching"""
+    try:
+        cache_hit = use_cache and road_way_store.has_tile(geohash_str)
+        if not cache_hit:
+            fetch_road_tiles([geohash_str])
+        return road_way_store.clip_tiles([geohash_str]), cache_hit
+    
     except Exception as e:
         logger.warning(f"⚠️ Failed to fetch roads for geohash {geohash_str}: {e}")
         return gpd.GeoDataFrame(columns=['geometry'], geometry='geometry', crs='EPSG:4326'), False
 
-async def fetch_roads_parallel_advanced(geohash_list, max_workers=8, chunk_size=10, use_cache=True):
-    """Advanced parallel road fetching with chunking and caching"""
+# WGS84 ellipsoid
+WGS84_SEMI_MAJOR_AXIS_M = 6378137.0
+WGS84_ECCENTRICITY_SQ = 6.69437999014e-3
+
+def geodesic_lengths_km(geometries):
+    """Ellipsoidal length in km of each lon/lat line geometry, computed on raw coordinate arrays.
+
+    Each vertex pair is measured with the WGS84 meridional and prime-vertical
+    radii at its mid-latitude, which is accurate to well under a metre for
+    road vertex spacing at any latitude. No reprojection or frame copy is made.
+    """
+    import shapely
+    
+    geometries = np.asarray(geometries)
+    if len(geometries) == 0:
+        return np.zeros(0)
+    
+    # Measure each part separately so MultiLineString parts are not joined
+    parts, part_geometry = shapely.get_parts(geometries, return_index=True)
+    coords, coord_part = shapely.get_coordinates(parts, return_index=True)
+    if len(coords) < 2:
+        return np.zeros(len(geometries))
+    
+    same_part = coord_part[1:] == coord_part[:-1]
+    lon = np.radians(coords[:, 0])
+    lat = np.radians(coords[:, 1])
+    dlon = (np.diff(lon)[same_part] + np.pi) % (2 * np.pi) - np.pi
+    dlat = np.diff(lat)[same_part]
+    mid_lat = ((lat[1:] + lat[:-1]) / 2)[same_part]
+    
+    w = np.sqrt(1 - WGS84_ECCENTRICITY_SQ * np.sin(mid_lat) ** 2)
+    meridional_radius = WGS84_SEMI_MAJOR_AXIS_M * (1 - WGS84_ECCENTRICITY_SQ) / w ** 3
+    prime_vertical_radius = WGS84_SEMI_MAJOR_AXIS_M / w
+    distances_m = np.hypot(dlat * meridional_radius, dlon * prime_vertical_radius * np.cos(mid_lat))
+    
+    part_lengths = np.bincount(coord_part[1:][same_part], weights=distances_m, minlength=len(parts))
+    return np.bincount(part_geometry, weights=part_lengths, minlength=len(geometries)) / 1000
+
+def road_km_by_geohash(segments):
+    """Sum segment lengths per geohash"""
+    if segments is None or segments.empty:
+        return {}
+    totals = segments.groupby('geohash', observed=True)['length_km'].sum()
+    return {str(gh): round(float(km), 4) for gh, km in totals.items()}
+
+def road_km_breakdown(segments):
+    """Road km and segment count per (geohash, highway class) as response rows"""
+    if segments is None or segments.empty:
+        return []
+    summary = summarize_road_km(segments)
+    return [
+        {
+            "geohash": row.geohash,
+            "highway": row.highway,
+            "road_km": round(float(row.road_km), 4),
+            "segment_count": int(row.segment_count)
+        }
+        for row in summary.sort_values(['geohash', 'highway']).itertuples(index=False)
+    ]
+
+def clip_roads_to_cells(ways, geohash_list):
+    """Clip road lines against all geohash cells in one vectorized pass.
+
+    Candidate (line, cell) pairs come from a single bulk STRtree query. Lines
+    whose bbox lies inside the cell rectangle are kept as-is; only the rest
+    go through a vectorized shapely.intersection. Returns one row per
+    (geohash, way piece) with its length in km.
+    """
+    import shapely
+    
+    columns = ['geohash', 'osmid', 'highway', 'name', 'length_km', 'geometry']
+    if ways.empty or not geohash_list:
+        return gpd.GeoDataFrame(columns=columns, geometry='geometry', crs='EPSG:4326')
+    
+    lines = np.asarray(ways.geometry.values)
+    cells = np.array([cached_geohash_to_polygon(gh) for gh in geohash_list], dtype=object)
+    line_idx, cell_idx = shapely.STRtree(cells).query(lines, predicate='intersects')
+    
+    # Fast path: a line whose bbox is inside the cell rectangle needs no clipping
+    line_bounds = shapely.bounds(lines)[line_idx]
+    cell_bounds = shapely.bounds(cells)[cell_idx]
+    inside = (
+        (line_bounds[:, 0] >= cell_bounds[:, 0]) & (line_bounds[:, 1] >= cell_bounds[:, 1]) &
+        (line_bounds[:, 2] <= cell_bounds[:, 2]) & (line_bounds[:, 3] <= cell_bounds[:, 3])
+    )
+    segments = lines[line_idx]
+    segments[~inside] = shapely.intersection(segments[~inside], cells[cell_idx[~inside]])
+    
+    # Drop pieces that only touch a cell edge or corner
+    keep = shapely.length(segments) > 0
+    line_idx, cell_idx, segments = line_idx[keep], cell_idx[keep], segments[keep]
+    
+    clipped = gpd.GeoDataFrame({
+        'geohash': pd.Categorical(np.asarray(geohash_list, dtype=object)[cell_idx]),
+        'osmid': ways['osmid'].to_numpy()[line_idx],
+        'highway': ways['highway'].iloc[line_idx].values,
+        'name': ways['name'].iloc[line_idx].values
+    }, geometry=segments, crs='EPSG:4326')
+    
+    # A way lying exactly on a shared cell edge is clipped into both cells; keep one piece
+    clipped = drop_duplicate_road_pieces(clipped)
+    clipped['length_km'] = geodesic_lengths_km(clipped.geometry.values)
+    return clipped[columns]
+
+def clip_road_tiles(geohash_list, failed_tiles=()):
+    """Clip stored ways for all fetched tiles, returning the segment table and the failed tiles"""
+    fetched = [gh for gh in geohash_list if gh not in failed_tiles]
+    segments = road_way_store.clip_tiles(fetched)
+    
+    # Tiles with no road pieces count as failed, as before
+    tiles_with_roads = set(segments['geohash'].astype(str))
+    failed = [gh for gh in geohash_list if gh not in tiles_with_roads]
+    return segments, failed
+
+async def fetch_roads_parallel_advanced(geohash_list, max_workers=8, chunk_size=10, use_cache=True, deadline=None):
+    """Advanced parallel road fetching with chunking and caching.
+
+    Tiles missing from the way store are fetched one Overpass query per chunk,
+    so a road crossing several tiles of a chunk is downloaded once. Tiles
+    already being fetched by another request are awaited instead. Every tile
+    is then clipped from the store. Tiles not fetched by the deadline are
+    returned as pending; their fetches keep running and fill the store.
+    """
     loop = asyncio.get_event_loop()
+    geohash_list = list(dict.fromkeys(geohash_list))
     
-    # Split geohashes into chunks for better memory management
-    chunks = [geohash_list[i:i + chunk_size] for i in range(0, len(geohash_list), chunk_size)]
+    if use_cache:
+        missing = [gh for gh in geohash_list if not road_way_store.has_tile(gh)]
+    else:
+        missing = list(geohash_list)
+    total_cache_hits = len(geohash_list) - len(missing)
+    total_cache_misses = len(missing)
     
-    all_results = []
-    total_failed = 0
-    total_cache_hits = 0
-    total_cache_misses = 0
+    # Await tiles already in flight; split the rest into chunks, one Overpass query each
+    waiting = {}
+    for gh in missing:
+        if gh in road_tile_fetches:
+            waiting.setdefault(road_tile_fetches[gh], []).append(gh)
+    to_fetch = [gh for gh in missing if gh not in road_tile_fetches]
+    chunks = [to_fetch[i:i + chunk_size] for i in range(0, len(to_fetch), chunk_size)]
+    logger.info(f"🔄 Processing {len(geohash_list)} geohashes: {total_cache_hits} cached, {len(missing) - len(to_fetch)} in flight, {len(to_fetch)} to fetch in {len(chunks)} chunks")
     
-    logger.info(f"🔄 Processing {len(geohash_list)} geohashes in {len(chunks)} chunks")
+    def release(chunk, future):
+        for gh in chunk:
+            if road_tile_fetches.get(gh) is future:
+                del road_tile_fetches[gh]
+        if not future.cancelled():
+            future.exception()
     
-    for chunk_idx, chunk in enumerate(chunks):
-        logger.info(f"📦 Processing chunk {chunk_idx + 1}/{len(chunks)} with {len(chunk)} geohashes")
-        
-        # Use ThreadPoolExecutor for I/O bound OSM requests
-        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunk))) as executor:
-            # Submit all tasks for this chunk
-            tasks = [
-                loop.run_in_executor(executor, fetch_roads_for_geohash_cached, geohash, use_cache)
-                for geohash in chunk
-            ]
-            
-            # Wait for all results in this chunk
-            chunk_results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            # Process chunk results
-            chunk_valid_results = []
-            chunk_failed = 0
-            chunk_cache_hits = 0
-            chunk_cache_misses = 0
-            
-            for i, result in enumerate(chunk_results):
-                if isinstance(result, Exception):
-                    logger.warning(f"⚠️ Failed to process geohash {chunk[i]}: {result}")
-                    chunk_failed += 1
-                else:
-                    gdf_result, cache_hit = result
-                    if cache_hit:
-                        chunk_cache_hits += 1
-                    else:
-                        chunk_cache_misses += 1
-                    
-                    if not gdf_result.empty:
-                        chunk_valid_results.append(gdf_result)
-                    else:
-                        chunk_failed += 1
+    if chunks:
+        # Use ThreadPoolExecutor for I/O bound OSM requests; it is not joined so
+        # fetches can outlive a request deadline
+        executor = ThreadPoolExecutor(max_workers=min(max_workers, len(chunks)))
+        for chunk in chunks:
+            future = loop.run_in_executor(executor, fetch_road_tiles, chunk)
+            for gh in chunk:
+                road_tile_fetches[gh] = future
+            future.add_done_callback(lambda done, chunk=chunk: release(chunk, done))
+            waiting[future] = chunk
+        executor.shutdown(wait=False)
+    
+    failed_tiles = set()
+    pending_tiles = set()
+    if waiting:
+        done, pending = await asyncio.wait(set(waiting), timeout=remaining_seconds(deadline))
+        for future in done:
+            chunk = waiting[future]
+            if future.exception() is not None:
+                logger.warning(f"⚠️ Failed to fetch chunk ({len(chunk)} geohashes): {future.exception()}")
+                failed_tiles.update(chunk)
+            else:
+                logger.info(f"✅ Chunk completed: {future.result()} ways for {len(chunk)} geohashes")
+        for future in pending:
+            pending_tiles.update(waiting[future])
+        if pending_tiles:
+            logger.info(f"⏳ Deadline reached with {len(pending_tiles)} geohashes still being fetched")
+    
+    finished = [gh for gh in geohash_list if gh not in pending_tiles]
+    segments, failed = await loop.run_in_executor(None, clip_road_tiles, finished, failed_tiles)
+    
+    logger.info(f"🎯 Total processing completed: {len(segments)} road segments, {len(failed)} failed, {total_cache_hits} cache hits")
+    
+    return segments, failed, total_cache_hits, total_cache_misses, [gh for gh in geohash_list if gh in pending_tiles]
+
+def geometry_from_geojson(geojson):
+    """Build a single shapely geometry from a GeoJSON geometry, Feature or FeatureCollection"""
+    from shapely.geometry import shape
+    from shapely.ops import unary_union
+    
+    if geojson.get("type") == "FeatureCollection":
+        return unary_union([shape(f["geometry"]) for f in geojson.get("features", []) if f.get("geometry")])
+    if geojson.get("type") == "Feature":
+        return shape(geojson["geometry"])
+    return shape(geojson)
+
+def country_boundary_table(db, country_id):
+    """Name of the boundary table configured for a country"""
+    from api.models.country import Country
+    
+    country = db.query(Country).filter(Country.id == country_id).first()
+    if not country:
+        raise HTTPException(status_code=404, detail="Country not found")
+    
+    table = getattr(country, 'table', None)
+    if not table or table == 'default_table':
+        raise HTTPException(status_code=400, detail=f"No boundary data table configured for {country.name}")
+    return table
+
+def load_region_geometry(db, country_id, region_id):
+    """Load one region geometry from the country's boundary table"""
+    from sqlalchemy import text
+    from shapely.geometry import shape
+    
+    table = country_boundary_table(db, country_id)
+    row = db.execute(
+        text(f"SELECT ST_AsGeoJSON(geom) AS geojson FROM {table} WHERE id = :region_id"),
+        {"region_id": region_id}
+    ).fetchone()
+    if not row or not row.geojson:
+        raise HTTPException(status_code=404, detail=f"Region {region_id} not found in '{table}'")
+    
+    return shape(json.loads(row.geojson))
+
+def generate_geohash_grid(boundary_geom, precision):
+    """Generate the unique geohash cells intersecting a boundary geometry"""
+    from shapely.geometry import box
+    from shapely.prepared import prep
+    
+    minx, miny, maxx, maxy = boundary_geom.bounds
+    prepared_boundary = prep(boundary_geom)
+    
+    # Use set to track unique geohashes and avoid duplicates
+    unique_geohashes = set()
+    geohash_list = []
+    
+    # Calculate step size based on precision (more conservative to ensure coverage)
+    lat_step = 0.008 if precision == 5 else 0.003 if precision == 6 else 0.001
+    lon_step = 0.008 if precision == 5 else 0.003 if precision == 6 else 0.001
+    
+    # Generate grid points
+    current_lat = miny
+    while current_lat <= maxy:
+        current_lon = minx
+        while current_lon <= maxx:
+            point_geohash = geohash2.encode(current_lat, current_lon, precision)
             
-            all_results.extend(chunk_valid_results)
-            total_failed += chunk_failed
-            total_cache_hits += chunk_cache_hits
-            total_cache_misses += chunk_cache_misses
+            # Skip if this geohash already processed
+            if point_geohash not in unique_geohashes:
+                unique_geohashes.add(point_geohash)
+                
+                decoded_lat, decoded_lon, lat_err, lon_err = geohash2.decode_exactly(point_geohash)
+                geohash_box = box(
+                    decoded_lon - lon_err, decoded_lat - lat_err,
+                    decoded_lon + lon_err, decoded_lat + lat_err
+                )
+                
+                # Check if geohash intersects with boundary
+                if prepared_boundary.intersects(geohash_box):
+                    geohash_list.append(point_geohash)
             
-            logger.info(f"✅ Chunk {chunk_idx + 1} completed: {len(chunk_valid_results)} valid, {chunk_failed} failed, {chunk_cache_hits} cache hits")
+            current_lon += lon_step
+        current_lat += lat_step
+    
+    return geohash_list
+
+def classify_geohash_cover(boundary_geom, precision):
+    """Geohash grid of a boundary as (geohash, is_interior) pairs; interior cells lie fully inside it"""
+    from shapely.prepared import prep
+    
+    prepared_boundary = prep(boundary_geom)
+    return sorted(
+        (gh, prepared_boundary.contains(cached_geohash_to_polygon(gh)))
+        for gh in generate_geohash_grid(boundary_geom, precision)
+    )
+
+def write_geohash_cover(db, country_id, region_id, precision, cover):
+    """Replace the stored cover of a boundary at one precision"""
+    db.query(BoundaryGeohashCover).filter(
+        BoundaryGeohashCover.country_id == country_id,
+        BoundaryGeohashCover.region_id == region_id,
+        BoundaryGeohashCover.precision == precision
+    ).delete(synchronize_session=False)
+    db.bulk_insert_mappings(BoundaryGeohashCover, [
+        {
+            "country_id": country_id,
+            "region_id": region_id,
+            "precision": precision,
+            "geohash": gh,
+            "is_interior": bool(is_interior)
+        }
+        for gh, is_interior in cover
+    ])
+    return len(cover)
+
+def build_geohash_cover(db, country_id, region_ids, precisions):
+    """Compute and store the geohash cover of a country's regions at the given precisions"""
+    from sqlalchemy import text
+    
+    table = country_boundary_table(db, country_id)
+    if not region_ids:
+        region_ids = [region_id for (region_id,) in db.execute(text(f"SELECT id FROM {table} ORDER BY id")).fetchall()]
+    
+    rows_written = 0
+    failed_regions = []
+    for region_id in region_ids:
+        try:
+            boundary_geom = load_region_geometry(db, country_id, region_id)
+            for precision in precisions:
+                cover = classify_geohash_cover(boundary_geom, precision)
+                rows_written += write_geohash_cover(db, country_id, region_id, precision, cover)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"⚠️ Failed to build geohash cover for region {region_id} of '{table}': {e}")
+            failed_regions.append(region_id)
+    
+    return {
+        "country_id": country_id,
+        "table": table,
+        "precisions": precisions,
+        "covered_regions": len(region_ids) - len(failed_regions),
+        "failed_regions": failed_regions,
+        "rows_written": rows_written
+    }
+
+def lookup_geohash_cover(db, country_id, region_id, precision):
+    """Stored cover of a boundary as (geohash, is_interior) pairs, or None when it was never built"""
+    rows = db.query(BoundaryGeohashCover.geohash, BoundaryGeohashCover.is_interior).filter(
+        BoundaryGeohashCover.country_id == country_id,
+        BoundaryGeohashCover.region_id == region_id,
+        BoundaryGeohashCover.precision == precision
+    ).order_by(BoundaryGeohashCover.geohash).all()
+    return [(row.geohash, row.is_interior) for row in rows] or None
+
+def region_geohash_cover(db, country_id, region_id, precision):
+    """Cover of a boundary region from the cover table; computed and stored first on a miss"""
+    cover = lookup_geohash_cover(db, country_id, region_id, precision)
+    if cover is not None:
+        return cover, "cover_table"
+    
+    cover = classify_geohash_cover(load_region_geometry(db, country_id, region_id), precision)
+    try:
+        write_geohash_cover(db, country_id, region_id, precision, cover)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"⚠️ Could not store geohash cover for region {region_id}: {e}")
+    return cover, "computed"
+
+def geohash_cells_to_geojson(geohash_list, counts=None, interior=None):
+    """Convert a list of geohashes into a GeoJSON FeatureCollection of cell polygons"""
+    features = []
+    for gh in geohash_list:
+        decoded_lat, decoded_lon, lat_err, lon_err = geohash2.decode_exactly(gh)
+        properties = {
+            "geoHash": gh,
+            "center_lat": decoded_lat,
+            "center_lon": decoded_lon
+        }
+        if counts is not None and gh in counts:
+            properties["count"] = int(counts[gh])
+        if interior is not None:
+            properties["interior"] = gh in interior
+        features.append({
+            "type": "Feature",
+            "properties": properties,
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[
+                    [decoded_lon - lon_err, decoded_lat - lat_err],
+                    [decoded_lon + lon_err, decoded_lat - lat_err],
+                    [decoded_lon + lon_err, decoded_lat + lat_err],
+                    [decoded_lon - lon_err, decoded_lat + lat_err],
+                    [decoded_lon - lon_err, decoded_lat - lat_err]
+                ]]
+            }
+        })
+    return {
+        "type": "FeatureCollection",
+        "features": features
+    }
+
+async def select_dense_geohashes(polygon, tag_filters, top_percent, precision, deadline=None):
+    """Select the densest geohash cells inside a polygon using OSM POI and road counts"""
+    # 1. Fetch POI and road data in parallel (optimized)
+    logger.info("📡 Fetching OSM data in parallel...")
+    tags_dict = {tag: True for tag in tag_filters}
+    road_tags = {'highway': ['motorway', 'trunk', 'primary', 'secondary']}
+    
+    try:
+        poi_gdf, roads_gdf = await fetch_osm_data_parallel(polygon, tags_dict, road_tags, deadline)
+    except RequestDeadlineExceeded:
+        raise
+    except Exception as e:
+        # A failed fetch is reported, not treated as an area without POIs
+        logger.error(f"❌ Failed to fetch OSM data after adaptive splitting: {e}")
+        raise HTTPException(status_code=502, detail=f"OSM data could not be fetched: {e}")
+
+    # 2. Combine POI and roads data
+    logger.info(f"📊 Found {len(poi_gdf)} POI features and {len(roads_gdf)} road features")
+    all_gdf = pd.concat([poi_gdf, roads_gdf], ignore_index=True)
+    if all_gdf.empty:
+        logger.error("❌ No POI or road data found.")
+        raise HTTPException(status_code=400, detail="No POI or road data found")
+    
+    logger.info(f"🔄 Processing {len(all_gdf)} total features...")
+
+    # 3. Encode to geohash (optimized batch processing)
+    logger.info("🔢 Encoding geometries to geohash...")
+    all_gdf['geohash'] = encode_geohash_batch(all_gdf.geometry, precision)
+    all_gdf = all_gdf.dropna(subset=['geohash'])
+    all_gdf = all_gdf[all_gdf['geohash'].apply(lambda x: isinstance(x, str))]
+
+    # 4. Count objects per geohash
+    logger.info("📈 Calculating geohash density...")
+    count_df = all_gdf.groupby('geohash').size().reset_index(name='count')
+    threshold = count_df['count'].quantile(1 - top_percent)
+    dense_df = count_df[count_df['count'] >= threshold]
+    
+    logger.info(f"📍 Selected {len(dense_df)} dense geohash areas (threshold: {threshold:.1f})")
+    
+    # Early exit if no dense areas found
+    if dense_df.empty:
+        logger.warning("⚠️ No dense areas found with current threshold")
+        return gpd.GeoDataFrame(columns=['geohash', 'count', 'geometry'], geometry='geometry', crs='EPSG:4326')
+
+    # 5. Add geohash that become "centers" of dense neighbors (optimized)
+    logger.info("📍 Finding missing center geohash areas...")
+    existing_geohashes = set(dense_df['geohash'].values)
+    all_neighbors = []
+    
+    # Batch process neighbors
+    for gh in dense_df['geohash']:
+        try:
+            nbs = geohash2.neighbors(gh)
+            all_neighbors.extend(nbs)
+        except:
+            continue
+    
+    # Use Counter for frequency count
+    freq = Counter(all_neighbors)
+    missing = [g for g, count in freq.items() 
+              if g not in existing_geohashes and count >= 2]
+    
+    if missing:
+        df_extra = count_df[count_df['geohash'].isin(missing)]
+        dense_df = pd.concat([dense_df, df_extra], ignore_index=True)
+
+    # 6. Convert geohash to polygon (using cached function)
+    logger.info("🔄 Converting geohash to polygons...")
+    dense_gdf = gpd.GeoDataFrame({
+        'geohash': dense_df['geohash'],
+        'count': dense_df['count'],
+        'geometry': dense_df['geohash'].apply(cached_geohash_to_polygon)
+    }, crs='EPSG:4326')
+
+    # 7. Remove spatial outliers
+    logger.info("🧹 Removing outlier geohash areas...")
+    dense_union = dense_gdf.unary_union
+    if dense_union.geom_type == 'MultiPolygon':
+        largest = max(dense_union.geoms, key=lambda g: g.area)
+    else:
+        largest = dense_union
+    return dense_gdf[dense_gdf.geometry.intersects(largest)]
+
+def drop_duplicate_road_pieces(roads):
+    """Drop clipped pieces that repeat the same way geometry"""
+    import shapely
+    
+    geometries = shapely.normalize(np.asarray(roads.geometry.values))
+    keys = pd.DataFrame({'osmid': roads['osmid'].values, 'wkb': shapely.to_wkb(geometries)})
+    return roads[~keys.duplicated().values].reset_index(drop=True)
+
+async def calculate_ukm_for_geohashes(geohash_list, max_workers=8, chunk_size=10, use_cache=True, deadline=None):
+    """Fetch, clip and measure roads for a list of geohashes"""
+    segments, failed, cache_hits, cache_misses, pending = await fetch_roads_parallel_advanced(
+        geohash_list,
+        max_workers=max_workers,
+        chunk_size=chunk_size,
+        use_cache=use_cache,
+        deadline=deadline
+    )
+    
+    result = {
+        "roads": None,
+        "breakdown": [],
+        "total_road_segments": 0,
+        "total_road_length_km": 0.0,
+        "failed_geohashes": len(failed),
+        "failed_geohash_ids": failed,
+        "pending_geohashes": pending,
+        "cache_hits": cache_hits,
+        "cache_misses": cache_misses
+    }
+    
+    if not segments.empty:
+        total_length_km = float(segments['length_km'].sum())
+        logger.info(f"📊 Total road length: {total_length_km:.2f} km from {len(segments)} segments")
+        
+        breakdown = await asyncio.get_event_loop().run_in_executor(None, road_km_breakdown, segments)
+        result.update({
+            "roads": segments,
+            "breakdown": breakdown,
+            "total_road_segments": len(segments),
+            "total_road_length_km": round(total_length_km, 2)
+        })
+    
+    return result
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash_children(geohash_str):
+    """The 32 geohashes one precision level below a geohash"""
+    return [geohash_str + c for c in GEOHASH_BASE32]
+
+def summarize_road_km(segments, geohash_list=(), precision=None):
+    """Road km and segment count per (geohash, highway class), with empty markers for cells without roads.
+
+    With a precision, segment geohashes are truncated to that length first.
+    """
+    columns = ['geohash', 'highway', 'road_km', 'segment_count']
+    if segments.empty:
+        summary = pd.DataFrame(columns=columns)
+    else:
+        frame = pd.DataFrame({
+            'geohash': segments['geohash'].astype(str).str[:precision].values,
+            'highway': segments['highway'].astype(object).fillna('unknown').values,
+            'km': segments['length_km'].values
+        })
+        summary = frame.groupby(['geohash', 'highway']).agg(
+            road_km=('km', 'sum'), segment_count=('km', 'size')
+        ).reset_index()
+    
+    empty = sorted(set(geohash_list) - set(summary['geohash']))
+    if empty:
+        markers = pd.DataFrame({'geohash': empty, 'highway': None, 'road_km': 0.0, 'segment_count': 0})
+        summary = pd.concat([summary, markers], ignore_index=True)
+    summary['precision'] = precision
+    return summary
+
+def write_road_km_rows(db, summary, snapshot):
+    """Replace the index rows of the summarized geohashes for a snapshot"""
+    geohashes = summary['geohash'].unique().tolist()
+    for i in range(0, len(geohashes), 1000):
+        db.query(RoadKmIndex).filter(
+            RoadKmIndex.snapshot == snapshot,
+            RoadKmIndex.geohash.in_(geohashes[i:i + 1000])
+        ).delete(synchronize_session=False)
+    
+    rows = [
+        {
+            "snapshot": snapshot,
+            "geohash": row.geohash,
+            "precision": int(row.precision),
+            "highway": row.highway if isinstance(row.highway, str) else None,
+            "road_km": float(row.road_km),
+            "segment_count": int(row.segment_count)
+        }
+        for row in summary.itertuples(index=False)
+    ]
+    db.bulk_insert_mappings(RoadKmIndex, rows)
+    return len(rows)
+
+def write_road_km_ways(db, way_cells, geohash_list, snapshot):
+    """Replace the way-to-cell rows of the given precision-6 cells for a snapshot"""
+    from sqlalchemy import text
+    
+    for i in range(0, len(geohash_list), 1000):
+        db.execute(text("""
+            UPDATE road_km_index_way SET geohashes = ARRAY(
+                SELECT unnest(geohashes) EXCEPT SELECT unnest(CAST(:cells AS varchar[]))
+            )
+            WHERE snapshot = :snapshot AND geohashes && CAST(:cells AS varchar[])
+        """), {"snapshot": snapshot, "cells": list(geohash_list[i:i + 1000])})
+    db.execute(
+        text("DELETE FROM road_km_index_way WHERE snapshot = :snapshot AND cardinality(geohashes) = 0"),
+        {"snapshot": snapshot}
+    )
+    
+    rows = [
+        {
+            "snapshot": snapshot,
+            "osmid": int(osmid),
+            "geohashes": cells,
+            # Node id 0 marks a coordinate whose node was not returned
+            "nodes": [int(ref) for ref in nodes if ref] if nodes is not None else None
+        }
+        for osmid, cells, nodes in way_cells if cells
+    ]
+    if rows:
+        db.execute(text("""
+            INSERT INTO road_km_index_way (snapshot, osmid, geohashes, nodes)
+            VALUES (:snapshot, :osmid, CAST(:geohashes AS varchar[]), CAST(:nodes AS bigint[]))
+            ON CONFLICT (snapshot, osmid) DO UPDATE SET
+                geohashes = ARRAY(SELECT DISTINCT unnest(road_km_index_way.geohashes || EXCLUDED.geohashes)),
+                nodes = EXCLUDED.nodes
+        """), rows)
+    return len(rows)
+
+def roll_up_road_km_index(db, parents, snapshot):
+    """Write precision-5 rows for parents whose 32 precision-6 children are all indexed"""
+    from sqlalchemy import func as sql_func
+    
+    written = 0
+    for parent in parents:
+        prefix_filter = (
+            RoadKmIndex.snapshot == snapshot,
+            RoadKmIndex.precision == 6,
+            RoadKmIndex.geohash.like(f"{parent}%")
+        )
+        indexed_children = db.query(sql_func.count(sql_func.distinct(RoadKmIndex.geohash))).filter(*prefix_filter).scalar()
+        if indexed_children < len(GEOHASH_BASE32):
+            continue
+        
+        rows = db.query(
+            RoadKmIndex.highway,
+            sql_func.sum(RoadKmIndex.road_km),
+            sql_func.sum(RoadKmIndex.segment_count)
+        ).filter(*prefix_filter, RoadKmIndex.highway.isnot(None)).group_by(RoadKmIndex.highway).all()
+        summary = pd.DataFrame(rows, columns=['highway', 'road_km', 'segment_count'])
+        if summary.empty:
+            summary = pd.DataFrame([{'highway': None, 'road_km': 0.0, 'segment_count': 0}])
+        summary['geohash'] = parent
+        summary['precision'] = 5
+        written += write_road_km_rows(db, summary, snapshot)
+    return written
+
+def build_road_km_index(db, geohash_list, snapshot, chunk_size=10, max_workers=8):
+    """Fetch, clip and index road km for precision-6 geohashes at precision 7, 6 and 5"""
+    geohash_list = list(dict.fromkeys(gh for gh in geohash_list if len(gh) == 6))
+    missing = [gh for gh in geohash_list if not road_way_store.has_tile(gh)]
+    chunks = [missing[i:i + chunk_size] for i in range(0, len(missing), chunk_size)]
+    
+    failed_tiles = set()
+    if chunks:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            futures = {executor.submit(fetch_road_tiles, chunk): chunk for chunk in chunks}
+            for future, chunk in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.warning(f"⚠️ Failed to fetch {len(chunk)} geohashes for the road-km index: {e}")
+                    failed_tiles.update(chunk)
+    
+    # Tiles that could not be fetched are left out rather than indexed as empty
+    indexed = [gh for gh in geohash_list if gh not in failed_tiles]
+    ways = road_way_store.tile_ways(indexed)
+    way_cells = road_way_store.way_cells(indexed)
+    children = [child for gh in indexed for child in geohash_children(gh)]
+    
+    summary = pd.concat([
+        summarize_road_km(clip_roads_to_cells(ways, indexed), indexed, 6),
+        summarize_road_km(clip_roads_to_cells(ways, children), children, 7)
+    ], ignore_index=True)
+    
+    try:
+        rows_written = write_road_km_rows(db, summary, snapshot) if indexed else 0
+        rows_written += roll_up_road_km_index(db, sorted({gh[:5] for gh in indexed}), snapshot)
+        write_road_km_ways(db, way_cells, indexed, snapshot)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    
+    return {
+        "snapshot": snapshot,
+        "indexed_geohashes": len(indexed),
+        "failed_geohashes": sorted(failed_tiles),
+        "rows_written": rows_written
+    }
+
+def carry_road_km_index(db, previous, snapshot):
+    """Copy a snapshot's index rows (and way rows) to a new snapshot that has none yet, returning the rows copied"""
+    from sqlalchemy import insert, select, literal, text
+    
+    if db.query(RoadKmIndex.id).filter(RoadKmIndex.snapshot == snapshot).first() is not None:
+        return 0
+    try:
+        result = db.execute(insert(RoadKmIndex).from_select(
+            ['snapshot', 'geohash', 'precision', 'highway', 'road_km', 'segment_count'],
+            select(
+                literal(snapshot), RoadKmIndex.geohash, RoadKmIndex.precision,
+                RoadKmIndex.highway, RoadKmIndex.road_km, RoadKmIndex.segment_count
+            ).where(RoadKmIndex.snapshot == previous)
+        ))
+        db.execute(text("""
+            INSERT INTO road_km_index_way (snapshot, osmid, geohashes, nodes)
+            SELECT :snapshot, osmid, geohashes, nodes FROM road_km_index_way WHERE snapshot = :previous
+        """), {"snapshot": snapshot, "previous": previous})
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result.rowcount
+
+def road_km_way_nodes(db, snapshot, node_ids):
+    """The node ids of a set that belong to a way of the road-km index"""
+    from sqlalchemy import text
+    
+    node_ids = list(node_ids)
+    return {row[0] for row in db.execute(text("""
+        SELECT DISTINCT n FROM road_km_index_way w, unnest(w.nodes) n
+        WHERE w.snapshot = :snapshot
+          AND w.nodes && CAST(:node_ids AS bigint[])
+          AND n = ANY(CAST(:node_ids AS bigint[]))
+    """), {"snapshot": snapshot, "node_ids": node_ids})}
+
+def has_road_km_ways(db, snapshot):
+    """Whether the road-km index of a snapshot has its way-to-cell rows"""
+    return db.query(RoadKmIndexWay.id).filter(RoadKmIndexWay.snapshot == snapshot).first() is not None
+
+def road_km_index_changed_cells(db, snapshot, changes, highway_classes):
+    """Precision-6 cells that a set of OSM changes touches, resolved from the index's way rows.
+
+    Indexed ways are found by way id or by any changed or deleted node, so
+    their cells are marked even when the way store never held them. Cells
+    are widened to the new node positions. Changed road ways are placed from
+    the change file's node coordinates, falling back to the way store and to
+    the indexed ways holding their other nodes. Returns the cells and the ids
+    of changed road ways that could not be placed.
+    """
+    from sqlalchemy import text
+    from shapely.geometry import box
+    
+    classes = set(highway_classes)
+    changed_nodes = changes["nodes"]
+    deleted_nodes = changes["deleted_nodes"]
+    changed_ways = changes["ways"]
+    
+    def region_cells(points, cells):
+        """Cells covering the bbox of some (lon, lat) points and cells"""
+        bounds = [cached_geohash_to_polygon(gh).bounds for gh in cells] + [(x, y, x, y) for x, y in points]
+        if not bounds:
+            return set()
+        minx, miny = min(b[0] for b in bounds), min(b[1] for b in bounds)
+        maxx, maxy = max(b[2] for b in bounds), max(b[3] for b in bounds)
+        covered = set(generate_geohash_grid(box(minx, miny, maxx, maxy), 6))
+        return covered | set(cells) | {cached_geohash_encode(y, x, 6) for x, y in points}
+    
+    rows = db.execute(text("""
+        SELECT osmid, geohashes, nodes FROM road_km_index_way
+        WHERE snapshot = :snapshot
+          AND (osmid = ANY(CAST(:way_ids AS bigint[])) OR nodes && CAST(:node_ids AS bigint[]))
+    """), {
+        "snapshot": snapshot,
+        "way_ids": list(changed_ways),
+        "node_ids": list(changed_nodes) + list(deleted_nodes)
+    }).fetchall()
+    
+    touched = set()
+    for row in rows:
+        if row.osmid in changed_ways:
+            # Old cells of created, modified and deleted ways
+            touched |= set(row.geohashes)
+        else:
+            # Unchanged ways whose nodes moved reach from their old cells to the new positions
+            moved = [changed_nodes[ref] for ref in row.nodes or [] if ref in changed_nodes]
+            touched |= region_cells(moved, row.geohashes)
+    
+    new_ways = {
+        osmid: change for osmid, change in changed_ways.items()
+        if not change["deleted"] and change["tags"].get("highway") in classes
+    }
+    refs = {ref for change in new_ways.values() for ref in change["nodes"]
+            if ref not in changed_nodes and ref not in deleted_nodes}
+    stored = road_way_store.node_coordinates(refs)
+    unknown = refs - set(stored)
+    
+    # Unchanged nodes lie somewhere inside the cells of an indexed way holding them
+    holders = {}
+    if unknown:
+        for row in db.execute(text("""
+            SELECT geohashes, nodes FROM road_km_index_way
+            WHERE snapshot = :snapshot AND nodes && CAST(:node_ids AS bigint[])
+        """), {"snapshot": snapshot, "node_ids": list(unknown)}):
+            for ref in unknown.intersection(row.nodes):
+                holders.setdefault(ref, set()).update(row.geohashes)
+    
+    unplaced = []
+    for osmid, change in new_ways.items():
+        points, cells = [], set()
+        for ref in change["nodes"]:
+            if ref in deleted_nodes:
+                continue
+            point = changed_nodes.get(ref) or stored.get(ref)
+            if point is not None:
+                points.append(point)
+            elif ref in holders:
+                cells |= holders[ref]
+            else:
+                unplaced.append(osmid)
+                break
+        else:
+            touched |= region_cells(points, cells)
+    
+    return touched, unplaced
+
+def indexed_geohashes(db, snapshot, geohash_list):
+    """The precision-6 geohashes of a list that are indexed for a snapshot"""
+    geohash_list = sorted(set(geohash_list))
+    found = []
+    for i in range(0, len(geohash_list), 1000):
+        found.extend(gh for (gh,) in db.query(RoadKmIndex.geohash).filter(
+            RoadKmIndex.snapshot == snapshot,
+            RoadKmIndex.precision == 6,
+            RoadKmIndex.geohash.in_(geohash_list[i:i + 1000])
+        ).distinct().all())
+    return found
+
+def latest_road_km_snapshot(db):
+    """Snapshot of the most recently built road-km index rows.
+
+    Snapshot ids are free-form labels, so they are ordered by build time, not compared.
+    """
+    return db.query(RoadKmIndex.snapshot).order_by(
+        RoadKmIndex.created_at.desc(), RoadKmIndex.id.desc()
+    ).limit(1).scalar()
+
+def lookup_road_km(db, geohash_list, snapshot=None):
+    """Sum indexed road km for a list of geohashes (precision 5-7), broken down by highway class"""
+    snapshot = snapshot or latest_road_km_snapshot(db)
+    
+    # Drop cells already covered by an ancestor in the list so nothing is counted twice
+    requested = set(gh for gh in geohash_list if 5 <= len(gh) <= 7)
+    unique = sorted(gh for gh in requested if not any(gh[:p] in requested for p in range(5, len(gh))))
+    
+    rows = []
+    if snapshot:
+        for i in range(0, len(unique), 1000):
+            rows.extend(db.query(
+                RoadKmIndex.geohash, RoadKmIndex.highway, RoadKmIndex.road_km, RoadKmIndex.segment_count
+            ).filter(
+                RoadKmIndex.snapshot == snapshot,
+                RoadKmIndex.geohash.in_(unique[i:i + 1000])
+            ).all())
+    table = pd.DataFrame(rows, columns=['geohash', 'highway', 'road_km', 'segment_count'])
+    
+    found = set(table['geohash'])
+    by_class = table.dropna(subset=['highway']).groupby('highway')['road_km'].sum()
+    by_geohash = table.groupby('geohash')['road_km'].sum()
+    breakdown = [
+        {
+            "geohash": row.geohash,
+            "highway": row.highway,
+            "road_km": round(float(row.road_km), 4),
+            "segment_count": int(row.segment_count)
+        }
+        for row in table.dropna(subset=['highway']).sort_values(['geohash', 'highway']).itertuples(index=False)
+    ]
+    
+    return {
+        "snapshot": snapshot,
+        "total_road_length_km": round(float(table['road_km'].sum()), 2),
+        "total_road_segments": int(table['segment_count'].sum()),
+        "road_km_by_class": {str(k): round(float(v), 4) for k, v in by_class.items()},
+        "road_km_by_geohash": {str(k): round(float(v), 4) for k, v in by_geohash.items()},
+        "breakdown": breakdown,
+        "indexed_geohashes": sorted(found),
+        "missing_geohashes": [gh for gh in unique if gh not in found]
+    }
+
+UKM_ESTIMATE_Z = 1.96  # 95% confidence range
+UKM_ESTIMATE_MIN_SIBLINGS = 3
+
+def collect_cell_km_samples(db, parents, snapshot=None):
+    """Known road km per precision-6 cell, from completed plans and the road-km index"""
+    from sqlalchemy import func as sql_func
+    
+    samples = {}
+    for plan in plan_storage.values():
+        if plan["failed_geohashes"]:
+            continue
+        for gh in plan["dense_geohashes"]:
+            if len(gh) == 6:
+                samples[gh] = plan["road_km_by_geohash"].get(gh, 0.0)
+    
+    snapshot = snapshot or latest_road_km_snapshot(db)
+    parents = sorted(parents)
+    if snapshot:
+        for i in range(0, len(parents), 500):
+            rows = db.query(
+                RoadKmIndex.geohash, sql_func.sum(RoadKmIndex.road_km)
+            ).filter(
+                RoadKmIndex.snapshot == snapshot,
+                RoadKmIndex.precision == 6,
+                sql_func.substr(RoadKmIndex.geohash, 1, 5).in_(parents[i:i + 500])
+            ).group_by(RoadKmIndex.geohash).all()
+            samples.update({gh: float(km) for gh, km in rows})
+    return samples
+
+def estimate_ukm(db, geohash_list, snapshot=None):
+    """Immediate road km estimate for precision-6 geohashes with a confidence range.
+
+    Cells already in the way store or with a known value are counted exactly; the
+    rest are estimated from sibling cells in the same precision-5 parent, falling
+    back to all known cells.
+    """
+    geohash_list = list(dict.fromkeys(geohash_list))
+    exact = {}
+    
+    cached = [gh for gh in geohash_list if road_way_store.has_tile(gh)]
+    if cached:
+        exact.update({gh: 0.0 for gh in cached})
+        exact.update(road_km_by_geohash(road_way_store.clip_tiles(cached)))
+    
+    remaining = [gh for gh in geohash_list if gh not in exact]
+    samples = collect_cell_km_samples(db, {gh[:5] for gh in remaining}, snapshot) if remaining else {}
+    exact.update({gh: samples[gh] for gh in remaining if gh in samples})
+    unknown = [gh for gh in geohash_list if gh not in exact]
+    
+    by_parent = {}
+    for gh, km in samples.items():
+        by_parent.setdefault(gh[:5], []).append(km)
+    all_values = np.asarray(list(samples.values()), dtype=np.float64)
+    
+    unknown_by_parent = Counter(gh[:5] for gh in unknown)
+    estimated_km = 0.0
+    variance = 0.0
+    unestimated = 0
+    for parent, n in unknown_by_parent.items():
+        values = by_parent.get(parent, [])
+        values = np.asarray(values, dtype=np.float64) if len(values) >= UKM_ESTIMATE_MIN_SIBLINGS else all_values
+        if len(values) < 2:
+            unestimated += n
+            continue
+        # Sum of n unseen cells: per-cell spread plus the uncertainty of the sample mean
+        k = len(values)
+        estimated_km += n * float(values.mean())
+        variance += float(values.var(ddof=1)) * (n + n * n / k)
     
-    logger.info(f"🎯 Total processing completed: {len(all_results)} valid results, {total_failed} failed, {total_cache_hits} cache hits")
+    exact_km = float(sum(exact.values()))
+    if unestimated:
+        total, low, high, basis = None, None, None, "insufficient_samples"
+    else:
+        half_width = UKM_ESTIMATE_Z * float(np.sqrt(variance))
+        total = round(exact_km + estimated_km, 2)
+        low = round(max(exact_km, exact_km + estimated_km - half_width), 2)
+        high = round(exact_km + estimated_km + half_width, 2)
+        basis = "exact" if not unknown else "sampled_cells"
     
-    return all_results, total_failed, total_cache_hits, total_cache_misses
+    return {
+        "total_road_length_km": total,
+        "low_km": low,
+        "high_km": high,
+        "confidence": 0.95,
+        "exact_geohashes": len(exact),
+        "estimated_geohashes": len(unknown) - unestimated,
+        "unestimated_geohashes": unestimated,
+        "basis": basis
+    }
+
+# pg_advisory_xact_lock namespace serializing version numbering per campaign
+PLAN_VERSION_LOCK_KEY = 4_108_272
+
+def next_plan_version(db, campaign_id, parent_plan_id=None):
+    """Version number for a new plan: next in its campaign, else one past its parent.
+
+    Numbering within a campaign holds a per-campaign advisory lock until the
+    caller's transaction ends, so concurrent saves get distinct versions.
+    """
+    from sqlalchemy import func as sql_func, text
+    
+    if campaign_id is not None:
+        db.execute(text("SELECT pg_advisory_xact_lock(:key, :campaign_id)"),
+                   {"key": PLAN_VERSION_LOCK_KEY, "campaign_id": campaign_id})
+        latest = db.query(sql_func.max(CampaignPlan.version)).filter(CampaignPlan.campaign_id == campaign_id).scalar()
+        return (latest or 0) + 1
+    if parent_plan_id is None:
+        return 1
+    parent = plan_storage.get(parent_plan_id)
+    if parent is not None:
+        return (parent.get("version") or 0) + 1
+    # Evicted from memory: read the version from the plan store
+    version = db.query(CampaignPlan.version).filter(CampaignPlan.id == parent_plan_id).scalar()
+    return (version or 0) + 1
+
+def save_plan(db, plan_id, plan):
+    """Write a plan (header, geohash cells and clipped road segments) to the plan store"""
+    from geoalchemy2.shape import from_shape
+    
+    try:
+        plan["version"] = next_plan_version(db, plan.get("campaign_id"), plan.get("parent_plan_id"))
+        db.add(CampaignPlan(
+            id=plan_id,
+            campaign_id=plan.get("campaign_id"),
+            version=plan["version"],
+            parent_plan_id=plan.get("parent_plan_id"),
+            snapshot=plan.get("snapshot"),
+            country_id=plan.get("country_id"),
+            region_id=plan.get("region_id"),
+            precision=plan["precision"],
+            top_percent=plan.get("top_percent"),
+            total_road_segments=plan["total_road_segments"],
+            total_road_length_km=plan["total_road_length_km"],
+            failed_geohashes=plan["failed_geohashes"],
+            breakdown=plan["breakdown"],
+            timings=plan["timings"]
+        ))
+        db.flush()
+        
+        grid = set(plan["grid_geohashes"])
+        dense = set(plan["dense_geohashes"])
+        failed = set(plan.get("failed_geohash_ids", []))
+        db.bulk_insert_mappings(CampaignPlanGeohash, [
+            {
+                "plan_id": plan_id,
+                "geohash": gh,
+                "in_grid": gh in grid,
+                "is_dense": gh in dense,
+                "is_failed": gh in failed,
+                "poi_count": plan["dense_counts"].get(gh),
+                "road_km": plan["road_km_by_geohash"].get(gh, 0.0),
+                "geom": from_shape(cached_geohash_to_polygon(gh), srid=4326)
+            }
+            for gh in dict.fromkeys(plan["grid_geohashes"] + plan["dense_geohashes"])
+        ])
+        
+        roads = plan["roads"]
+        if roads is not None and not roads.empty:
+            osmids = pd.to_numeric(roads['osmid'], errors='coerce') if 'osmid' in roads else pd.Series([None] * len(roads))
+            for start in range(0, len(roads), 5000):
+                chunk = roads.iloc[start:start + 5000]
+                db.bulk_insert_mappings(CampaignPlanRoad, [
+                    {
+                        "plan_id": plan_id,
+                        "geohash": str(geohash_str),
+                        "osmid": int(osmid) if pd.notna(osmid) else None,
+                        "highway": highway if isinstance(highway, str) else None,
+                        "name": name[:255] if isinstance(name, str) else None,
+                        "length_km": float(length_km),
+                        "geom": from_shape(geometry, srid=4326)
+                    }
+                    for geohash_str, osmid, highway, name, length_km, geometry in zip(
+                        chunk['geohash'], osmids.iloc[start:start + 5000],
+                        chunk['highway'] if 'highway' in chunk else [None] * len(chunk),
+                        chunk['name'] if 'name' in chunk else [None] * len(chunk),
+                        chunk['length_km'], chunk.geometry
+                    )
+                ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return plan["version"]
+
+def load_plan(db, plan_id):
+    """Rebuild a plan from the plan store (None when it is not stored)"""
+    import shapely
+    from sqlalchemy import func as sql_func
+    
+    header = db.query(CampaignPlan).filter(CampaignPlan.id == plan_id).first()
+    if header is None:
+        return None
+    
+    cells = db.query(
+        CampaignPlanGeohash.geohash, CampaignPlanGeohash.in_grid,
+        CampaignPlanGeohash.is_dense, CampaignPlanGeohash.is_failed, CampaignPlanGeohash.poi_count
+    ).filter(CampaignPlanGeohash.plan_id == plan_id).order_by(CampaignPlanGeohash.id).all()
+    rows = db.query(
+        CampaignPlanRoad.geohash, CampaignPlanRoad.osmid, CampaignPlanRoad.highway,
+        CampaignPlanRoad.name, CampaignPlanRoad.length_km, sql_func.ST_AsBinary(CampaignPlanRoad.geom)
+    ).filter(CampaignPlanRoad.plan_id == plan_id).order_by(CampaignPlanRoad.id).all()
+    
+    roads = None
+    if rows:
+        geohashes, osmids, highways, names, lengths, wkb = zip(*rows)
+        roads = gpd.GeoDataFrame({
+            'geohash': pd.Categorical(geohashes),
+            'osmid': pd.to_numeric(pd.Series(osmids), errors='coerce'),
+            'highway': list(highways),
+            'name': list(names),
+            'length_km': np.asarray(lengths, dtype=float)
+        }, geometry=shapely.from_wkb([bytes(value) for value in wkb]), crs='EPSG:4326')
+    
+    dense_geohashes = [cell.geohash for cell in cells if cell.is_dense]
+    return {
+        "created_at": header.created_at.isoformat() if header.created_at else None,
+        "campaign_id": header.campaign_id,
+        "version": header.version,
+        "parent_plan_id": header.parent_plan_id,
+        "snapshot": header.snapshot,
+        "country_id": header.country_id,
+        "region_id": header.region_id,
+        "precision": header.precision,
+        "top_percent": header.top_percent,
+        "grid_geohashes": [cell.geohash for cell in cells if cell.in_grid],
+        "dense_geohashes": dense_geohashes,
+        "dense_counts": {cell.geohash: cell.poi_count for cell in cells if cell.is_dense and cell.poi_count is not None},
+        "roads": roads,
+        "road_km_by_geohash": road_km_by_geohash(roads),
+        "breakdown": header.breakdown or [],
+        "total_road_segments": header.total_road_segments or 0,
+        "total_road_length_km": header.total_road_length_km or 0.0,
+        "failed_geohashes": header.failed_geohashes or 0,
+        "failed_geohash_ids": [cell.geohash for cell in cells if cell.is_failed],
+        "timings": header.timings or {}
+    }
+
+def stored_plan(db, plan_id):
+    """A plan from memory, or from the plan store (kept in memory afterwards)"""
+    plan = plan_storage.get(plan_id)
+    if plan is None:
+        plan = load_plan(db, plan_id)
+        if plan is not None:
+            plan_storage[plan_id] = plan
+    return plan
+
+def store_plan(db, plan_id, plan):
+    """Keep a new plan in memory and write it to the plan store.
+
+    Returns (version, persisted). A plan that could not be written has no
+    version and only lives in memory until it is evicted or the API restarts.
+    """
+    plan_storage[plan_id] = plan
+    try:
+        return save_plan(db, plan_id, plan), True
+    except Exception as e:
+        logger.error(f"❌ Failed to write plan {plan_id} to the plan store: {e}")
+        plan["version"] = None
+        return None, False
+
+def roads_from_geojson(roads_geojson, precision):
+    """Road segments from a GeoJSON FeatureCollection, labelled with the cell they lie in"""
+    columns = ['geohash', 'osmid', 'highway', 'name', 'length_km', 'geometry']
+    features = (roads_geojson or {}).get("features") or []
+    if not features:
+        return None
+    
+    roads = gpd.GeoDataFrame.from_features(features, crs="EPSG:4326")
+    roads = roads[roads.geometry.notna() & roads.geometry.geom_type.isin(["LineString", "MultiLineString"])]
+    if roads.empty:
+        return None
+    
+    points = roads.geometry.representative_point()
+    roads['geohash'] = pd.Categorical([geohash2.encode(pt.y, pt.x, precision) for pt in points])
+    roads['length_km'] = geodesic_lengths_km(roads.geometry.values)
+    for col in ('osmid', 'highway', 'name'):
+        if col not in roads:
+            roads[col] = None
+    return roads[columns].reset_index(drop=True)
+
+def latest_campaign_plan_id(db, campaign_id, version=None):
+    """Id of a campaign's latest stored plan, or of one version"""
+    query = db.query(CampaignPlan.id).filter(CampaignPlan.campaign_id == campaign_id)
+    if version is not None:
+        query = query.filter(CampaignPlan.version == version)
+    row = query.order_by(CampaignPlan.version.desc()).first()
+    return row.id if row else None
 
 @router.get("/health")
 async def health_check():
@@ -402,6 +2438,9 @@ async def health_check():
             "complete_analysis",
             "calculate_target_ukm",
             "calculate_target_ukm_advanced",
+            "road_km_index",
+            "geohash_cover",
+            "plan",
             "status_monitoring",
             "cache_management"
         ]
@@ -409,7 +2448,7 @@ async def health_check():
 
 @router.post("/extract-geojson")
 async def extract_geojson_from_boundary_data(request: ExtractGeojsonRequest):
-    """Extract GeoJSON from boundary data response"""
+    """Extract GeoJSON from boundary data response (rows with GeoJSON geometry)"""
     try:
         boundary_data = request.boundary_data
         
@@ -421,41 +2460,16 @@ async def extract_geojson_from_boundary_data(request: ExtractGeojsonRequest):
             geometry = None
             properties = {}
             
-            # Look for geometry field
+            # Boundary endpoints render geometry as GeoJSON in PostGIS (geometry_format="geojson")
             for key, value in row.items():
                 if key.lower() in ['geom', 'geometry', 'the_geom']:
-                    try:
-                        if isinstance(value, str):
-                            # Try to parse as different formats
-                            if value.startswith(('0', '1')) and len(value) > 20:
-                                # WKB format
-                                try:
-                                    from shapely.wkb import loads as wkb_loads
-                                    from shapely.geometry import mapping
-                                    import binascii
-                                    binary_data = binascii.unhexlify(value)
-                                    geom = wkb_loads(binary_data)
-                                    geometry = mapping(geom)
-                                except:
-                                    pass
-                            
-                            if geometry is None:
-                                try:
-                                    # Try JSON format
-                                    geometry = json.loads(value)
-                                except:
-                                    # Try WKT format
-                                    try:
-                                        from shapely.wkt import loads as wkt_loads
-                                        from shapely.geometry import mapping
-                                        geom = wkt_loads(value)
-                                        geometry = mapping(geom)
-                                    except:
-                                        pass
-                        elif isinstance(value, dict):
-                            geometry = value
-                    except:
-                        pass
+                    if isinstance(value, str):
+                        try:
+                            value = json.loads(value)
+                        except ValueError:
+                            value = None
+                    if isinstance(value, dict) and value.get("type"):
+                        geometry = value
                 else:
                     properties[key] = value
             
@@ -566,99 +2580,79 @@ async def convert_boundary_to_geohash(
 ):
     """Convert boundary area to geohash grid (eliminates duplicate geohashes)"""
     try:
-        # Import geohash library
-        import geohash2 as geohash
-        import geopandas as gpd
-        from shapely.geometry import box, shape
-        
-        # Convert boundary to shapely geometry
-        boundary_geom = shape(request.boundary_geojson["geometry"] if "geometry" in request.boundary_geojson else request.boundary_geojson)
+        from shapely.geometry import shape
         
-        # Get bounding box
-        minx, miny, maxx, maxy = boundary_geom.bounds
-        
-        # Generate geohash grid
-        # Use set to track unique geohashes and avoid duplicates
-        unique_geohashes = set()
-        geohash_features = []
-        
-        # Calculate step size based on precision (more conservative to ensure coverage)
         precision = request.precision
-        lat_step = 0.008 if precision == 5 else 0.003 if precision == 6 else 0.001
-        lon_step = 0.008 if precision == 5 else 0.003 if precision == 6 else 0.001
-        
-        # Generate grid points
-        current_lat = miny
-        while current_lat <= maxy:
-            current_lon = minx
-            while current_lon <= maxx:
-                # Create point and get geohash
-                point_geohash = geohash.encode(current_lat, current_lon, precision)
-                
-                # Skip if this geohash already processed
-                if point_geohash in unique_geohashes:
-                    current_lon += lon_step
-                    continue
-                
-                # Decode back to get the geohash polygon bounds
-                decoded_lat, decoded_lon, lat_err, lon_err = geohash.decode_exactly(point_geohash)
-                
-                # Create geohash bounding box
-                geohash_box = box(
-                    decoded_lon - lon_err, decoded_lat - lat_err,
-                    decoded_lon + lon_err, decoded_lat + lat_err
-                )
-                
-                # Check if geohash intersects with boundary
-                if boundary_geom.intersects(geohash_box):
-                    # Add to unique set
-                    unique_geohashes.add(point_geohash)
-                    
-                    # Calculate center point
-                    center_lat = decoded_lat
-                    center_lon = decoded_lon
-                    
-                    geohash_features.append({
-                        "type": "Feature",
-                        "properties": {
-                            "geoHash": point_geohash,
-                            "center_lat": center_lat,
-                            "center_lon": center_lon
-                        },
-                        "geometry": {
-                            "type": "Polygon",
-                            "coordinates": [[
-                                [decoded_lon - lon_err, decoded_lat - lat_err],
-                                [decoded_lon + lon_err, decoded_lat - lat_err],
-                                [decoded_lon + lon_err, decoded_lat + lat_err],
-                                [decoded_lon - lon_err, decoded_lat + lat_err],
-                                [decoded_lon - lon_err, decoded_lat - lat_err]
-                            ]]
-                        }
-                    })
-                
-                current_lon += lon_step
-            current_lat += lat_step
+        if request.country_id is not None and request.region_id is not None:
+            # Indexed lookup in the precomputed cover table
+            cover, source = region_geohash_cover(db, request.country_id, request.region_id, precision)
+            geohash_list = [gh for gh, _ in cover]
+            interior = {gh for gh, is_interior in cover if is_interior}
+            result = geohash_cells_to_geojson(geohash_list, interior=interior)
+            
+            logger.info(f"Geohash cover of region {request.region_id}: {len(geohash_list)} geohashes (precision {precision}, {source})")
+            
+            return {
+                "success": True,
+                "geohash_count": len(geohash_list),
+                "interior_count": len(interior),
+                "edge_count": len(geohash_list) - len(interior),
+                "precision": precision,
+                "source": source,
+                "geohashes_geojson": result
+            }
         
-        # Create GeoJSON FeatureCollection
-        result = {
-            "type": "FeatureCollection",
-            "features": geohash_features
-        }
+        if not request.boundary_geojson:
+            raise HTTPException(
+                status_code=400,
+                detail="Provide either boundary_geojson or both country_id and region_id"
+            )
+        
+        # Convert boundary to shapely geometry
+        boundary_geom = shape(request.boundary_geojson["geometry"] if "geometry" in request.boundary_geojson else request.boundary_geojson)
         
-        logger.info(f"Generated {len(unique_geohashes)} unique geohashes (precision {precision})")
+        geohash_list = generate_geohash_grid(boundary_geom, precision)
+        result = geohash_cells_to_geojson(geohash_list)
+        
+        logger.info(f"Generated {len(geohash_list)} unique geohashes (precision {precision})")
         
         return {
             "success": True,
-            "geohash_count": len(unique_geohashes),
+            "geohash_count": len(geohash_list),
             "precision": precision,
             "geohashes_geojson": result
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in boundary_to_geohash: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate geohash: {str(e)}")
 
+@router.post("/geohash-cover/build")
+async def build_geohash_cover_endpoint(request: BuildGeohashCoverRequest, db: Session = Depends(get_db)):
+    """Precompute the geohash cover of a country's boundary regions into boundary_geohash_cover"""
+    try:
+        start_time = time.time()
+        precisions = sorted(set(request.precisions))
+        if any(precision < 5 or precision > 7 for precision in precisions):
+            raise HTTPException(status_code=400, detail="Precisions must be between 5 and 7")
+        
+        loop = asyncio.get_event_loop()
+        result = await loop.run_in_executor(
+            None, build_geohash_cover, db, request.country_id, request.region_ids, precisions
+        )
+        result["processing_time_seconds"] = round(time.time() - start_time, 2)
+        
+        logger.info(f"🧩 Built geohash cover for {result['covered_regions']} regions of '{result['table']}'")
+        return {"success": True, **result}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error building geohash cover: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to build geohash cover: {str(e)}")
+
 @router.post("/select-dense-geohash")
 async def select_dense_geohash_from_boundary(
     request: SelectDenseGeohashRequest,
@@ -688,95 +2682,26 @@ async def select_dense_geohash_from_boundary(
         # Create union of all boundary polygons
         polygon = boundary_gdf.unary_union
 
-        # 2. Fetch POI and road data in parallel (optimized)
-        logger.info("📡 Fetching OSM data in parallel...")
-        tags_dict = {tag: True for tag in request.tag_filters}
-        road_tags = {'highway': ['motorway', 'trunk', 'primary', 'secondary']}
-        
-        # Use parallel fetching for better performance
-        poi_gdf, roads_gdf = await fetch_osm_data_parallel(polygon, tags_dict, road_tags)
-
-        # 4. Combine POI and roads data
-        logger.info(f"📊 Found {len(poi_gdf)} POI features and {len(roads_gdf)} road features")
-        all_gdf = pd.concat([poi_gdf, roads_gdf], ignore_index=True)
-        if all_gdf.empty:
-            logger.error("❌ No POI or road data found.")
-            raise HTTPException(status_code=400, detail="No POI or road data found")
-        
-        logger.info(f"🔄 Processing {len(all_gdf)} total features...")
-
-        # 5. Encode to geohash (optimized batch processing)
-        logger.info("🔢 Encoding geometries to geohash...")
-        all_gdf['geohash'] = encode_geohash_batch(all_gdf.geometry, request.precision)
-        all_gdf = all_gdf.dropna(subset=['geohash'])
-        all_gdf = all_gdf[all_gdf['geohash'].apply(lambda x: isinstance(x, str))]
-
-        # 6. Count objects per geohash
-        logger.info("📈 Calculating geohash density...")
-        count_df = all_gdf.groupby('geohash').size().reset_index(name='count')
-        threshold = count_df['count'].quantile(1 - request.top_percent)
-        dense_df = count_df[count_df['count'] >= threshold]
-        
-        logger.info(f"📍 Selected {len(dense_df)} dense geohash areas (threshold: {threshold:.1f})")
-        
-        # Early exit if no dense areas found
-        if dense_df.empty:
-            logger.warning("⚠️ No dense areas found with current threshold")
+        deadline = time.time() + request.deadline_seconds if request.deadline_seconds else None
+        try:
+            dense_gdf = await select_dense_geohashes(
+                polygon, request.tag_filters, request.top_percent, request.precision, deadline
+            )
+        except RequestDeadlineExceeded as e:
+            # Density needs the complete POI set, so there is no partial answer; the
+            # fetches keep running and fill the cache for the retry
+            logger.info(f"⏳ Dense selection deadline reached: {e}")
             return {
                 "success": True,
+                "status": "pending",
+                "message": "OSM data is still being fetched; retry the same request to complete from cache",
                 "geohash_count": 0,
                 "precision": request.precision,
                 "top_percent": request.top_percent,
                 "dense_geohash_geojson": {"type": "FeatureCollection", "features": []}
             }
 
-        # 7. Add geohash that become "centers" of dense neighbors (optimized)
-        logger.info("📍 Finding missing center geohash areas...")
-        def add_missing_centers_optimized(df):
-            # Use set for faster lookups
-            existing_geohashes = set(df['geohash'].values)
-            all_neighbors = []
-            
-            # Batch process neighbors
-            for gh in df['geohash']:
-                try:
-                    nbs = geohash2.neighbors(gh)
-                    all_neighbors.extend(nbs)
-                except:
-                    continue
-            
-            # Use Counter for frequency count
-            freq = Counter(all_neighbors)
-            
-            # Find missing centers more efficiently
-            missing = [g for g, count in freq.items() 
-                      if g not in existing_geohashes and count >= 2]
-            
-            if missing:
-                df_extra = count_df[count_df['geohash'].isin(missing)]
-                return pd.concat([df, df_extra], ignore_index=True)
-            return df
-
-        dense_df = add_missing_centers_optimized(dense_df)
-
-        # 8. Convert geohash to polygon (using cached function)
-        logger.info("🔄 Converting geohash to polygons...")
-        dense_gdf = gpd.GeoDataFrame({
-            'geohash': dense_df['geohash'],
-            'count': dense_df['count'],
-            'geometry': dense_df['geohash'].apply(cached_geohash_to_polygon)
-        }, crs='EPSG:4326')
-
-        # 9. Remove spatial outliers
-        logger.info("🧹 Removing outlier geohash areas...")
-        dense_union = dense_gdf.unary_union
-        if dense_union.geom_type == 'MultiPolygon':
-            largest = max(dense_union.geoms, key=lambda g: g.area)
-        else:
-            largest = dense_union
-        dense_gdf = dense_gdf[dense_gdf.geometry.intersects(largest)]
-
-        # 10. Convert to GeoJSON format (optimized)
+        # Convert to GeoJSON format (optimized)
         logger.info("📋 Converting to GeoJSON format...")
         features = []
         for _, row in dense_gdf.iterrows():
@@ -802,12 +2727,15 @@ async def select_dense_geohash_from_boundary(
 
         return {
             "success": True,
+            "status": "completed",
             "geohash_count": len(features),
             "precision": request.precision,
             "top_percent": request.top_percent,
             "dense_geohash_geojson": result_geojson
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in select_dense_geohash: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to select dense geohash: {str(e)}")
@@ -832,33 +2760,26 @@ async def calculate_target_ukm(request: CalculateTargetUkmRequest):
         
         # Fetch roads in parallel with optimized worker count
         max_workers = min(8, len(valid_geohashes))  # Limit workers to avoid overwhelming OSM API
-        road_results, failed_count, _, _ = await fetch_roads_parallel_advanced(valid_geohashes, max_workers)
+        ukm = await calculate_ukm_for_geohashes(valid_geohashes, max_workers=max_workers)
+        combined_roads = ukm["roads"]
         
         # Combine all road segments
-        if road_results:
-            logger.info(f"✅ Successfully processed {len(road_results)} geohashes")
-            combined_roads = pd.concat(road_results, ignore_index=True)
-            
-            # Calculate total length in kilometers (using metric projection)
-            roads_metric = combined_roads.to_crs(epsg=3857)
-            total_length_km = roads_metric.length.sum() / 1000
-            
-            # Convert back to WGS84 for response
-            combined_roads = combined_roads.to_crs(epsg=4326)
-            
-            # Convert to GeoJSON for response
-            roads_geojson = json.loads(combined_roads.to_json())
+        if combined_roads is not None:
+            # Convert to GeoJSON for response if requested
+            roads_geojson = None
+            if request.return_geojson:
+                roads_geojson = json.loads(combined_roads.to_json())
             
             processing_time = time.time() - start_time
             logger.info(f"🎯 UKM calculation completed in {processing_time:.2f}s")
-            logger.info(f"📊 Total road length: {total_length_km:.2f} km from {len(combined_roads)} segments")
             
             return CalculateTargetUkmResponse(
                 success=True,
-                total_road_segments=len(combined_roads),
-                total_road_length_km=round(total_length_km, 2),
-                processed_geohashes=len(valid_geohashes) - failed_count,
-                failed_geohashes=failed_count,
+                total_road_segments=ukm["total_road_segments"],
+                total_road_length_km=ukm["total_road_length_km"],
+                processed_geohashes=len(valid_geohashes) - ukm["failed_geohashes"],
+                failed_geohashes=ukm["failed_geohashes"],
+                breakdown=ukm["breakdown"],
                 roads_geojson=roads_geojson
             )
         else:
@@ -869,7 +2790,7 @@ async def calculate_target_ukm(request: CalculateTargetUkmRequest):
                 total_road_length_km=0.0,
                 processed_geohashes=0,
                 failed_geohashes=len(valid_geohashes),
-                roads_geojson={"type": "FeatureCollection", "features": []}
+                roads_geojson={"type": "FeatureCollection", "features": []} if request.return_geojson else None
             )
             
     except HTTPException:
@@ -878,9 +2799,148 @@ async def calculate_target_ukm(request: CalculateTargetUkmRequest):
         logger.error(f"❌ Error in calculate_target_ukm: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to calculate target UKM: {str(e)}")
 
+async def compute_advanced_ukm(request, valid_geohashes, db, start_time):
+    """Exact UKM for valid geohashes, mixing road-km index results with fetched ones"""
+    # Indexed geohashes are answered from the road-km index; only the rest are fetched
+    # Database and clipping work runs in the executor so the event loop stays free
+    loop = asyncio.get_event_loop()
+    indexed = None
+    if request.use_index and not request.return_geojson:
+        indexed = await loop.run_in_executor(None, lookup_road_km, db, valid_geohashes, request.index_snapshot)
+        logger.info(f"🗂️ Road-km index: {len(indexed['indexed_geohashes'])} indexed, {len(indexed['missing_geohashes'])} missing")
+        if not indexed["missing_geohashes"]:
+            return CalculateTargetUkmAdvancedResponse(
+                success=True,
+                total_road_segments=indexed["total_road_segments"],
+                total_road_length_km=indexed["total_road_length_km"],
+                processed_geohashes=len(indexed["indexed_geohashes"]),
+                failed_geohashes=0,
+                processing_time_seconds=round(time.time() - start_time, 2),
+                cache_hits=len(indexed["indexed_geohashes"]),
+                cache_misses=0,
+                breakdown=indexed["breakdown"],
+                roads_geojson=None
+            )
+        valid_geohashes = indexed["missing_geohashes"]
+    
+    # Use advanced parallel processing with all optimizations
+    deadline = start_time + request.deadline_seconds if request.deadline_seconds else None
+    ukm = await calculate_ukm_for_geohashes(
+        valid_geohashes, 
+        max_workers=request.max_workers,
+        chunk_size=request.chunk_size,
+        use_cache=request.use_cache,
+        deadline=deadline
+    )
+    pending_count = len(ukm["pending_geohashes"])
+    if indexed is not None:
+        ukm["total_road_length_km"] = round(ukm["total_road_length_km"] + indexed["total_road_length_km"], 2)
+        ukm["total_road_segments"] += indexed["total_road_segments"]
+        ukm["cache_hits"] += len(indexed["indexed_geohashes"])
+        ukm["breakdown"] = sorted(
+            ukm["breakdown"] + indexed["breakdown"],
+            key=lambda row: (row["geohash"], row["highway"])
+        )
+        valid_geohashes = valid_geohashes + indexed["indexed_geohashes"]
+    combined_roads = ukm["roads"]
+    cache_hits = ukm["cache_hits"]
+    cache_misses = ukm["cache_misses"]
+    
+    processing_time = time.time() - start_time
+    
+    # Combine all road segments
+    if combined_roads is not None or indexed is not None:
+        # Convert to GeoJSON for response if requested
+        roads_geojson = None
+        if request.return_geojson:
+            roads_geojson = json.loads(await loop.run_in_executor(None, combined_roads.to_json))
+        
+        logger.info(f"🎯 Advanced UKM calculation completed in {processing_time:.2f}s")
+        logger.info(f"🚀 Performance: {cache_hits} cache hits, {cache_misses} cache misses")
+        
+        return CalculateTargetUkmAdvancedResponse(
+            success=True,
+            status="partial" if pending_count else "completed",
+            total_road_segments=ukm["total_road_segments"],
+            total_road_length_km=ukm["total_road_length_km"],
+            processed_geohashes=len(valid_geohashes) - ukm["failed_geohashes"] - pending_count,
+            failed_geohashes=ukm["failed_geohashes"],
+            pending_geohashes=pending_count,
+            processing_time_seconds=round(processing_time, 2),
+            cache_hits=cache_hits,
+            cache_misses=cache_misses,
+            breakdown=ukm["breakdown"],
+            roads_geojson=roads_geojson
+        )
+    else:
+        logger.warning("⚠️ No roads found in any geohash areas")
+        return CalculateTargetUkmAdvancedResponse(
+            success=True,
+            status="partial" if pending_count else "completed",
+            total_road_segments=0,
+            total_road_length_km=0.0,
+            processed_geohashes=0,
+            failed_geohashes=len(valid_geohashes) - pending_count,
+            pending_geohashes=pending_count,
+            processing_time_seconds=round(processing_time, 2),
+            cache_hits=cache_hits,
+            cache_misses=cache_misses,
+            roads_geojson={"type": "FeatureCollection", "features": []} if request.return_geojson else None
+        )
+
+def expire_ukm_tasks():
+    """Drop finished UKM tasks older than UKM_TASK_TTL_SECONDS"""
+    cutoff = time.time() - settings.UKM_TASK_TTL_SECONDS
+    for task_id in [task_id for task_id, task in ukm_task_storage.items()
+                    if task.get("finished_at") is not None and task["finished_at"] < cutoff]:
+        del ukm_task_storage[task_id]
+
+def start_ukm_task(request, valid_geohashes, start_time, estimate=None):
+    """Register a background UKM calculation and return its task_id"""
+    expire_ukm_tasks()
+    task_id = str(uuid.uuid4())
+    ukm_task_storage[task_id] = {
+        "status": "running",
+        "created_at": datetime.now().isoformat(),
+        "completed_at": None,
+        "finished_at": None,
+        "estimate": estimate,
+        "result": None,
+        "error_message": None
+    }
+    # Background work runs without a deadline
+    request = request.copy(update={"deadline_seconds": None})
+    ukm_task_storage[task_id]["future"] = asyncio.create_task(
+        run_ukm_task(task_id, request, valid_geohashes, start_time)
+    )
+    return task_id
+
+async def run_ukm_task(task_id, request, valid_geohashes, start_time):
+    """Compute the exact UKM for a background task and store the result"""
+    task = ukm_task_storage[task_id]
+    db = SessionLocal()
+    try:
+        result = await compute_advanced_ukm(request, valid_geohashes, db, start_time)
+        task["result"] = result.dict()
+        task["status"] = "completed"
+        logger.info(f"✅ UKM task {task_id} completed: {result.total_road_length_km} km")
+    except Exception as e:
+        task["status"] = "failed"
+        task["error_message"] = str(e)
+        logger.error(f"❌ UKM task {task_id} failed: {str(e)}")
+    finally:
+        task["completed_at"] = datetime.now().isoformat()
+        task["finished_at"] = time.time()
+        task.pop("future", None)
+        await asyncio.get_event_loop().run_in_executor(None, db.close)
+
 @router.post("/calculate-target-ukm-advanced", response_model=CalculateTargetUkmAdvancedResponse)
-async def calculate_target_ukm_advanced(request: CalculateTargetUkmAdvancedRequest):
-    """Advanced UKM calculation with caching, chunking, and performance optimizations"""
+async def calculate_target_ukm_advanced(request: CalculateTargetUkmAdvancedRequest, db: Session = Depends(get_db)):
+    """Advanced UKM calculation with caching, chunking, and performance optimizations.
+
+    With background_task, an immediate estimate is returned and the exact value
+    is computed in the background and served by the task endpoint.
+    """
     try:
         start_time = time.time()
         geohash_list = request.geohashes
@@ -896,92 +2956,537 @@ async def calculate_target_ukm_advanced(request: CalculateTargetUkmAdvancedReque
         
         logger.info(f"🚀 Advanced UKM processing: {len(valid_geohashes)} geohashes, chunk_size={request.chunk_size}, workers={request.max_workers}, cache={request.use_cache}")
         
-        # Use advanced parallel processing with all optimizations
-        road_results, failed_count, cache_hits, cache_misses = await fetch_roads_parallel_advanced(
-            valid_geohashes, 
-            max_workers=request.max_workers,
-            chunk_size=request.chunk_size,
-            use_cache=request.use_cache
-        )
+        if not request.background_task:
+            result = await compute_advanced_ukm(request, valid_geohashes, db, start_time)
+            if result.pending_geohashes:
+                # Resume from the way store: finished tiles are cached, pending ones are awaited
+                result.task_id = start_ukm_task(
+                    request.copy(update={"use_cache": True}), valid_geohashes, start_time
+                )
+                logger.info(f"⏳ Returning partial UKM, continuing as task {result.task_id}")
+            return result
         
-        processing_time = time.time() - start_time
+        loop = asyncio.get_event_loop()
+        estimate = await loop.run_in_executor(None, estimate_ukm, db, valid_geohashes, request.index_snapshot)
+        logger.info(f"📐 UKM estimate: {estimate['total_road_length_km']} km [{estimate['low_km']}, {estimate['high_km']}] ({estimate['basis']})")
         
-        # Combine all road segments
-        if road_results:
-            logger.info(f"✅ Successfully processed {len(road_results)} geohashes")
-            combined_roads = pd.concat(road_results, ignore_index=True)
-            
-            # Calculate total length in kilometers (using metric projection)
-            roads_metric = combined_roads.to_crs(epsg=3857)
-            total_length_km = roads_metric.length.sum() / 1000
-            
-            # Convert back to WGS84 for response
-            combined_roads = combined_roads.to_crs(epsg=4326)
-            
-            # Convert to GeoJSON for response if requested
-            roads_geojson = None
-            if request.return_geojson:
-                roads_geojson = json.loads(combined_roads.to_json())
-            
-            logger.info(f"🎯 Advanced UKM calculation completed in {processing_time:.2f}s")
-            logger.info(f"📊 Total road length: {total_length_km:.2f} km from {len(combined_roads)} segments")
-            logger.info(f"🚀 Performance: {cache_hits} cache hits, {cache_misses} cache misses")
+        task_id = start_ukm_task(request, valid_geohashes, start_time, estimate)
+        
+        return CalculateTargetUkmAdvancedResponse(
+            success=True,
+            status="estimated",
+            total_road_segments=0,
+            total_road_length_km=estimate["total_road_length_km"] or 0.0,
+            processed_geohashes=0,
+            failed_geohashes=0,
+            processing_time_seconds=round(time.time() - start_time, 2),
+            cache_hits=estimate["exact_geohashes"],
+            cache_misses=len(valid_geohashes) - estimate["exact_geohashes"],
+            task_id=task_id,
+            estimate=estimate
+        )
             
-            return CalculateTargetUkmAdvancedResponse(
-                success=True,
-                total_road_segments=len(combined_roads),
-                total_road_length_km=round(total_length_km, 2),
-                processed_geohashes=len(valid_geohashes) - failed_count,
-                failed_geohashes=failed_count,
-                processing_time_seconds=round(processing_time, 2),
-                cache_hits=cache_hits,
-                cache_misses=cache_misses,
-                roads_geojson=roads_geojson
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error in calculate_target_ukm_advanced: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to calculate advanced target UKM: {str(e)}")
+
+@router.get("/calculate-target-ukm-advanced/{task_id}")
+async def get_ukm_task(task_id: str):
+    """Poll a background UKM calculation: the estimate until the exact result is ready"""
+    expire_ukm_tasks()
+    task = ukm_task_storage.get(task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="UKM task not found")
+    
+    return {
+        "task_id": task_id,
+        "status": task["status"],
+        "created_at": task["created_at"],
+        "completed_at": task["completed_at"],
+        "estimate": task["estimate"],
+        "result": task["result"],
+        "error_message": task["error_message"]
+    }
+
+@router.post("/road-km-index/build")
+async def build_road_km_index_endpoint(request: BuildRoadKmIndexRequest, db: Session = Depends(get_db)):
+    """Precompute road km per geohash and highway class (precision 7, 6 and 5) for a snapshot"""
+    try:
+        start_time = time.time()
+        geohash_list = [str(gh).strip() for gh in request.geohashes if len(str(gh).strip()) == 6]
+        if not geohash_list:
+            raise HTTPException(status_code=400, detail="No valid 6-character geohashes found")
+        
+        snapshot = request.snapshot or current_osm_snapshot()
+        loop = asyncio.get_event_loop()
+        result = await loop.run_in_executor(
+            None, build_road_km_index, db, geohash_list, snapshot, request.chunk_size, request.max_workers
+        )
+        result["processing_time_seconds"] = round(time.time() - start_time, 2)
+        
+        logger.info(f"🗂️ Indexed {result['indexed_geohashes']} geohashes for snapshot {snapshot}")
+        return {"success": True, **result}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error building road-km index: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to build road-km index: {str(e)}")
+
+@router.post("/road-km-index/lookup")
+async def lookup_road_km_index_endpoint(request: LookupRoadKmIndexRequest, db: Session = Depends(get_db)):
+    """Sum indexed road km for a list of geohashes without fetching any geometry"""
+    try:
+        start_time = time.time()
+        geohash_list = [str(gh).strip() for gh in request.geohashes]
+        if not geohash_list:
+            raise HTTPException(status_code=400, detail="No geohashes provided")
+        
+        result = lookup_road_km(db, geohash_list, request.snapshot)
+        result["processing_time_seconds"] = round(time.time() - start_time, 4)
+        return {"success": True, **result}
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error looking up road-km index: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to look up road-km index: {str(e)}")
+
+@router.post("/plan", response_model=PlanResponse)
+async def run_plan(request: PlanRequest, db: Session = Depends(get_db)):
+    """Run grid, density selection and UKM for a boundary entirely server-side"""
+    try:
+        start_time = time.time()
+        timings = {}
+        
+        # 1. Resolve the boundary reference
+        stage_start = time.time()
+        cover = None
+        if request.boundary_geojson:
+            boundary_geom = geometry_from_geojson(request.boundary_geojson)
+        elif request.country_id is not None and request.region_id is not None:
+            # Regions are gridded from the precomputed cover, so repeated plans share one grid
+            cover, _ = region_geohash_cover(db, request.country_id, request.region_id, request.precision)
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail="Provide either boundary_geojson or both country_id and region_id"
             )
+        timings["boundary"] = round(time.time() - stage_start, 3)
+        
+        # 2. Grid
+        stage_start = time.time()
+        if cover is not None:
+            grid_geohashes = [gh for gh, _ in cover]
         else:
-            logger.warning("⚠️ No roads found in any geohash areas")
-            return CalculateTargetUkmAdvancedResponse(
-                success=True,
-                total_road_segments=0,
-                total_road_length_km=0.0,
-                processed_geohashes=0,
-                failed_geohashes=len(valid_geohashes),
-                processing_time_seconds=round(processing_time, 2),
-                cache_hits=cache_hits,
-                cache_misses=cache_misses,
-                roads_geojson={"type": "FeatureCollection", "features": []} if request.return_geojson else None
+            grid_geohashes = generate_geohash_grid(boundary_geom, request.precision)
+        if not grid_geohashes:
+            raise HTTPException(status_code=400, detail="Boundary does not cover any geohash cell")
+        grid_polygon = gpd.GeoSeries(
+            [cached_geohash_to_polygon(gh) for gh in grid_geohashes], crs="EPSG:4326"
+        ).unary_union
+        timings["grid"] = round(time.time() - stage_start, 3)
+        logger.info(f"🧭 Plan grid: {len(grid_geohashes)} geohashes (precision {request.precision})")
+        
+        # 3. Density
+        stage_start = time.time()
+        dense_gdf = await select_dense_geohashes(
+            grid_polygon, request.tag_filters, request.top_percent, request.precision
+        )
+        dense_geohashes = dense_gdf['geohash'].astype(str).tolist()
+        timings["density"] = round(time.time() - stage_start, 3)
+        
+        # 4. UKM (only 6-character geohashes are supported by the road pipeline)
+        stage_start = time.time()
+        ukm_geohashes = [gh for gh in dense_geohashes if len(gh) == 6]
+        ukm = {
+            "roads": None, "breakdown": [], "total_road_segments": 0, "total_road_length_km": 0.0,
+            "failed_geohashes": 0, "failed_geohash_ids": [], "cache_hits": 0, "cache_misses": 0
+        }
+        if ukm_geohashes:
+            ukm = await calculate_ukm_for_geohashes(
+                ukm_geohashes,
+                max_workers=request.max_workers,
+                chunk_size=request.chunk_size,
+                use_cache=request.use_cache
             )
-            
+        timings["ukm"] = round(time.time() - stage_start, 3)
+        timings["total"] = round(time.time() - start_time, 3)
+        
+        plan_id = str(uuid.uuid4())
+        plan = {
+            "created_at": datetime.now().isoformat(),
+            "campaign_id": request.campaign_id,
+            "snapshot": current_osm_snapshot(),
+            "country_id": request.country_id,
+            "region_id": request.region_id,
+            "precision": request.precision,
+            "top_percent": request.top_percent,
+            "grid_geohashes": grid_geohashes,
+            "dense_geohashes": dense_geohashes,
+            "dense_counts": dict(zip(dense_geohashes, dense_gdf['count'].astype(int).tolist())),
+            "roads": ukm["roads"],
+            "road_km_by_geohash": road_km_by_geohash(ukm["roads"]),
+            "breakdown": ukm["breakdown"],
+            "total_road_segments": ukm["total_road_segments"],
+            "total_road_length_km": ukm["total_road_length_km"],
+            "failed_geohashes": ukm["failed_geohashes"],
+            "failed_geohash_ids": ukm["failed_geohash_ids"],
+            "timings": timings
+        }
+        loop = asyncio.get_event_loop()
+        version, persisted = await loop.run_in_executor(None, store_plan, db, plan_id, plan)
+        
+        logger.info(f"✅ Plan {plan_id} completed in {timings['total']:.2f}s")
+        
+        return PlanResponse(
+            success=True,
+            plan_id=plan_id,
+            campaign_id=request.campaign_id,
+            version=version,
+            persisted=persisted,
+            grid_geohash_count=len(grid_geohashes),
+            dense_geohash_count=len(dense_geohashes),
+            dense_geohashes=dense_geohashes,
+            total_road_segments=ukm["total_road_segments"],
+            total_road_length_km=ukm["total_road_length_km"],
+            failed_geohashes=ukm["failed_geohashes"],
+            cache_hits=ukm["cache_hits"],
+            cache_misses=ukm["cache_misses"],
+            timings=timings
+        )
+        
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Error in calculate_target_ukm_advanced: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to calculate advanced target UKM: {str(e)}")
+        logger.error(f"❌ Error in plan: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to run plan: {str(e)}")
+
+@router.get("/plan/{plan_id}")
+async def get_plan(plan_id: str, include_grid: bool = False, include_roads: bool = False, db: Session = Depends(get_db)):
+    """Fetch a stored plan result by its handle"""
+    plan = stored_plan(db, plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    
+    result = {
+        "plan_id": plan_id,
+        "created_at": plan["created_at"],
+        "campaign_id": plan.get("campaign_id"),
+        "version": plan.get("version"),
+        "parent_plan_id": plan.get("parent_plan_id"),
+        "precision": plan["precision"],
+        "top_percent": plan["top_percent"],
+        "dense_geohashes": plan["dense_geohashes"],
+        "dense_geohash_geojson": geohash_cells_to_geojson(plan["dense_geohashes"], plan["dense_counts"]),
+        "road_km_by_geohash": plan["road_km_by_geohash"],
+        "breakdown": plan["breakdown"],
+        "total_road_segments": plan["total_road_segments"],
+        "total_road_length_km": plan["total_road_length_km"],
+        "failed_geohashes": plan["failed_geohashes"],
+        "failed_geohash_ids": plan.get("failed_geohash_ids", []),
+        "timings": plan["timings"]
+    }
+    if include_grid:
+        result["grid_geohashes"] = plan["grid_geohashes"]
+    if include_roads:
+        roads = plan["roads"]
+        result["roads_geojson"] = (
+            json.loads(roads.to_json()) if roads is not None
+            else {"type": "FeatureCollection", "features": []}
+        )
+    return result
+
+@router.post("/plan/{plan_id}/diff", response_model=PlanDiffResponse)
+async def diff_plan(plan_id: str, request: PlanDiffRequest, db: Session = Depends(get_db)):
+    """Apply added/removed geohashes to a stored plan, computing UKM only for the delta"""
+    try:
+        start_time = time.time()
+        plan = stored_plan(db, plan_id)
+        if plan is None:
+            raise HTTPException(status_code=404, detail="Plan not found")
+        
+        current = set(plan["dense_geohashes"])
+        removed = set(str(gh).strip() for gh in request.removed_geohashes) & current
+        added = [gh for gh in dict.fromkeys(str(gh).strip() for gh in request.added_geohashes)
+                 if gh and gh not in current and gh not in removed]
+        
+        # Drop the road segments of removed cells
+        roads = plan["roads"]
+        if roads is not None and removed:
+            roads = roads[~roads['geohash'].astype(str).isin(removed)]
+        
+        # Fetch and clip only the added cells (only 6-character geohashes are supported by the road pipeline)
+        ukm = {"roads": None, "failed_geohashes": 0, "failed_geohash_ids": [], "cache_hits": 0, "cache_misses": 0}
+        ukm_geohashes = [gh for gh in added if len(gh) == 6]
+        if ukm_geohashes:
+            ukm = await calculate_ukm_for_geohashes(
+                ukm_geohashes,
+                max_workers=request.max_workers,
+                chunk_size=request.chunk_size,
+                use_cache=request.use_cache
+            )
+        
+        frames = [frame for frame in (roads, ukm["roads"]) if frame is not None and not frame.empty]
+        if frames:
+            roads = gpd.GeoDataFrame(pd.concat(frames, ignore_index=True), geometry='geometry', crs="EPSG:4326")
+            roads['geohash'] = roads['geohash'].astype(str).astype('category')
+        else:
+            roads = None
+        
+        dense_geohashes = [gh for gh in plan["dense_geohashes"] if gh not in removed] + added
+        total_road_segments = 0 if roads is None else len(roads)
+        total_road_length_km = 0.0 if roads is None else round(float(roads['length_km'].sum()), 2)
+        breakdown = road_km_breakdown(roads)
+        # Failures are tracked per cell, so removed cells take theirs with them
+        failed = set(plan.get("failed_geohash_ids", [])) - removed | set(ukm["failed_geohash_ids"])
+        failed_geohash_ids = [gh for gh in dense_geohashes if gh in failed]
+        failed_geohashes = len(failed_geohash_ids)
+        
+        timings = dict(plan["timings"])
+        timings["diff"] = round(time.time() - start_time, 3)
+        
+        new_plan_id = str(uuid.uuid4())
+        new_plan = {
+            **plan,
+            "created_at": datetime.now().isoformat(),
+            "snapshot": current_osm_snapshot(),
+            "parent_plan_id": plan_id,
+            "dense_geohashes": dense_geohashes,
+            "dense_counts": {gh: c for gh, c in plan["dense_counts"].items() if gh not in removed},
+            "roads": roads,
+            "road_km_by_geohash": road_km_by_geohash(roads),
+            "breakdown": breakdown,
+            "total_road_segments": total_road_segments,
+            "total_road_length_km": total_road_length_km,
+            "failed_geohashes": failed_geohashes,
+            "failed_geohash_ids": failed_geohash_ids,
+            "timings": timings
+        }
+        loop = asyncio.get_event_loop()
+        version, persisted = await loop.run_in_executor(None, store_plan, db, new_plan_id, new_plan)
+        
+        logger.info(f"✏️ Plan {plan_id} -> {new_plan_id}: +{len(added)} / -{len(removed)} geohashes in {timings['diff']:.2f}s")
+        
+        return PlanDiffResponse(
+            success=True,
+            plan_id=new_plan_id,
+            parent_plan_id=plan_id,
+            campaign_id=plan.get("campaign_id"),
+            version=version,
+            persisted=persisted,
+            added_geohash_count=len(added),
+            removed_geohash_count=len(removed),
+            dense_geohash_count=len(dense_geohashes),
+            total_road_segments=total_road_segments,
+            total_road_length_km=total_road_length_km,
+            failed_geohashes=failed_geohashes,
+            cache_hits=ukm["cache_hits"],
+            cache_misses=ukm["cache_misses"],
+            breakdown=breakdown,
+            processing_time_seconds=round(time.time() - start_time, 2)
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error in plan diff: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to apply plan diff: {str(e)}")
+
+@router.delete("/plan/{plan_id}")
+async def delete_plan(plan_id: str, db: Session = Depends(get_db)):
+    """Delete a plan from memory and from the plan store"""
+    in_memory = plan_storage.pop(plan_id, None) is not None
+    try:
+        deleted = db.query(CampaignPlan).filter(CampaignPlan.id == plan_id).delete(synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Error deleting plan {plan_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to delete plan: {str(e)}")
+    
+    if not in_memory and not deleted:
+        raise HTTPException(status_code=404, detail="Plan not found")
+    return {"success": True, "message": f"Plan {plan_id} deleted"}
+
+@router.post("/plan/import", response_model=PlanResponse)
+async def import_plan(request: ImportPlanRequest, db: Session = Depends(get_db)):
+    """Store a plan computed outside the API, e.g. by the Campaigns Preparation page"""
+    try:
+        start_time = time.time()
+        dense_geohashes = list(dict.fromkeys(str(gh).strip() for gh in request.dense_geohashes if str(gh).strip()))
+        if not dense_geohashes:
+            raise HTTPException(status_code=400, detail="No dense geohashes provided")
+        grid_geohashes = list(dict.fromkeys(str(gh).strip() for gh in request.grid_geohashes if str(gh).strip()))
+        dense_set = set(dense_geohashes)
+        
+        roads = roads_from_geojson(request.roads_geojson, request.precision)
+        total_road_segments = 0 if roads is None else len(roads)
+        total_road_length_km = 0.0 if roads is None else round(float(roads['length_km'].sum()), 2)
+        
+        plan_id = str(uuid.uuid4())
+        plan = {
+            "created_at": datetime.now().isoformat(),
+            "campaign_id": request.campaign_id,
+            "snapshot": current_osm_snapshot(),
+            "country_id": request.country_id,
+            "region_id": request.region_id,
+            "precision": request.precision,
+            "top_percent": request.top_percent,
+            "grid_geohashes": grid_geohashes,
+            "dense_geohashes": dense_geohashes,
+            "dense_counts": {gh: int(c) for gh, c in request.dense_counts.items() if gh in dense_set},
+            "roads": roads,
+            "road_km_by_geohash": road_km_by_geohash(roads),
+            "breakdown": road_km_breakdown(roads),
+            "total_road_segments": total_road_segments,
+            "total_road_length_km": total_road_length_km,
+            "failed_geohashes": 0,
+            "failed_geohash_ids": [],
+            "timings": {}
+        }
+        
+        loop = asyncio.get_event_loop()
+        version = await loop.run_in_executor(None, save_plan, db, plan_id, plan)
+        plan_storage[plan_id] = plan
+        
+        logger.info(f"📥 Imported plan {plan_id} (campaign {request.campaign_id}, version {version}) with {total_road_segments} road segments")
+        
+        return PlanResponse(
+            success=True,
+            plan_id=plan_id,
+            campaign_id=request.campaign_id,
+            version=version,
+            grid_geohash_count=len(grid_geohashes),
+            dense_geohash_count=len(dense_geohashes),
+            dense_geohashes=dense_geohashes,
+            total_road_segments=total_road_segments,
+            total_road_length_km=total_road_length_km,
+            failed_geohashes=0,
+            cache_hits=0,
+            cache_misses=0,
+            timings={"import": round(time.time() - start_time, 3)}
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error importing plan: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to import plan: {str(e)}")
+
+@router.get("/plan/campaign/{campaign_id}")
+async def list_campaign_plans(campaign_id: int, db: Session = Depends(get_db)):
+    """List the stored plan versions of a campaign, newest first"""
+    try:
+        plans = db.query(CampaignPlan).filter(
+            CampaignPlan.campaign_id == campaign_id
+        ).order_by(CampaignPlan.version.desc()).all()
+        return {
+            "campaign_id": campaign_id,
+            "plans": [
+                {
+                    "plan_id": plan.id,
+                    "version": plan.version,
+                    "parent_plan_id": plan.parent_plan_id,
+                    "snapshot": plan.snapshot,
+                    "precision": plan.precision,
+                    "total_road_segments": plan.total_road_segments,
+                    "total_road_length_km": plan.total_road_length_km,
+                    "created_at": plan.created_at.isoformat() if plan.created_at else None
+                }
+                for plan in plans
+            ]
+        }
+    except Exception as e:
+        logger.error(f"❌ Error listing campaign plans: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to list campaign plans: {str(e)}")
+
+@router.get("/plan/campaign/{campaign_id}/roads")
+async def get_campaign_plan_roads(
+    campaign_id: int,
+    bbox: Optional[str] = None,
+    version: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Planned road segments of a campaign's latest (or given) plan version as GeoJSON.
+
+    With a lon/lat bbox ('minx,miny,maxx,maxy') only segments intersecting it
+    are returned, read through the road table's GiST index.
+    """
+    from sqlalchemy import func as sql_func
+    from api.database.streaming import parse_bbox
+    
+    try:
+        plan_id = latest_campaign_plan_id(db, campaign_id, version)
+        if plan_id is None:
+            raise HTTPException(status_code=404, detail="No stored plan for this campaign")
+        
+        query = db.query(
+            CampaignPlanRoad.geohash, CampaignPlanRoad.osmid, CampaignPlanRoad.highway,
+            CampaignPlanRoad.name, CampaignPlanRoad.length_km,
+            sql_func.ST_AsGeoJSON(CampaignPlanRoad.geom, 6).label("geometry")
+        ).filter(CampaignPlanRoad.plan_id == plan_id)
+        if bbox:
+            try:
+                minx, miny, maxx, maxy = parse_bbox(bbox)
+            except ValueError as bbox_error:
+                raise HTTPException(status_code=400, detail=str(bbox_error))
+            query = query.filter(sql_func.ST_Intersects(
+                CampaignPlanRoad.geom, sql_func.ST_MakeEnvelope(minx, miny, maxx, maxy, 4326)
+            ))
+        
+        features = [
+            {
+                "type": "Feature",
+                "properties": {
+                    "geohash": row.geohash,
+                    "osmid": row.osmid,
+                    "highway": row.highway,
+                    "name": row.name,
+                    "length_km": row.length_km
+                },
+                "geometry": json.loads(row.geometry)
+            }
+            for row in query.all()
+        ]
+        return {
+            "campaign_id": campaign_id,
+            "plan_id": plan_id,
+            "road_segment_count": len(features),
+            "roads_geojson": {"type": "FeatureCollection", "features": features}
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error getting campaign plan roads: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to get campaign plan roads: {str(e)}")
 
 @router.post("/clear-cache")
 async def clear_osm_cache():
     """Clear OSM data cache to free memory"""
-    global osm_cache, osm_cache_with_ttl
-    old_cache_size = len(osm_cache)
-    ttl_cache_size = len(osm_cache_with_ttl)
+    area_cache_size = len(osm_cache)
+    road_way_stats = road_way_store.stats()
     
-    # Clear both cache systems
+    # Clear the area cache and the road way store
     osm_cache.clear()
-    osm_cache_with_ttl.clear()
+    road_way_store.clear()
     
     # Clear LRU caches
     cached_geohash_encode.cache_clear()
     cached_geohash_to_polygon.cache_clear()
     
-    total_cleared = old_cache_size + ttl_cache_size
-    logger.info(f"🧹 Cleared cache with {total_cleared} total entries")
+    logger.info(f"🧹 Cleared {area_cache_size} area entries and {road_way_stats['tiles']} road tiles")
     
     return {
         "success": True,
-        "message": f"Cache cleared successfully. Removed {total_cleared} cached entries.",
+        "message": f"Cache cleared successfully. Removed {area_cache_size} area entries and {road_way_stats['tiles']} road tiles.",
         "cache_stats": {
-            "old_osm_cache_cleared": old_cache_size,
-            "ttl_cache_cleared": ttl_cache_size,
+            "osm_area_cache_cleared": area_cache_size,
+            "road_tiles_cleared": road_way_stats["tiles"],
+            "road_ways_cleared": road_way_stats["ways"],
             "geohash_encode_cache_cleared": True,
             "geohash_polygon_cache_cleared": True
         }
@@ -989,24 +3494,171 @@ async def clear_osm_cache():
 
 @router.get("/cache-stats")
 async def get_cache_stats():
-    """Get current cache statistics with TTL info"""
-    # Count valid TTL cache entries
-    current_time = time.time()
-    valid_ttl_entries = 0
-    expired_ttl_entries = 0
-    
-    for key, entry in osm_cache_with_ttl.items():
-        if is_cache_valid(entry):
-            valid_ttl_entries += 1
-        else:
-            expired_ttl_entries += 1
-    
+    """Get current cache statistics with snapshot info"""
     return {
-        "old_osm_cache_size": len(osm_cache),
-        "ttl_cache_total": len(osm_cache_with_ttl),
-        "ttl_cache_valid": valid_ttl_entries,
-        "ttl_cache_expired": expired_ttl_entries,
-        "cache_ttl_seconds": CACHE_TTL,
+        "osm_snapshot": current_osm_snapshot(),
+        "osm_area_cache_size": len(osm_cache),
+        "road_way_store": road_way_store.stats(),
         "geohash_encode_cache_info": cached_geohash_encode.cache_info()._asdict(),
         "geohash_polygon_cache_info": cached_geohash_to_polygon.cache_info()._asdict()
-    } 
\ No newline at end of file
+    } 
+
+def set_osm_snapshot(snapshot):
+    """Make a snapshot current, dropping cached data of earlier snapshots; returns the road tiles dropped"""
+    osm_snapshot.update({"id": snapshot, "advanced_at": datetime.now().isoformat()})
+    
+    # Entries of earlier snapshots can never be hit again
+    osm_cache.clear()
+    return road_way_store.drop_stale_tiles()
+
+def sync_osm_snapshot():
+    """Adopt the snapshot stored in the database, or store this worker's one when none is stored yet"""
+    db = SessionLocal()
+    try:
+        stored = load_osm_snapshot(db)
+        if stored is None:
+            save_osm_snapshot(db, current_osm_snapshot())
+        else:
+            adopt_osm_snapshot(stored)
+    finally:
+        db.close()
+
+def adopt_osm_snapshot(snapshot):
+    """Follow a snapshot advanced by another worker"""
+    if snapshot and snapshot != current_osm_snapshot():
+        previous = current_osm_snapshot()
+        stale_tiles = set_osm_snapshot(snapshot)
+        logger.info(f"🗓️ OSM snapshot {previous} -> {snapshot} adopted, {len(stale_tiles)} road tiles retired")
+
+def validate_osm_snapshot(snapshot):
+    """Check a snapshot id that is about to become current"""
+    if osm_snapshot["pinned"] and not OSM_SNAPSHOT_DATE_PATTERN.match(snapshot):
+        raise HTTPException(status_code=400, detail="Pinned snapshots must be dates (YYYY-MM-DD)")
+
+@router.get("/osm-snapshot")
+async def get_osm_snapshot():
+    """Current OSM data snapshot that cached data is tagged with"""
+    return {**osm_snapshot, "road_tiles": road_way_store.stats()["tiles"]}
+
+@router.post("/osm-snapshot")
+async def advance_osm_snapshot(request: AdvanceOsmSnapshotRequest, db: Session = Depends(get_db)):
+    """Advance the OSM data snapshot, retiring data cached for the previous one"""
+    try:
+        snapshot = request.snapshot.strip()
+        validate_osm_snapshot(snapshot)
+        
+        previous = current_osm_snapshot()
+        if snapshot == previous:
+            return {"success": True, "message": f"Snapshot {snapshot} is already current", **osm_snapshot}
+        
+        stale_tiles = set_osm_snapshot(snapshot)
+        await asyncio.get_event_loop().run_in_executor(None, save_osm_snapshot, db, snapshot)
+        
+        if request.refresh and stale_tiles:
+            refresh = asyncio.create_task(fetch_roads_parallel_advanced(stale_tiles))
+            snapshot_refreshes.add(refresh)
+            refresh.add_done_callback(snapshot_refreshes.discard)
+        
+        logger.info(f"🗓️ OSM snapshot advanced {previous} -> {snapshot}, {len(stale_tiles)} road tiles retired")
+        
+        return {
+            "success": True,
+            "previous_snapshot": previous,
+            **osm_snapshot,
+            "road_tiles_retired": len(stale_tiles),
+            "road_tiles_refreshing": len(stale_tiles) if request.refresh else 0
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error advancing OSM snapshot: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to advance OSM snapshot: {str(e)}")
+
+@router.post("/osm-snapshot/apply-changes")
+async def apply_osm_changes(request: ApplyOsmChangesRequest, db: Session = Depends(get_db)):
+    """Advance the OSM snapshot by applying change files to the cached road tiles and the road-km index"""
+    try:
+        start_time = time.time()
+        snapshot = request.snapshot.strip()
+        validate_osm_snapshot(snapshot)
+        previous = current_osm_snapshot()
+        if snapshot == previous:
+            raise HTTPException(status_code=400, detail=f"Snapshot {snapshot} is already current")
+        paths = osm_change_files(request.directory)
+        if not paths:
+            raise HTTPException(status_code=400, detail="No .osc files found in the change directory")
+        
+        loop = asyncio.get_event_loop()
+        index_has_ways = request.update_index and has_road_km_ways(db, previous)
+        
+        def keep_nodes(node_ids):
+            # Moved nodes of unchanged ways matter when a stored or indexed way holds them
+            kept = set(road_way_store.node_coordinates(node_ids))
+            if index_has_ways and node_ids - kept:
+                kept |= road_km_way_nodes(db, previous, node_ids - kept)
+            return kept
+        
+        changes = await loop.run_in_executor(
+            None, read_osm_change_files, paths, UKM_HIGHWAY_CLASSES, keep_nodes
+        )
+        logger.info(f"📥 Read {changes['files']} change files: {len(changes['nodes'])} nodes, {len(changes['ways'])} ways")
+        
+        changed_tiles, dirty_tiles = await loop.run_in_executor(
+            None, road_way_store.apply_changes, changes, UKM_HIGHWAY_CLASSES, snapshot
+        )
+        set_osm_snapshot(snapshot)
+        await loop.run_in_executor(None, save_osm_snapshot, db, snapshot)
+        logger.info(f"🩹 Patched {len(changed_tiles)} road tiles locally, {len(dirty_tiles)} left for refetching")
+        
+        index = None
+        if request.update_index and latest_road_km_snapshot(db) is not None:
+            # Cells are resolved from the index's own way rows, so ways the way store
+            # does not hold are still found; the index is only advanced when every
+            # changed road way could be placed
+            unplaced = None
+            if index_has_ways:
+                index_cells, unplaced = await loop.run_in_executor(
+                    None, road_km_index_changed_cells, db, previous, changes, UKM_HIGHWAY_CLASSES
+                )
+            if unplaced is None or unplaced:
+                reason = (
+                    f"road-km index of snapshot {previous} has no way rows" if unplaced is None
+                    else f"{len(unplaced)} changed road ways could not be placed"
+                )
+                logger.warning(f"⚠️ Road-km index left at snapshot {previous}: {reason}; rebuild it for {snapshot}")
+                index = {"skipped": True, "reason": reason, "unplaced_ways": sorted(unplaced or [])[:100]}
+            else:
+                rows_carried = carry_road_km_index(db, previous, snapshot)
+                touched = index_cells | set(changed_tiles) | set(dirty_tiles) | {
+                    cached_geohash_encode(lat, lon, 6) for lon, lat in changes["nodes"].values()
+                }
+                rebuild = indexed_geohashes(db, snapshot, touched)
+                index = {"rows_carried": rows_carried, "rebuilt_geohashes": len(rebuild)}
+                if rebuild:
+                    result = await loop.run_in_executor(
+                        None, build_road_km_index, db, rebuild, snapshot, request.chunk_size, request.max_workers
+                    )
+                    index.update({"rows_written": result["rows_written"], "failed_geohashes": result["failed_geohashes"]})
+        
+        processing_time = time.time() - start_time
+        logger.info(f"🗓️ OSM snapshot {previous} -> {snapshot} applied from change files in {processing_time:.2f}s")
+        
+        return {
+            "success": True,
+            "previous_snapshot": previous,
+            **osm_snapshot,
+            "change_files": changes["files"],
+            "changed_nodes": len(changes["nodes"]) + len(changes["deleted_nodes"]),
+            "changed_ways": len(changes["ways"]),
+            "road_tiles_patched": len(changed_tiles),
+            "road_tiles_refetch": len(dirty_tiles),
+            "road_km_index": index,
+            "processing_time_seconds": round(processing_time, 2)
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"❌ Error applying OSM changes: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to apply OSM changes: {str(e)}")
@@ -1,6 +1,6 @@
 # Example fix if some fields can be null
-from typing import Optional, Dict, Any
-from pydantic import BaseModel
+from typing import Optional, Dict, Any, List, Literal
+from pydantic import BaseModel, Field
 
 class BoundarySchemas(BaseModel):
     id: int
@@ -9,6 +9,11 @@ class BoundarySchemas(BaseModel):
 
 class BoundaryRequest(BaseModel):
     country_id: int
+    # Optional boundary query shaping, done in PostGIS
+    region_id: Optional[int] = None
+    columns: Optional[List[str]] = None  # Defaults to every column
+    geometry_format: Literal["geojson", "wkb", "ewkb"] = "geojson"
+    simplify_tolerance: Optional[float] = Field(default=None, gt=0)  # In the geometry's units (degrees for EPSG:4326)
 
 class BoundaryDataResponse(BaseModel):
     message: Optional[str] = None
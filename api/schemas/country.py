@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
 
 class RegionSchemas(BaseModel):
@@ -58,6 +58,11 @@ class RegionPricingResponse(BaseModel):
 
 class CountryRequest(BaseModel):
     country_id: int
+    # Optional boundary query shaping, done in PostGIS
+    region_id: Optional[int] = None
+    columns: Optional[List[str]] = None  # Defaults to every column
+    geometry_format: Literal["geojson", "wkb", "ewkb"] = "geojson"
+    simplify_tolerance: Optional[float] = Field(default=None, gt=0)  # In the geometry's units (degrees for EPSG:4326)
 
 class RegionRequest(BaseModel):
     region_id: int
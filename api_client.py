@@ -0,0 +1,21 @@
+import requests
+import streamlit as st
+
+
+def get_with_etag(url, timeout=10):
+    """GET an API response, revalidating the copy cached in the session with If-None-Match.
+
+    Returns (status_code, json); a 304 Not Modified reuses the cached body as a 200.
+    """
+    cache = st.session_state.setdefault("api_etag_cache", {})
+    cached = cache.get(url)
+    headers = {"If-None-Match": cached["etag"]} if cached else {}
+    response = requests.get(url, headers=headers, timeout=timeout)
+    if response.status_code == 304 and cached:
+        return 200, cached["data"]
+    if response.status_code != 200:
+        return response.status_code, None
+    data = response.json()
+    if response.headers.get("ETag"):
+        cache[url] = {"etag": response.headers["ETag"], "data": data}
+    return 200, data
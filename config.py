@@ -17,6 +17,31 @@ class Settings:
     API_HOST: str = os.getenv("API_HOST", "127.0.0.1")
     API_PORT: int = int(os.getenv("API_PORT", "8000"))
     DEBUG: bool = os.getenv("DEBUG", "True").lower() == "true"
+
+    # OSM data snapshot (e.g. "2024-06-01"); cached OSM data stays valid until it is advanced.
+    # Defaults to the API start date. With pinning, Overpass queries read the data as of that date.
+    OSM_SNAPSHOT: str = os.getenv("OSM_SNAPSHOT", "")
+    OSM_SNAPSHOT_PIN_QUERIES: bool = os.getenv("OSM_SNAPSHOT_PIN_QUERIES", "False").lower() == "true"
+
+    # Pricing catalog: with LISTEN/NOTIFY, a pricing write on one API worker invalidates every worker's copy
+    PRICING_CATALOG_NOTIFY: bool = os.getenv("PRICING_CATALOG_NOTIFY", "True").lower() == "true"
+    # Seconds a worker serves its pricing copy before reloading it, in case a notification was missed (0 disables)
+    PRICING_CATALOG_TTL_SECONDS: int = int(os.getenv("PRICING_CATALOG_TTL_SECONDS", "300"))
+
+    # Plans kept in memory per API worker (least recently used are evicted; they reload from the plan store)
+    PLAN_CACHE_SIZE: int = int(os.getenv("PLAN_CACHE_SIZE", "50"))
+    # Directory that POST /geospatial/osm-snapshot/apply-changes may read .osc change files from (unset disables it)
+    OSM_CHANGE_DIR: str = os.getenv("OSM_CHANGE_DIR", "")
+    # Road tiles (precision-6 geohashes) kept in the in-memory way store per API worker; the least
+    # recently used are evicted together with the ways no other stored tile references
+    ROAD_TILE_CACHE_SIZE: int = int(os.getenv("ROAD_TILE_CACHE_SIZE", "20000"))
+    # Finished background UKM tasks stay pollable for this many seconds
+    UKM_TASK_TTL_SECONDS: int = int(os.getenv("UKM_TASK_TTL_SECONDS", "3600"))
+
+    # Create missing tables when the API starts; disable when init_db.py runs as a separate deploy step
+    SCHEMA_CREATE_ON_STARTUP: bool = os.getenv("SCHEMA_CREATE_ON_STARTUP", "True").lower() == "true"
+    # Seconds between boundary table metadata refreshes (0 disables; POST /boundary/admin/registry/refresh still works)
+    BOUNDARY_REGISTRY_REFRESH_SECONDS: int = int(os.getenv("BOUNDARY_REGISTRY_REFRESH_SECONDS", "300"))
     
 
  
@@ -24,4 +49,8 @@ class Settings:
     def database_url(self) -> str:
         return f"postgresql://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}"
 
+    @property
+    def async_database_url(self) -> str:
+        return f"postgresql+asyncpg://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}"
+
 settings = Settings() 
\ No newline at end of file
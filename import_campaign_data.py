@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Script to bulk load campaigns or DAX trace points into the Karta Tools database
+
+Examples:
+    python import_campaign_data.py campaigns.csv
+    python import_campaign_data.py traces.parquet --kind traces --campaign-id 12 --replace
+"""
+
+import argparse
+import sys
+import time
+
+from api.database.bulk_import import import_campaigns, import_trace_points
+from config import settings
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk load campaign data from CSV or Parquet via COPY")
+    parser.add_argument("path", help="CSV or Parquet file")
+    parser.add_argument("--kind", choices=["campaigns", "traces"], default="campaigns")
+    parser.add_argument("--campaign-id", type=int, default=None, help="Campaign of every trace point (traces only)")
+    parser.add_argument("--replace", action="store_true", help="Replace the campaigns' existing trace points (traces only)")
+    args = parser.parse_args()
+    
+    print(f"📊 Database: {settings.DATABASE_NAME}")
+    print(f"📥 Importing {args.kind} from {args.path}...")
+    start_time = time.time()
+    
+    try:
+        with open(args.path, "rb") as fileobj:
+            if args.kind == "campaigns":
+                result = import_campaigns(fileobj, args.path)
+            else:
+                result = import_trace_points(fileobj, args.path, args.campaign_id, args.replace)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    
+    for key, value in result.items():
+        print(f"   {key}: {value}")
+    print(f"✅ Done in {time.time() - start_time:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+"""
+Script to create the Karta Tools database tables and warm up boundary table metadata
+
+Run it once per deployment (e.g. before starting the API workers) and set
+SCHEMA_CREATE_ON_STARTUP=False so the API itself does no schema work.
+
+Example:
+    python init_db.py
+"""
+
+import sys
+
+from api.database.boundary_registry import refresh_boundary_registry
+from api.database.schema import create_schema
+from config import settings
+
+def main():
+    print(f"📊 Database: {settings.DATABASE_NAME}")
+    try:
+        create_schema()
+        print("✅ Database tables created")
+        
+        tables = refresh_boundary_registry()
+    except Exception as e:
+        print(f"❌ {e}")
+        return 1
+    
+    for name, info in sorted(tables.items()):
+        status = "missing" if not info.exists else f"~{info.row_estimate or 0} rows"
+        print(f"   {name}: {status}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
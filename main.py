@@ -1,10 +1,14 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+import asyncio
 import uvicorn
 import logging
 
-from api.database.connection import engine, Base
+from api.database.boundary_registry import refresh_boundary_registry, refresh_boundary_registry_periodically
+from api.database.osm_snapshot import listen_for_osm_snapshot_changes
+from api.database.pricing_catalog import listen_for_pricing_changes
+from api.database.schema import create_schema
 from api.routers import country
 from api.routers import geospatial
 from api.routers import boundary
@@ -18,13 +22,6 @@ settings = Settings()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create database tables
-try:
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created successfully")
-except Exception as e:
-    logger.error(f"Failed to create database tables: {e}")
-
 app = FastAPI(
     title="Karta Tools API",
     description="""
@@ -130,12 +127,41 @@ async def startup_event():
     logger.info(f"🌐 Server: http://{settings.API_HOST}:{settings.API_PORT}")
     logger.info(f"📚 Docs: http://{settings.API_HOST}:{settings.API_PORT}/docs")
     
-    # Database initialization removed per user request
+    # Schema work runs once here, off the event loop, instead of at import time
+    if settings.SCHEMA_CREATE_ON_STARTUP:
+        try:
+            await asyncio.to_thread(create_schema)
+        except Exception as e:
+            logger.error(f"Failed to create database tables: {e}")
+    
+    try:
+        await asyncio.to_thread(refresh_boundary_registry)
+    except Exception as e:
+        logger.warning(f"Failed to load boundary registry: {e}")
+    if settings.BOUNDARY_REGISTRY_REFRESH_SECONDS > 0:
+        app.state.registry_refresher = asyncio.create_task(refresh_boundary_registry_periodically())
+    
+    # Every worker answers from the OSM snapshot stored in the database
+    try:
+        await asyncio.to_thread(geospatial.sync_osm_snapshot)
+    except Exception as e:
+        logger.warning(f"Failed to load the stored OSM snapshot: {e}")
+    app.state.snapshot_listener = asyncio.create_task(
+        listen_for_osm_snapshot_changes(geospatial.adopt_osm_snapshot)
+    )
+    
+    if settings.PRICING_CATALOG_NOTIFY:
+        app.state.pricing_listener = asyncio.create_task(listen_for_pricing_changes())
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Application shutdown event"""
     logger.info("🛑 Karta Tools API shutting down...")
+    
+    for task_name in ("pricing_listener", "registry_refresher", "snapshot_listener"):
+        task = getattr(app.state, task_name, None)
+        if task is not None:
+            task.cancel()
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -5,6 +5,7 @@ import pandas as pd
 import geopandas as gpd
 from io import BytesIO
 from config import settings
+from api_client import get_with_etag
 import folium
 from streamlit_folium import st_folium
 import math
@@ -705,6 +706,40 @@ def call_backend_calculate_ukm_advanced(geohashes, chunk_size=15, max_workers=10
         st.error(f"❌ Error in UKM calculation: {str(e)}")
         return None
 
+def get_campaign_names():
+    """Get campaign ids and names from the API for plan saving"""
+    try:
+        status_code, campaigns = get_with_etag(f"{API_BASE_URL}/campaign/names")
+        if status_code == 200:
+            return campaigns or []
+    except requests.exceptions.RequestException:
+        pass
+    return []
+
+def save_plan_to_campaign(campaign_id, result, country_id=None, region_id=None, precision=6, top_percent=None):
+    """Store a workflow result in the API plan store under a campaign, so evaluation can reuse its roads"""
+    dense_gdf = result['step2_dense_geohash']
+    grid_features = (result['step1_geohash'] or {}).get('geohashes_geojson', {}).get('features', [])
+    payload = {
+        "campaign_id": campaign_id,
+        "country_id": country_id,
+        "region_id": region_id,
+        "precision": precision,
+        "top_percent": top_percent,
+        "grid_geohashes": [f['properties']['geoHash'] for f in grid_features if f.get('properties', {}).get('geoHash')],
+        "dense_geohashes": dense_gdf['geoHash'].dropna().astype(str).tolist(),
+        "dense_counts": {str(gh): int(c) for gh, c in zip(dense_gdf['geoHash'], dense_gdf['count']) if pd.notna(c)},
+        "roads_geojson": result['step3_ukm_result'].get('roads_geojson')
+    }
+    try:
+        response = requests.post(f"{API_BASE_URL}/geospatial/plan/import", json=payload, timeout=120)
+        if response.status_code == 200:
+            return response.json()
+        st.error(f"❌ Failed to save plan: {response.status_code} - {response.text}")
+    except requests.exceptions.RequestException as e:
+        st.error(f"❌ API connection failed. Could not save plan: {e}")
+    return None
+
 def get_countries():
     """Get list of available countries from local file"""
     try:
@@ -2386,7 +2421,9 @@ def streamlit_complete_workflow_ui():
                 st.session_state.selected_country_info = selected_country
                 st.session_state.selected_region_info = {
                     'name': selected_region_name,
-                    'data': selected_region_data
+                    'data': selected_region_data,
+                    'precision': precision,
+                    'top_percent': top_percent
                 }
                 
                 with st.spinner("🔄 Processing - this may take a few minutes..."):
@@ -2797,6 +2834,37 @@ def streamlit_complete_workflow_ui():
                     key="download_roads"
                 )
         
+        # Save plan to a campaign (persistent plan store, reused by Campaigns Evaluation)
+        st.markdown("<br>", unsafe_allow_html=True)  # Small spacing
+        st.subheader("💾 Save Plan to Campaign")
+        
+        campaigns = get_campaign_names()
+        if campaigns:
+            save_col1, save_col2 = st.columns([3, 1])
+            with save_col1:
+                campaign_by_name = {campaign['campaign_name']: campaign['id'] for campaign in campaigns}
+                save_campaign_name = st.selectbox(
+                    "Campaign:",
+                    options=list(campaign_by_name.keys()),
+                    key="save_plan_campaign_selector"
+                )
+            with save_col2:
+                st.markdown("<br>", unsafe_allow_html=True)
+                if st.button("💾 Save Plan", key="save_plan_button", use_container_width=True):
+                    region_info = selected_region.get('data') or {}
+                    saved = save_plan_to_campaign(
+                        campaign_by_name[save_campaign_name],
+                        result,
+                        country_id=selected_country.get('id'),
+                        region_id=region_info.get('id') if isinstance(region_info, dict) else None,
+                        precision=selected_region.get('precision', 6),
+                        top_percent=selected_region.get('top_percent')
+                    )
+                    if saved:
+                        st.success(f"✅ Saved as version {saved.get('version')} of '{save_campaign_name}'")
+        else:
+            st.info("ℹ️ No campaigns available to save the plan to")
+        
         # Clear results button
         st.markdown("<br>", unsafe_allow_html=True)  # Small spacing
         if st.button("🗑️ Clear All Results", help="Clear workflow and budget results to start over"):
@@ -20,6 +20,8 @@ from pathlib import Path
 from collections import Counter, defaultdict
 from io import StringIO
 from shapely.geometry import LineString, shape, box
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from api_client import get_with_etag
 
 
 st.set_page_config(page_title="Campaign Evaluation", layout="wide")
@@ -1200,16 +1202,36 @@ ox.settings.timeout = 60  # Increase timeout for complex queries
 CACHE_DIR = Path("cache/osm_data")
 CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
+@st.cache_data(ttl=300)  # Cache for 5 minutes
+def get_osm_snapshot():
+    """Get the current OSM data snapshot from the API (None if the API is unavailable)"""
+    try:
+        response = requests.get(f"{API_BASE_URL}/geospatial/osm-snapshot", timeout=5)
+        if response.status_code == 200:
+            return response.json()
+    except requests.exceptions.RequestException:
+        pass
+    return None
+
+# Cached files are tagged with the OSM snapshot and stay valid until it is advanced
+osm_snapshot_info = get_osm_snapshot()
+OSM_SNAPSHOT = osm_snapshot_info["id"] if osm_snapshot_info else os.getenv("OSM_SNAPSHOT", "local")
+OSM_SNAPSHOT_PREFIX = "".join(c if c.isalnum() or c in "-." else "-" for c in OSM_SNAPSHOT)
+
+# Read OSM data as of the snapshot date when the API pins its queries
+if osm_snapshot_info and osm_snapshot_info.get("pinned"):
+    ox.settings.overpass_settings = '[out:json][timeout:{timeout}]{maxsize}[date:"' + OSM_SNAPSHOT + 'T00:00:00Z"]'
+
 # Caching Helper Functions
 def generate_cache_key(polygon, data_type="areas"):
-    """Generate unique cache key based on polygon bounds and data type"""
+    """Generate unique cache key based on OSM snapshot, polygon bounds and data type"""
     bounds = polygon.bounds
     # Create a string representation of bounds rounded to 4 decimal places for consistency
     bounds_str = f"{bounds[0]:.4f}_{bounds[1]:.4f}_{bounds[2]:.4f}_{bounds[3]:.4f}"
     cache_key = f"{data_type}_{bounds_str}"
     # Use hash for shorter filename
     hash_object = hashlib.md5(cache_key.encode())
-    return hash_object.hexdigest()
+    return f"{OSM_SNAPSHOT_PREFIX}_{hash_object.hexdigest()}"
 
 def save_to_cache(data, cache_key, data_type):
     """Save GeoDataFrame to cache"""
@@ -1254,31 +1276,23 @@ def load_from_cache(cache_key, data_type):
         st.warning(f"Could not load from cache: {e}")
         return None
 
-def is_cache_valid(cache_key, data_type, max_age_hours=24):
-    """Check if cache is valid (exists and not too old)"""
+def is_cache_valid(cache_key, data_type):
+    """Check if cache is valid (exists for the current snapshot, which is part of the key)"""
     try:
         cache_file = CACHE_DIR / f"{cache_key}_{data_type}.pkl"
-        
-        if not cache_file.exists():
-            return False
-        
-        # Check file age
-        file_age = time.time() - cache_file.stat().st_mtime
-        max_age_seconds = max_age_hours * 3600
-        
-        return file_age < max_age_seconds
+        return cache_file.exists()
     except:
         return False
 
-def clear_old_cache(max_age_hours=168):  # Default 7 days
-    """Clear cache files older than specified hours"""
+def clear_old_cache():
+    """Clear cache files of earlier OSM snapshots"""
     try:
-        current_time = time.time()
-        max_age_seconds = max_age_hours * 3600
+        # Without the API the current snapshot is unknown, so nothing is cleared
+        if osm_snapshot_info is None:
+            return
         
         for cache_file in CACHE_DIR.glob("*.pkl"):
-            file_age = current_time - cache_file.stat().st_mtime
-            if file_age > max_age_seconds:
+            if not cache_file.name.startswith(f"{OSM_SNAPSHOT_PREFIX}_"):
                 cache_file.unlink()
                 # Also remove corresponding geojson file
                 geojson_file = cache_file.with_suffix('.geojson')
@@ -1295,12 +1309,11 @@ clear_old_cache()
 def get_campaign_names():
     """Get list of campaign names for dropdown selection"""
     try:
-        response = requests.get(f"{API_BASE_URL}/campaign/names", timeout=10)
-        if response.status_code == 200:
-            campaigns = response.json()
+        status_code, campaigns = get_with_etag(f"{API_BASE_URL}/campaign/names")
+        if status_code == 200:
             return campaigns if campaigns else []
         else:
-            st.warning(f"⚠️ Failed to load campaigns from API: {response.status_code}")
+            st.warning(f"⚠️ Failed to load campaigns from API: {status_code}")
             return []
     except requests.exceptions.ConnectionError:
         st.warning("⚠️ API connection failed. Campaign selection not available.")
@@ -1315,12 +1328,11 @@ def get_campaign_names():
 def get_campaign_details(campaign_id):
     """Get campaign details by ID"""
     try:
-        response = requests.get(f"{API_BASE_URL}/campaign/{campaign_id}", timeout=10)
-        if response.status_code == 200:
-            campaigns = response.json()
+        status_code, campaigns = get_with_etag(f"{API_BASE_URL}/campaign/{campaign_id}")
+        if status_code == 200:
             return campaigns[0] if campaigns else None
         else:
-            st.error(f"❌ Failed to load campaign details: {response.status_code}")
+            st.error(f"❌ Failed to load campaign details: {status_code}")
             return None
     except requests.exceptions.ConnectionError:
         st.error("❌ API connection failed. Cannot load campaign details.")
@@ -1332,6 +1344,25 @@ def get_campaign_details(campaign_id):
         st.error(f"❌ Error loading campaign details: {str(e)}")
         return None
 
+def get_campaign_plan_roads(campaign_id, polygon):
+    """Get the planned road segments of a campaign's stored plan inside a polygon's bbox (None if not stored)"""
+    try:
+        minx, miny, maxx, maxy = polygon.bounds
+        response = requests.get(
+            f"{API_BASE_URL}/geospatial/plan/campaign/{campaign_id}/roads",
+            params={"bbox": f"{minx},{miny},{maxx},{maxy}"},
+            timeout=60
+        )
+        if response.status_code != 200:
+            return None
+        features = response.json()["roads_geojson"]["features"]
+        if not features:
+            return gpd.GeoDataFrame(columns=['highway', 'length_km', 'geometry'], geometry='geometry', crs='EPSG:4326')
+        roads = gpd.GeoDataFrame.from_features(features, crs="EPSG:4326")
+        return roads[roads.geometry.intersects(polygon)]
+    except requests.exceptions.RequestException:
+        return None
+
 
 # Campaign Selection Section
 st.header("Select Campaign")
@@ -1382,7 +1413,8 @@ st.header("Upload Supporting Data")   # Clear cache button
 # Initialize session state variables
 session_vars = [
     "flattened_data", "road_gdf", "restricted_areas_gdf", 
-    "restricted_roads_gdf", "final_analysis_result", "analysis_completed", "ai_analysis_result"
+    "restricted_roads_gdf", "final_analysis_result", "analysis_completed", "ai_analysis_result",
+    "planned_roads_gdf", "planned_gap_roads_gdf"
 ]
 
 for var in session_vars:
@@ -1543,6 +1575,81 @@ def convert_csv_to_geojson(df):
     gdf_singlepart = gdf_roads.explode(index_parts=False).reset_index(drop=True)
     return gdf_singlepart
 
+# Adaptive splitting of oversized OSM feature queries
+OSM_MAX_SPLIT_DEPTH = 3
+OSM_MAX_QUERY_AREA_KM2 = 2500
+
+def estimate_polygon_area_km2(polygon):
+    """Approximate area of a lon/lat polygon in square kilometres"""
+    mid_lat = math.radians((polygon.bounds[1] + polygon.bounds[3]) / 2)
+    return polygon.area * 111.32 * 111.32 * math.cos(mid_lat)
+
+def split_polygon_quadrants(polygon):
+    """Split a polygon into the non-empty parts of its four bbox quadrants"""
+    minx, miny, maxx, maxy = polygon.bounds
+    midx, midy = (minx + maxx) / 2, (miny + maxy) / 2
+    quadrants = [
+        box(minx, miny, midx, midy), box(midx, miny, maxx, midy),
+        box(minx, midy, midx, maxy), box(midx, midy, maxx, maxy)
+    ]
+    parts = [polygon.intersection(quadrant) for quadrant in quadrants]
+    return [part for part in parts if not part.is_empty and part.area > 0]
+
+def features_from_polygon_adaptive(polygon, tags):
+    """Download OSM features, splitting the polygon into quadrants when the query is too large.
+
+    Large polygons are split up front; a failed (timed-out or out-of-memory)
+    query is split and the quadrants are fetched again. The whole split tree
+    shares one 4-worker executor, so at most 4 queries run at once. Parts are
+    merged with dedup on the OSM id index.
+    """
+    def fetch_part(part, depth):
+        """Features of one part, or the quadrants to fetch instead"""
+        if depth < OSM_MAX_SPLIT_DEPTH and estimate_polygon_area_km2(part) > OSM_MAX_QUERY_AREA_KM2:
+            return None, split_polygon_quadrants(part)
+        try:
+            return ox.features.features_from_polygon(part, tags=tags), None
+        except Exception as e:
+            # osmnx raises InsufficientResponseError (not public API) when a part has no matching features
+            if type(e).__name__ == "InsufficientResponseError":
+                return gpd.GeoDataFrame(), None
+            if depth >= OSM_MAX_SPLIT_DEPTH:
+                raise
+            return None, split_polygon_quadrants(part)
+    
+    frames = []
+    executor = ThreadPoolExecutor(max_workers=4)
+    try:
+        pending = {executor.submit(fetch_part, polygon, 0): 0}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                depth = pending.pop(future)
+                frame, parts = future.result()
+                if parts is None:
+                    frames.append(frame)
+                    continue
+                for part in parts:
+                    pending[executor.submit(fetch_part, part, depth + 1)] = depth + 1
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    
+    frames = [frame for frame in frames if frame is not None and len(frame) > 0]
+    if not frames:
+        return gpd.GeoDataFrame()
+    combined = pd.concat(frames)
+    return combined[~combined.index.duplicated(keep="first")]
+    
+    try:
+        return ox.features.features_from_polygon(polygon, tags=tags)
+    except Exception as e:
+        # osmnx raises InsufficientResponseError (not public API) when a part has no matching features
+        if type(e).__name__ == "InsufficientResponseError":
+            return gpd.GeoDataFrame()
+        if depth >= OSM_MAX_SPLIT_DEPTH:
+            raise
+        return fetch_quadrants()
+
 def download_restricted_areas(polygon, selected_restrictions=None):
     """Download restricted areas using optimized OSM queries with proper error handling and caching"""
     
@@ -1551,7 +1658,7 @@ def download_restricted_areas(polygon, selected_restrictions=None):
     cache_key = generate_cache_key(polygon, f"restricted_areas_{restrictions_key}")
     
     # Try to load from cache first
-    if is_cache_valid(cache_key, "restricted_areas", max_age_hours=24):
+    if is_cache_valid(cache_key, "restricted_areas"):
         cached_data = load_from_cache(cache_key, "restricted_areas")
         if cached_data is not None:
             return cached_data
@@ -1619,7 +1726,7 @@ def download_restricted_areas(polygon, selected_restrictions=None):
                 if i > 0:
                     time.sleep(1)
                 
-                gdf = ox.features.features_from_polygon(polygon, tags=tags)
+                gdf = features_from_polygon_adaptive(polygon, tags)
                 if gdf is not None and len(gdf) > 0:
                     # Filter to only polygon and point geometries (points can be buffered later)
                     valid_mask = gdf.geometry.geom_type.isin(["Polygon", "MultiPolygon", "Point"])
@@ -1674,7 +1781,7 @@ def download_restricted_roads(polygon, selected_restrictions=None):
     cache_key = generate_cache_key(polygon, f"restricted_roads_{restrictions_key}")
     
     # Try to load from cache first
-    if is_cache_valid(cache_key, "restricted_roads", max_age_hours=24):
+    if is_cache_valid(cache_key, "restricted_roads"):
         cached_data = load_from_cache(cache_key, "restricted_roads")
         if cached_data is not None:
             return cached_data
@@ -1726,7 +1833,7 @@ def download_restricted_roads(polygon, selected_restrictions=None):
                 if i > 0:
                     time.sleep(1)
                 
-                gdf = ox.features.features_from_polygon(polygon, tags=tags)
+                gdf = features_from_polygon_adaptive(polygon, tags)
                 if gdf is not None and len(gdf) > 0:
                     # Filter to only line geometries and points (gates/barriers)
                     line_mask = gdf.geometry.geom_type.isin(["LineString", "MultiLineString"])
@@ -1861,6 +1968,21 @@ def analyze_gap_intersections(gdf_roads, gdf_polygons, gdf_lines, distance_meter
     
     return selected.to_crs("EPSG:4326")
 
+def match_planned_roads(gdf_roads, planned_roads, distance_meters=100.0):
+    """Planned road segments of the campaign's stored plan that lie within distance_meters of the gap roads"""
+    if gdf_roads is None or len(gdf_roads) == 0:
+        return gpd.GeoDataFrame()
+    if planned_roads is None or len(planned_roads) == 0:
+        return gpd.GeoDataFrame()
+    
+    utm_crs = gdf_roads.to_crs("EPSG:4326").estimate_utm_crs()
+    buffered_roads = gpd.GeoDataFrame(geometry=gdf_roads.to_crs(utm_crs).buffer(distance_meters), crs=utm_crs)
+    
+    selected = gpd.sjoin(planned_roads.to_crs(utm_crs), buffered_roads, how="inner", predicate="intersects")
+    selected = selected[~selected.index.duplicated()].drop(columns="index_right")
+    
+    return selected.to_crs("EPSG:4326")
+
 # AI/ML Analysis Functions
 def analyze_osm_features_with_ai(intersecting_roads_gdf, restricted_areas_gdf, restricted_roads_gdf):
     """Advanced AI analysis of OSM features affecting the roads"""
@@ -2452,6 +2574,17 @@ if analysis_clicked and campaign_selected and file_uploaded and restrictions_sel
         
         intersections_count = len(st.session_state.final_analysis_result) if st.session_state.final_analysis_result is not None else 0
         
+        # Compare the gap roads against the planned segments stored for this campaign
+        st.session_state.planned_roads_gdf = get_campaign_plan_roads(st.session_state.selected_campaign_id, analysis_polygon)
+        if st.session_state.planned_roads_gdf is not None:
+            st.session_state.planned_gap_roads_gdf = match_planned_roads(
+                st.session_state.road_gdf,
+                st.session_state.planned_roads_gdf,
+                distance_buffer
+            )
+        else:
+            st.session_state.planned_gap_roads_gdf = None
+        
         current_status.success(f"✅ Step 4 Complete: Found {intersections_count} intersecting roads")
         progress_bar.progress(0.9)
         
@@ -2502,6 +2635,13 @@ if st.session_state.analysis_completed and st.session_state.final_analysis_resul
         except:
             total_road_length_km = 0
     
+    # Planned UKM (from the campaign's stored plan) that the gap roads run along
+    planned_road_length_km = None
+    planned_gap_length_km = None
+    if st.session_state.planned_roads_gdf is not None:
+        planned_road_length_km = float(st.session_state.planned_roads_gdf.get('length_km', pd.Series(dtype=float)).sum())
+        planned_gap = st.session_state.planned_gap_roads_gdf
+        planned_gap_length_km = float(planned_gap['length_km'].sum()) if planned_gap is not None and len(planned_gap) > 0 else 0.0
 
     # AI Analysis Results Section
     if st.session_state.ai_analysis_result is not None:
@@ -2532,6 +2672,14 @@ if st.session_state.analysis_completed and st.session_state.final_analysis_resul
                              f"{intersecting_road_length_km:.2f} km",
                              )
 
+                    if planned_gap_length_km is not None:
+                        st.metric("🗂️ Planned UKM along the gap",
+                                 f"{planned_gap_length_km:.2f} km",
+                                 help=f"Stored plan segments within {distance_buffer} m of the gap roads "
+                                      f"(plan total in this area: {planned_road_length_km:.2f} km)")
+                    else:
+                        st.caption("No stored plan for this campaign; save it from Campaigns Preparation to compare against planned roads.")
+
                 with col3:
                     if severity.get('severity_breakdown'):
                         st.write("**Risk Factors:**")
@@ -0,0 +1,40 @@
+import io
+
+import pytest
+
+for module in ("sqlalchemy", "psycopg2", "asyncpg"):
+    pytest.importorskip(module)
+
+from api.database.bulk_import import is_parquet, normalize_columns, staged_value, upload_columns
+
+def test_is_parquet_by_name_or_magic_bytes():
+    assert is_parquet(io.BytesIO(b""), "campaigns.PARQUET")
+    assert is_parquet(io.BytesIO(b"PAR1\x00\x00"), "upload.bin")
+    assert not is_parquet(io.BytesIO(b"campaign_name\n"), "campaigns.csv")
+
+def test_is_parquet_keeps_the_read_position():
+    fileobj = io.BytesIO(b"xxPAR1")
+    fileobj.seek(2)
+    
+    assert is_parquet(fileobj)
+    assert fileobj.tell() == 2
+
+def test_normalize_columns():
+    assert normalize_columns(["\ufeffCampaign_Name", " City "]) == ["campaign_name", "city"]
+
+def test_normalize_columns_rejects_duplicates():
+    with pytest.raises(ValueError, match="city"):
+        normalize_columns(["City", "city ", "country"])
+
+def test_upload_columns_of_a_csv_header():
+    fileobj = io.BytesIO("\ufeffCampaign_Name,UKM_Plan\nA,1\n".encode("utf-8"))
+    
+    assert upload_columns(fileobj, parquet=False) == ["campaign_name", "ukm_plan"]
+    assert fileobj.tell() == 0
+
+def test_staged_value():
+    columns = ["campaign_name", "ukm_plan"]
+    
+    assert staged_value(columns, "campaign_name") == "NULLIF(trim(s.\"campaign_name\"), '')"
+    assert staged_value(columns, "ukm_plan", "double precision") == "NULLIF(trim(s.\"ukm_plan\"), '')::double precision"
+    assert staged_value(columns, "city") == "NULL"
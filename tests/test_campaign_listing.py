@@ -0,0 +1,147 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+for module in ("fastapi", "sqlalchemy", "psycopg2", "asyncpg"):
+    pytest.importorskip(module)
+
+from fastapi import HTTPException, Response
+
+from api.routers.campaign import (
+    CAMPAIGN_FIELDS,
+    CAMPAIGN_PAGE_SIZE,
+    campaign_filters,
+    decode_cursor,
+    encode_cursor,
+    keyset_condition,
+    list_campaigns,
+    selected_fields
+)
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+    
+    def scalar(self):
+        # campaign_version.version
+        return 42
+    
+    def mappings(self):
+        return self.rows
+
+class FakeDb:
+    """Async session stand-in that records statements and serves fixed rows"""
+    
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+    
+    async def execute(self, statement, params=None):
+        self.statements.append((str(statement), params or {}))
+        limit = (params or {}).get("limit")
+        return FakeResult(self.rows[:limit] if limit else self.rows)
+
+def fake_request(if_none_match=None):
+    headers = {"if-none-match": if_none_match} if if_none_match else {}
+    return SimpleNamespace(headers=headers, url=SimpleNamespace(path="/api/v1/campaign/all", query=""))
+
+def run_listing(db, request=None, limit=None, cursor=None, sort_column=None, country=None, city=None, name_prefix=None):
+    response = Response()
+    rows = asyncio.run(list_campaigns(
+        request or fake_request(), response, db, ["id", "campaign_name"], sort_column,
+        limit, cursor, country, city, name_prefix
+    ))
+    return rows, response
+
+ROWS = [{"id": i, "campaign_name": f"Campaign {i}"} for i in range(1, 6)]
+
+def test_selected_fields_defaults_to_every_column():
+    assert selected_fields(None) == CAMPAIGN_FIELDS
+
+def test_selected_fields_keeps_table_order_and_id():
+    assert selected_fields(" city, campaign_name ") == ["id", "campaign_name", "city"]
+
+def test_selected_fields_rejects_unknown_columns():
+    with pytest.raises(HTTPException) as error:
+        selected_fields("city,password")
+    assert error.value.status_code == 400
+
+def test_campaign_filters_escape_like_wildcards():
+    conditions, params = campaign_filters("ID", None, "50%_off\\")
+    
+    assert conditions == ["country = :country", "campaign_name LIKE :name_prefix ESCAPE '\\'"]
+    assert params == {"country": "ID", "name_prefix": "50\\%\\_off\\\\%"}
+
+def test_listing_without_limit_or_cursor_returns_every_row():
+    db = FakeDb(ROWS)
+    rows, response = run_listing(db)
+    
+    assert rows == ROWS
+    assert "limit" not in db.statements[-1][0]
+    assert "X-Next-Cursor" not in response.headers
+    assert response.headers["ETag"]
+
+def test_listing_page_sets_next_cursor():
+    db = FakeDb(ROWS)
+    rows, response = run_listing(db, limit=2)
+    
+    assert [row["id"] for row in rows] == [1, 2]
+    # One extra row is read to know whether another page follows
+    assert db.statements[-1][1]["limit"] == 3
+    assert decode_cursor(response.headers["X-Next-Cursor"], 1) == [2]
+
+def test_name_listing_cursor_carries_the_sort_key():
+    _, response = run_listing(FakeDb(ROWS), limit=2, sort_column="campaign_name")
+    
+    assert decode_cursor(response.headers["X-Next-Cursor"], 2) == ["Campaign 2", 2]
+
+def test_listing_last_page_has_no_cursor():
+    rows, response = run_listing(FakeDb(ROWS), limit=5)
+    
+    assert len(rows) == 5
+    assert "X-Next-Cursor" not in response.headers
+
+def test_listing_cursor_without_limit_uses_page_size():
+    db = FakeDb(ROWS)
+    run_listing(db, cursor=encode_cursor([2]))
+    sql, params = db.statements[-1]
+    
+    # The cursor row itself is never re-read
+    assert "id > :after_id" in sql and "select id from campaign where" not in sql
+    assert params["after_id"] == 2
+    assert params["limit"] == CAMPAIGN_PAGE_SIZE + 1
+
+def test_keyset_condition_sorts_nulls_last():
+    params = {}
+    condition = keyset_condition("campaign_name", ["Jakarta", 7], params)
+    
+    assert "campaign_name is null" in condition
+    assert params == {"after_id": 7, "after_value": "Jakarta"}
+    
+    params = {}
+    assert keyset_condition("campaign_name", [None, 7], params) == "(campaign_name is null and id > :after_id)"
+    assert params == {"after_id": 7}
+
+def test_name_listing_orders_nulls_last():
+    db = FakeDb(ROWS)
+    run_listing(db, sort_column="campaign_name")
+    
+    assert db.statements[-1][0].endswith("order by campaign_name nulls last, id")
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor(["a"]), encode_cursor([1, 2, 3])])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, 2)
+    assert error.value.status_code == 400
+
+def test_listing_revalidation_returns_not_modified():
+    db = FakeDb(ROWS)
+    _, response = run_listing(db)
+    
+    result = asyncio.run(list_campaigns(
+        fake_request(response.headers["ETag"]), Response(), db, ["id", "campaign_name"], None,
+        None, None, None, None, None
+    ))
+    
+    assert result.status_code == 304
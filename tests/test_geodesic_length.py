@@ -0,0 +1,42 @@
+import pytest
+
+for module in ("fastapi", "sqlalchemy", "psycopg2", "asyncpg", "geopandas", "shapely", "osmnx", "geohash2"):
+    pytest.importorskip(module)
+
+from shapely.geometry import LineString, MultiLineString
+
+from api.routers.geospatial import geodesic_lengths_km
+
+# WGS84 reference lengths of one degree
+DEGREE_OF_LATITUDE_AT_EQUATOR_KM = 110.574
+DEGREE_OF_LONGITUDE_AT_EQUATOR_KM = 111.320
+
+def test_geodesic_lengths_of_meridian_and_equator_degrees():
+    lengths = geodesic_lengths_km([
+        LineString([(0, 0), (0, 1)]),
+        LineString([(0, 0), (1, 0)])
+    ])
+    
+    assert lengths[0] == pytest.approx(DEGREE_OF_LATITUDE_AT_EQUATOR_KM, rel=1e-3)
+    assert lengths[1] == pytest.approx(DEGREE_OF_LONGITUDE_AT_EQUATOR_KM, rel=1e-3)
+
+def test_geodesic_lengths_shrink_with_latitude():
+    lengths = geodesic_lengths_km([LineString([(0, 60), (1, 60)])])
+    
+    assert lengths[0] == pytest.approx(DEGREE_OF_LONGITUDE_AT_EQUATOR_KM / 2, rel=5e-3)
+
+def test_geodesic_lengths_do_not_join_multilinestring_parts():
+    lengths = geodesic_lengths_km([
+        MultiLineString([[(0, 0), (0, 1)], [(5, 0), (5, 1)]]),
+        LineString([(0, 0), (0, 1)])
+    ])
+    
+    assert lengths[0] == pytest.approx(2 * lengths[1])
+
+def test_geodesic_lengths_cross_the_antimeridian():
+    lengths = geodesic_lengths_km([LineString([(179.5, 0), (-179.5, 0)])])
+    
+    assert lengths[0] == pytest.approx(DEGREE_OF_LONGITUDE_AT_EQUATOR_KM, rel=1e-3)
+
+def test_geodesic_lengths_of_nothing():
+    assert len(geodesic_lengths_km([])) == 0
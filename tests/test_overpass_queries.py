@@ -0,0 +1,28 @@
+import pytest
+
+for module in ("fastapi", "sqlalchemy", "psycopg2", "asyncpg", "geopandas", "shapely", "osmnx", "geohash2"):
+    pytest.importorskip(module)
+
+from api.routers.geospatial import build_road_skeleton_query, overpass_string, overpass_tag_filter
+
+def test_overpass_string_escapes_quotes_and_backslashes():
+    assert overpass_string('Jalan "A"') == '"Jalan \\"A\\""'
+    assert overpass_string("a\\b") == '"a\\\\b"'
+
+def test_tag_filter_forms():
+    assert overpass_tag_filter("amenity", True) == '["amenity"]'
+    assert overpass_tag_filter("amenity", "cafe") == '["amenity"="cafe"]'
+    assert overpass_tag_filter("highway", ["primary", "primary_link"]) == '["highway"~"^(primary|primary_link)$"]'
+
+def test_tag_filter_quotes_values():
+    assert overpass_tag_filter("name", 'Toko "Maju"') == '["name"="Toko \\"Maju\\""]'
+    # re.escape's backslash is itself escaped for the QL literal
+    assert overpass_tag_filter("shop", ["a.b", 'c"d']) == '["shop"~"^(a\\\\.b|c\\"d)$"]'
+
+def test_road_skeleton_query_unions_bboxes():
+    query = build_road_skeleton_query([(106.8, -6.2, 106.9, -6.1), (107.0, -6.2, 107.1, -6.1)], ["primary"], timeout=30)
+    
+    assert query.startswith("[out:json][timeout:30]")
+    assert query.count('way["highway"~"^(primary)$"]') == 2
+    assert "(-6.2,106.8,-6.1,106.9)" in query
+    assert query.endswith("out geom qt;")
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+for module in ("fastapi", "sqlalchemy", "psycopg2", "asyncpg", "geopandas", "shapely", "osmnx", "geohash2"):
+    pytest.importorskip(module)
+
+from api.routers.geospatial import OverpassElementStream, OverpassGeometryParser
+
+RESPONSE = {
+    "version": 0.6,
+    "elements": [
+        {"type": "node", "id": 1, "lat": -6.2, "lon": 106.8, "tags": {"amenity": "cafe", "name": "Kopi \"Satu\""}},
+        {
+            "type": "way", "id": 10, "nodes": [1, 2, 3],
+            "geometry": [{"lat": -6.2, "lon": 106.8}, {"lat": -6.21, "lon": 106.81}, {"lat": -6.22, "lon": 106.8}],
+            "tags": {"highway": "residential", "name": "Jalan [A]"}
+        },
+        {
+            "type": "way", "id": 11,
+            "geometry": [
+                {"lat": 0, "lon": 0}, {"lat": 0, "lon": 1}, {"lat": 1, "lon": 1}, {"lat": 0, "lon": 0}
+            ],
+            "tags": {"building": "yes"}
+        }
+    ],
+    "remark": "runtime error: Query timed out"
+}
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+@pytest.mark.parametrize("size", [1, 7, 64, 100000])
+def test_stream_yields_every_element_for_any_chunking(size):
+    stream = OverpassElementStream()
+    elements = [element for chunk in chunked(json.dumps(RESPONSE), size) for element in stream.feed(chunk)]
+    
+    assert elements == RESPONSE["elements"]
+    assert stream.remark == "runtime error: Query timed out"
+
+def test_stream_without_remark():
+    stream = OverpassElementStream()
+    elements = list(stream.feed(json.dumps({"elements": []})))
+    
+    assert elements == []
+    assert stream.remark is None
+
+def test_stream_and_json_parsers_agree():
+    streamed = OverpassGeometryParser(["highway", "name"]).feed_stream(chunked(json.dumps(RESPONSE), 5))
+    decoded = OverpassGeometryParser(["highway", "name"]).feed_json(RESPONSE)
+    
+    for parser in (streamed, decoded):
+        assert parser.point_ids == [1]
+        assert parser.way_ids == [10, 11]
+        assert parser.way_sizes == [3, 4]
+        assert parser.way_tags["highway"] == ["residential", None]
+        assert parser.remark == "runtime error: Query timed out"
+
+def test_way_node_lists_align_with_coordinates():
+    parser = OverpassGeometryParser().feed_json(RESPONSE)
+    nodes = parser.way_node_lists()
+    
+    assert list(nodes[10]) == [1, 2, 3]
+    # Node ids were not returned for way 11
+    assert list(nodes[11]) == [0, 0, 0, 0]
+
+def test_lines_and_polygons():
+    parser = OverpassGeometryParser(["highway"]).feed_json(RESPONSE)
+    
+    lines = parser.to_lines()
+    assert list(lines["osmid"]) == [10, 11]
+    assert list(lines.geometry.geom_type) == ["LineString", "LineString"]
+    
+    polygons = parser.to_polygons()
+    assert list(polygons["osmid"]) == [11]
+    assert polygons.geometry.iloc[0].area == pytest.approx(0.5)
+
+def test_way_with_missing_coordinates_is_skipped():
+    parser = OverpassGeometryParser().feed_json({
+        "elements": [{"type": "way", "id": 5, "geometry": [{"lat": 0, "lon": 0}, None]}]
+    })
+    
+    assert parser.way_ids == []
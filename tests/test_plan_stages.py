@@ -0,0 +1,53 @@
+import pytest
+
+for module in ("fastapi", "sqlalchemy", "psycopg2", "asyncpg", "geopandas", "shapely", "osmnx", "geohash2"):
+    pytest.importorskip(module)
+
+import geohash2
+from shapely.geometry import box, mapping
+
+from api.routers.geospatial import geohash_cells_to_geojson, generate_geohash_grid, geometry_from_geojson
+
+def test_geometry_from_geojson_accepts_geometry_feature_and_collection():
+    left, right = box(0, 0, 1, 1), box(1, 0, 2, 1)
+    collection = {
+        "type": "FeatureCollection",
+        "features": [
+            {"type": "Feature", "properties": {}, "geometry": mapping(left)},
+            {"type": "Feature", "properties": {}, "geometry": mapping(right)},
+            {"type": "Feature", "properties": {}, "geometry": None}
+        ]
+    }
+    
+    assert geometry_from_geojson(mapping(left)).equals(left)
+    assert geometry_from_geojson({"type": "Feature", "geometry": mapping(left)}).equals(left)
+    assert geometry_from_geojson(collection).area == pytest.approx(2)
+
+def test_grid_covers_the_boundary_without_duplicates():
+    boundary = box(106.80, -6.22, 106.83, -6.19)
+    
+    grid = generate_geohash_grid(boundary, 6)
+    
+    assert len(grid) == len(set(grid))
+    assert all(len(gh) == 6 for gh in grid)
+    for lat, lon in [(-6.2, 106.81), (-6.219, 106.801), (-6.191, 106.829)]:
+        assert geohash2.encode(lat, lon, 6) in grid
+
+def test_grid_cells_intersect_the_boundary():
+    boundary = box(106.80, -6.22, 106.83, -6.19)
+    
+    collection = geohash_cells_to_geojson(generate_geohash_grid(boundary, 6))
+    
+    for feature in collection["features"]:
+        assert geometry_from_geojson(feature).intersects(boundary)
+
+def test_cells_to_geojson_properties():
+    gh = geohash2.encode(-6.2, 106.81, 6)
+    
+    feature = geohash_cells_to_geojson([gh], counts={gh: 7.0}, interior={gh})["features"][0]
+    
+    assert feature["properties"]["geoHash"] == gh
+    assert feature["properties"]["count"] == 7
+    assert feature["properties"]["interior"] is True
+    ring = feature["geometry"]["coordinates"][0]
+    assert ring[0] == ring[-1] and len(ring) == 5
@@ -0,0 +1,88 @@
+import pytest
+
+for module in ("fastapi", "sqlalchemy", "psycopg2", "asyncpg", "geopandas", "shapely", "osmnx", "geohash2"):
+    pytest.importorskip(module)
+
+import geohash2
+import geopandas as gpd
+from shapely.geometry import LineString
+
+from api.routers.geospatial import (
+    cached_geohash_to_polygon,
+    clip_roads_to_cells,
+    drop_duplicate_road_pieces,
+    geodesic_lengths_km
+)
+
+def ways_frame(geometries, osmids=None):
+    osmids = osmids or list(range(1, len(geometries) + 1))
+    return gpd.GeoDataFrame({
+        "osmid": osmids,
+        "highway": ["residential"] * len(geometries),
+        "name": [None] * len(geometries)
+    }, geometry=geometries, crs="EPSG:4326")
+
+def east_neighbour(geohash_str):
+    lat, lon, lat_err, lon_err = geohash2.decode_exactly(geohash_str)
+    return geohash2.encode(lat, lon + 2 * lon_err, precision=len(geohash_str))
+
+def test_clip_keeps_a_line_inside_its_cell():
+    cell = "qqguwx"
+    min_x, min_y, max_x, max_y = cached_geohash_to_polygon(cell).bounds
+    line = LineString([(min_x + (max_x - min_x) / 4, min_y + (max_y - min_y) / 4),
+                       (max_x - (max_x - min_x) / 4, max_y - (max_y - min_y) / 4)])
+    
+    clipped = clip_roads_to_cells(ways_frame([line]), [cell])
+    
+    assert list(clipped["geohash"].astype(str)) == [cell]
+    assert clipped.geometry.iloc[0].equals(line)
+    assert clipped["length_km"].iloc[0] == pytest.approx(geodesic_lengths_km([line])[0])
+
+def test_clip_splits_a_line_across_cells():
+    west = "qqguwx"
+    east = east_neighbour(west)
+    west_bounds = cached_geohash_to_polygon(west).bounds
+    east_bounds = cached_geohash_to_polygon(east).bounds
+    mid_y = (west_bounds[1] + west_bounds[3]) / 2
+    line = LineString([((west_bounds[0] + west_bounds[2]) / 2, mid_y), ((east_bounds[0] + east_bounds[2]) / 2, mid_y)])
+    
+    clipped = clip_roads_to_cells(ways_frame([line]), [west, east])
+    
+    assert sorted(clipped["geohash"].astype(str)) == sorted([west, east])
+    assert clipped["length_km"].sum() == pytest.approx(geodesic_lengths_km([line])[0])
+
+def test_clip_counts_a_way_on_a_shared_cell_edge_once():
+    west = "qqguwx"
+    east = east_neighbour(west)
+    min_x, min_y, edge_x, max_y = cached_geohash_to_polygon(west).bounds
+    assert cached_geohash_to_polygon(east).bounds[0] == edge_x
+    line = LineString([(edge_x, min_y + (max_y - min_y) / 4), (edge_x, max_y - (max_y - min_y) / 4)])
+    
+    clipped = clip_roads_to_cells(ways_frame([line]), [west, east])
+    
+    assert len(clipped) == 1
+    assert clipped["length_km"].iloc[0] == pytest.approx(geodesic_lengths_km([line])[0])
+
+def test_clip_drops_pieces_that_only_touch_a_cell():
+    west = "qqguwx"
+    east = east_neighbour(west)
+    min_x, min_y, edge_x, max_y = cached_geohash_to_polygon(west).bounds
+    # Ends on the shared edge: a point-only contact with the east cell
+    line = LineString([(min_x, (min_y + max_y) / 2), (edge_x, (min_y + max_y) / 2)])
+    
+    clipped = clip_roads_to_cells(ways_frame([line]), [west, east])
+    
+    assert list(clipped["geohash"].astype(str)) == [west]
+
+def test_clip_without_cells_or_ways():
+    assert clip_roads_to_cells(ways_frame([LineString([(0, 0), (1, 1)])]), []).empty
+    assert clip_roads_to_cells(ways_frame([]), ["qqguwx"]).empty
+
+def test_drop_duplicate_road_pieces_ignores_direction_but_not_way_id():
+    forward = LineString([(0, 0), (1, 1)])
+    backward = LineString([(1, 1), (0, 0)])
+    roads = ways_frame([forward, backward, forward], osmids=[1, 1, 2])
+    
+    deduplicated = drop_duplicate_road_pieces(roads)
+    
+    assert list(deduplicated["osmid"]) == [1, 2]